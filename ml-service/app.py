@@ -1,19 +1,21 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime, timedelta
-import uvicorn
+import asyncio
+import json
+import os
+import time
 import logging
 
-# Import custom modules
-try:
-    from prediction.forecaster import DemandForecaster
-    from utils.database import DatabaseClient
-    ML_AVAILABLE = True
-except ImportError as e:
-    logging.warning(f"ML modules not available: {e}")
-    ML_AVAILABLE = False
+from utils.metrics import metrics
+
+# ML modules (and numpy) are imported by load_ml_modules() when the app starts, not on import
+ML_AVAILABLE = True
 
 # Configure logging
 logging.basicConfig(
@@ -22,11 +24,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services and start background work before serving; stop it on shutdown"""
+    start_services()
+    try:
+        yield
+    finally:
+        stop_services()
+
 # Create FastAPI app
 app = FastAPI(
     title="Vendor Platform ML Service",
     description="AI-powered demand forecasting service",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -38,15 +51,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-if ML_AVAILABLE:
+# Services, created by init_services() when the app starts
+db_client = None
+model_registry = None
+prediction_cache = None
+predict_flights = None
+batch_forecaster = None
+category_pooling = None
+model_selector = None
+waste_engine = None
+waste_projections = None
+sales_tailer = None
+sales_snapshot = None
+training_scheduler = None
+leader_lock = None
+
+# Reported by /health: "starting", then "ready" or "unavailable"
+readiness = {
+    "state": "starting",
+    "error": None,
+    "startup_seconds": None,
+    "warming_up": [],
+}
+
+
+def init_services():
+    """Create the database client, model registry and the services built on them"""
+    global db_client, model_registry, prediction_cache, predict_flights, batch_forecaster, category_pooling
+    global model_selector, waste_engine, waste_projections, sales_tailer, sales_snapshot, training_scheduler
+    global leader_lock
+
+    if 'ENABLE_HOLIDAY_FEATURE' in os.environ:
+        logger.warning("ENABLE_HOLIDAY_FEATURE is deprecated and has no effect")
+
     db_client = DatabaseClient()
-    forecaster_cache = {}  # Cache forecasters per product
-    logger.info("ML services initialized successfully")
-else:
-    db_client = None
-    forecaster_cache = {}
-    logger.warning("Running in fallback mode without ML")
+    model_registry = ModelRegistry()  # Fitted forecasters per product, persisted under MODEL_PATH
+    prediction_cache = PredictionCache(
+        ttl_seconds=Config.CACHE_TTL_SECONDS,
+        max_entries=Config.CACHE_MAX_ENTRIES,
+        enabled=Config.CACHE_PREDICTIONS,
+    )
+    # One computation per (product_id, days) at a time, shared by concurrent /predict calls
+    predict_flights = SingleFlight(on_join=lambda key: metrics.outcomes.inc("coalesced"))
+    batch_forecaster = BatchForecaster(Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)
+    category_pooling = CategoryPooling(batch_forecaster, prior_days=Config.POOLING_PRIOR_DAYS)
+    # The serving linear trend is always the baseline; other backends compete per product
+    backend_names = ["linear"] + [
+        name for name in Config.FORECAST_BACKENDS
+        if name != "linear" and (Config.ENABLE_SEASONAL_FEATURE or name != SeasonalSmoothingModel.name)
+    ]
+    model_selector = (
+        BackendSelector(backend_names, Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)
+        if len(backend_names) > 1 else None
+    )
+    waste_engine = WasteRiskEngine(horizon_days=Config.MAX_FORECAST_DAYS, history_days=Config.HISTORY_DAYS)
+    # Past waste projections, kept in the ML service's own storage to calibrate later ones
+    waste_projections = ProjectionStore(os.path.join(Config.MODEL_PATH, "waste_projections.sqlite"))
+    sales_tailer = SalesTailer(db_client, model_registry)
+    # Large retrains and backtests read a local copy of the sales table instead of the live database
+    sales_snapshot = SalesSnapshot(Config.SNAPSHOT_PATH) if Config.SNAPSHOT_PATH else None
+    # Backends are chosen per product as it is trained, never on the request path
+    training_scheduler = TrainingScheduler(
+        db_client, model_registry, on_trained=prediction_cache.invalidate, snapshot=sales_snapshot,
+        backends=model_selector.names if model_selector is not None else None,
+    )
+    # With several workers only one runs scheduled retraining, tailing, precompute and waste projections
+    leader_lock = LeaderLock(os.path.join(Config.MODEL_PATH, ".leader.lock"))
+
 
 # Request/Response models
 class PredictionRequest(BaseModel):
@@ -57,7 +128,7 @@ class PredictionRequest(BaseModel):
 class PredictionPoint(BaseModel):
     date: str
     predicted_quantity: float
-    confidence_level: float
+    confidence_level: Optional[float] = None  # Coverage of the lower/upper interval
     lower_bound: Optional[float] = None
     upper_bound: Optional[float] = None
 
@@ -73,25 +144,189 @@ class PredictionResponse(BaseModel):
 class BatchPredictionRequest(BaseModel):
     product_ids: List[str]
     days: int = Field(default=7, ge=1, le=30)
+    include_confidence: bool = Field(default=True, description="Include confidence intervals")
+
+class TrainRequest(BaseModel):
+    product_ids: Optional[List[str]] = Field(default=None, description="Products to retrain (default: all active)")
+
+class PrecomputeRequest(BaseModel):
+    product_ids: Optional[List[str]] = Field(default=None, description="Products to forecast (default: all active)")
+    days: int = Field(default=7, ge=1, le=30)
+
+class BacktestRequest(BaseModel):
+    product_ids: Optional[List[str]] = Field(default=None, description="Products to backtest (default: all active)")
+    horizon: int = Field(default=7, ge=1, le=30)
+    origins: int = Field(default=4, ge=1, le=26)
+    step: int = Field(default=7, ge=1, le=30)
+    backend: str = Field(default="linear", description="Forecasting backend to score, e.g. linear or holt_winters")
+
+class SaleEvent(BaseModel):
+    product_id: str
+    quantity: float
+    sold_at: datetime
+    created_at: datetime = Field(..., description="Sale createdAt, used to skip sales a model already includes")
+
+class SaleEventBatch(BaseModel):
+    events: List[SaleEvent]
 
 class ModelInfo(BaseModel):
     name: str
     version: str
     accuracy: float
-    last_trained: str
+    last_trained: Optional[str]
     status: str
 
+def load_ml_modules():
+    """Import numpy and the ML modules into this module's namespace"""
+    global np, DemandForecaster, horizon_records, quantity_horizon, BatchForecaster, CategoryPooling
+    global BACKENDS, BackendSelector, create_backend, SeasonalSmoothingModel, ModelRegistry
+    global SalesTailer, fold_sales, TrainingScheduler, precompute, run_backtest, forecast_vendor
+    global waste, WasteRiskEngine, rank_waste_risk, record_waste_projections, ProjectionStore
+    global DatabaseClient, created_ms, PredictionCache, SingleFlight, LeaderLock
+    global SalesSnapshot, epoch_day, pending_demand, to_epoch_days, training_end_day, window_start_day, Config
+
+    import numpy as np
+    from prediction.forecaster import DemandForecaster, horizon_records, quantity_horizon
+    from prediction.batch import BatchForecaster
+    from prediction.hierarchy import CategoryPooling
+    from prediction.backends import BACKENDS, BackendSelector, create_backend
+    from prediction.seasonal import SeasonalSmoothingModel
+    from prediction.registry import ModelRegistry
+    from prediction.updates import SalesTailer, fold_sales
+    from training.scheduler import TrainingScheduler
+    from training import precompute
+    from prediction.backtest import run_backtest
+    from prediction.vendor import forecast_vendor
+    from prediction import waste
+    from prediction.waste import WasteRiskEngine, rank_waste_risk, record_waste_projections
+    from prediction.projection_store import ProjectionStore
+    from utils.database import DatabaseClient, created_ms
+    from utils.cache import PredictionCache, SingleFlight
+    from utils.leader import LeaderLock
+    from utils.snapshot import SalesSnapshot
+    from preprocessing.features import epoch_day, pending_demand, to_epoch_days, training_end_day, window_start_day
+    from config.settings import Config
+
+
+def start_services():
+    """Import the ML modules, initialize the services, then start warm-ups and (in the leader worker) background tasks"""
+    global ML_AVAILABLE
+
+    started = time.perf_counter()
+    try:
+        load_ml_modules()
+    except ImportError as e:
+        logger.error(f"ML modules not available, serving fallback responses only: {e}")
+        ML_AVAILABLE = False
+        readiness.update(state="unavailable", error=f"Import failed: {e}")
+        return
+
+    try:
+        init_services()
+    except Exception as e:
+        logger.error(f"ML service initialization failed: {e}")
+        ML_AVAILABLE = False
+        readiness.update(state="unavailable", error=f"Initialization failed: {e}")
+        return
+
+    readiness.update(state="ready", startup_seconds=round(time.perf_counter() - started, 4))
+    logger.info(f"ML services initialized in {readiness['startup_seconds']}s")
+
+    if Config.CATEGORY_POOLING:
+        # Fit category profiles up front so the first sparse product doesn't wait for them
+        warm_up("category_profiles", category_pooling.ensure_fitted, db_client)
+
+    if leader_lock.try_acquire():
+        start_leader_tasks()
+    else:
+        logger.info(f"Worker {os.getpid()} serving only; another worker runs the background tasks")
+        asyncio.create_task(await_leadership())
+
+
+def warm_up(name: str, func, *args):
+    """Run a blocking warm-up step in the background, listed in /health until it finishes"""
+    readiness["warming_up"].append(name)
+
+    async def run():
+        started = time.perf_counter()
+        try:
+            await run_in_threadpool(func, *args)
+            logger.info(f"Warm-up {name} finished in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Warm-up {name} failed: {e}")
+        finally:
+            readiness["warming_up"].remove(name)
+
+    asyncio.create_task(run())
+
+
+async def await_leadership(check_seconds: float = 30):
+    """Take over the background tasks if the leader worker exits"""
+    while not leader_lock.try_acquire():
+        await asyncio.sleep(check_seconds)
+    start_leader_tasks()
+
+
+def start_leader_tasks():
+    """Background work that must run once per deployment, not once per worker"""
+    if Config.ENSURE_INDEXES:
+        warm_up("read_path_indexes", ensure_read_path_indexes)
+
+    if Config.AUTO_RETRAIN:
+        asyncio.create_task(training_scheduler.run_periodic(Config.RETRAIN_INTERVAL_DAYS))
+        logger.info(f"Scheduled retraining every {Config.RETRAIN_INTERVAL_DAYS} days")
+
+    if Config.SALES_TAIL_INTERVAL_SECONDS > 0:
+        asyncio.create_task(sales_tailer.run(Config.SALES_TAIL_INTERVAL_SECONDS))
+        logger.info(f"Sales tailer polling every {Config.SALES_TAIL_INTERVAL_SECONDS}s")
+
+    if Config.PRECOMPUTE_INTERVAL_HOURS > 0:
+        asyncio.create_task(precompute.run_periodic(
+            db_client, forecast_products, Config.PRECOMPUTE_INTERVAL_HOURS, Config.DEFAULT_FORECAST_DAYS
+        ))
+        logger.info(f"Precomputing forecasts every {Config.PRECOMPUTE_INTERVAL_HOURS}h")
+
+    if Config.WASTE_PROJECTION_INTERVAL_HOURS > 0:
+        asyncio.create_task(waste.run_periodic(
+            db_client, waste_engine, forecast_waste_horizon, waste_projections, Config.WASTE_PROJECTION_INTERVAL_HOURS
+        ))
+        logger.info(f"Recording waste projections every {Config.WASTE_PROJECTION_INTERVAL_HOURS}h")
+
+
+def ensure_read_path_indexes():
+    """Switch the backend database to WAL, add the indexes the per-request queries need and log their plans"""
+    db_client.enable_wal()
+    db_client.ensure_indexes()
+    db_client.explain_read_path()
+
+
+def stop_services():
+    """Stop the training worker processes and hand leadership to another worker"""
+    if ML_AVAILABLE:
+        training_scheduler.shutdown()
+        model_registry.close()
+        leader_lock.release()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {
-        "status": "OK",
+    """Health check endpoint; 503 until the ML services are ready"""
+    ready = readiness["state"] == "ready"
+    body = {
+        "status": "OK" if ready else readiness["state"],
         "service": "ML Service",
         "version": "1.0.0",
         "timestamp": datetime.now().isoformat(),
-        "models_loaded": True,  # TODO: Check if models are actually loaded
+        "ready": ready,
+        "models_loaded": model_registry is not None,
+        "stored_models": len(model_registry.store) if model_registry is not None else 0,
+        "startup_seconds": readiness["startup_seconds"],
+        "warming_up": list(readiness["warming_up"]),
+        "error": readiness["error"],
+        "worker_pid": os.getpid(),
+        "leader": bool(leader_lock and leader_lock.is_leader),
     }
+    return body if ready else JSONResponse(body, status_code=503)
 
 # Root endpoint
 @app.get("/")
@@ -112,6 +347,7 @@ async def root():
 
 # Prediction endpoint
 @app.post("/predict", response_model=PredictionResponse)
+@metrics.instrument("predict")
 async def predict(request: PredictionRequest):
     """
     Generate demand forecast for a product
@@ -124,54 +360,9 @@ async def predict(request: PredictionRequest):
         if not ML_AVAILABLE:
             raise HTTPException(status_code=503, detail="ML service not available")
         
-        # Fetch sales history
-        sales_history = db_client.get_sales_history(request.product_id, days=90)
-        
-        if not sales_history:
-            logger.warning(f"No sales history found for product {request.product_id}")
-            # Return fallback predictions
-            return generate_fallback_predictions(request.product_id, request.days)
-        
-        # Get or create forecaster for this product
-        if request.product_id not in forecaster_cache:
-            forecaster_cache[request.product_id] = DemandForecaster()
-        
-        forecaster = forecaster_cache[request.product_id]
-        
-        # Train model on historical data
-        training_result = forecaster.train(sales_history)
-        logger.info(f"Training result: {training_result}")
-        
-        # Generate predictions
-        last_sale_date = datetime.fromisoformat(sales_history[-1]['soldAt'].replace('Z', '+00:00'))
-        predictions_data = forecaster.predict(request.days, last_sale_date)
-        
-        # Convert to PredictionPoint objects
-        predictions = [
-            PredictionPoint(**pred) for pred in predictions_data
-        ]
-        
-        # Get product info for recommendations
-        product_info = db_client.get_product_info(request.product_id)
-        current_stock = product_info['quantity'] if product_info else 0
-        
-        # Generate recommendations
-        recommendations = forecaster.get_recommendations(predictions_data, current_stock)
-        
-        accuracy = training_result.get('accuracy', 0.85)
-        
-        return PredictionResponse(
-            product_id=request.product_id,
-            predictions=predictions,
-            model_used="LinearRegression",
-            accuracy_score=accuracy,
-            generated_at=datetime.now(),
-            recommendations=recommendations,
-            metadata={
-                "training_samples": training_result.get('samples', len(sales_history)),
-                "training_status": training_result.get('status', 'success'),
-                "current_stock": current_stock
-            }
+        # Concurrent requests for the same forecast wait on one computation
+        return await predict_flights.run(
+            (request.product_id, request.days, request.include_confidence), lambda: compute_prediction(request)
         )
         
     except HTTPException:
@@ -181,131 +372,668 @@ async def predict(request: PredictionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def generate_fallback_predictions(product_id: str, days: int) -> PredictionResponse:
-    """Generate fallback predictions when no data available"""
+async def compute_prediction(request: PredictionRequest) -> PredictionResponse:
+    """Forecast for one /predict request, from the cache, a stored model or a fresh fit"""
+    # Serve cached responses until the TTL expires or new sales move the watermark
+    with metrics.stage("db_fetch"):
+        watermark = await run_in_threadpool(db_client.get_sales_watermark, request.product_id)
+    cache_key = (request.product_id, request.days, request.include_confidence, watermark)
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        metrics.outcomes.inc("cache_hit")
+        return cached
+
+    # Reuse the stored model unless new sales arrived or it is due for retraining
+    entry = model_registry.get(request.product_id, watermark) if watermark else None
+
+    if entry is None and watermark:
+        # Serve an outdated model while the scheduler retrains it in the background
+        entry = model_registry.get(request.product_id, watermark, allow_stale=True)
+        if entry is not None:
+            training_scheduler.request_training(request.product_id)
+
+    if entry is None and watermark and not Config.INLINE_TRAINING:
+        # No stored model: keep fitting off the request path, serve the fallback until
+        # the scheduler has stored one. Not cached, so the model is served once it is
+        training_scheduler.request_training(request.product_id)
+        metrics.outcomes.inc("training_queued")
+        return generate_fallback_predictions(
+            request.product_id, request.days, include_confidence=request.include_confidence,
+            training_status="training_queued",
+        )
+
+    if entry is None:
+        # No stored model and INLINE_TRAINING (or no sales at all): the fit is a
+        # closed-form solve over one window, so fit inline
+        # Fetch sales history, aggregated to daily buckets in SQL
+        end_day = training_end_day()
+        since_day = window_start_day(Config.HISTORY_DAYS, end_day, Config.RESAMPLE_BUCKET_DAYS)
+        with metrics.stage("db_fetch"):
+            daily_sales = await run_in_threadpool(
+                db_client.get_daily_sales, request.product_id, since_day, Config.RESAMPLE_BUCKET_DAYS
+            )
+
+        if len(daily_sales['bucket']) == 0:
+            logger.warning(f"No sales history found for product {request.product_id}")
+            # Served from the category profile below, when there is one
+            entry = {
+                'forecaster': DemandForecaster(Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS),
+                'training_result': {"status": "no_data", "samples": 0},
+            }
+        else:
+            # Train model on the resampled demand series
+            forecaster = DemandForecaster(Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)
+            with metrics.stage("feature_prep"):
+                _, series = forecaster.prepare_series(daily_sales['bucket'], daily_sales['quantity'], end_day)
+                pending = pending_demand(np.zeros(len(daily_sales['bucket'])), daily_sales['bucket'],
+                                         daily_sales['quantity'], 1, end_day, Config.RESAMPLE_BUCKET_DAYS)[0]
+            with metrics.stage("train"):
+                training_result = forecaster.train_series(series, end_day, pending)
+            logger.info(f"Training result: {training_result}")
+
+            entry = model_registry.save(request.product_id, forecaster, watermark, training_result)
+            metrics.outcomes.inc("trained")
+            if model_selector is not None and forecaster.is_trained:
+                # Served by the linear trend until the scheduler has chosen its backend
+                training_scheduler.request_training(request.product_id)
+    else:
+        metrics.outcomes.inc("stored_model")
+
+    forecaster = entry['forecaster']
+    training_result = entry['training_result']
+
+    # Get product info for recommendations
+    with metrics.stage("db_fetch"):
+        product_info = await run_in_threadpool(db_client.get_product_info, request.product_id)
+    current_stock = product_info['quantity'] if product_info else 0
+
+    # Too sparse for its own fit: shrink toward the product's category profile
+    if not forecaster.is_trained and Config.CATEGORY_POOLING and product_info:
+        pooled = await run_in_threadpool(
+            category_pooling.forecaster_for, db_client, forecaster.series, product_info.get('category')
+        )
+        if pooled is not None:
+            forecaster, training_result = pooled
+            metrics.outcomes.inc("pooled")
+
+    if training_result.get('status') == 'no_data':
+        metrics.outcomes.inc("no_data")
+        # Return fallback predictions
+        response = generate_fallback_predictions(
+            request.product_id, request.days, include_confidence=request.include_confidence
+        )
+        prediction_cache.set(cache_key, response)
+        return response
+
+    # Serve the backend chosen for this product when it was trained
+    selection = None
+    if model_selector is not None and training_result.get('status') == 'trained' and 'backend' in entry:
+        with metrics.stage("predict"):
+            selection = await run_in_threadpool(
+                model_selector.evaluate, forecaster.series[None, :], entry['backend'], request.days,
+                forecaster.window_end, epoch_day() - forecaster.window_end,
+            )
+        training_result = model_selector.describe(training_result, selection, 0)
+
+    # Generate predictions for the days after today
+    with metrics.stage("predict"):
+        if selection is not None and selection['choice'][0] > 0:
+            spread = model_selector.spread(selection) if request.include_confidence else None
+            predictions_data = horizon_records(quantity_horizon(selection['quantity'], spread=spread), 0)
+        else:
+            predictions_data = forecaster.predict(request.days, include_confidence=request.include_confidence)
+
+    # Convert to PredictionPoint objects
+    predictions = [
+        PredictionPoint(**pred) for pred in predictions_data
+    ]
+
+    # Generate recommendations
+    with metrics.stage("recommendations"):
+        recommendations = forecaster.get_recommendations(predictions_data, current_stock)
+
+    accuracy = training_result.get('accuracy', 0.85)
+
+    response = PredictionResponse(
+        product_id=request.product_id,
+        predictions=predictions,
+        model_used=training_result.get('model', "LinearRegression"),
+        accuracy_score=accuracy,
+        generated_at=datetime.now(),
+        recommendations=recommendations,
+        metadata={
+            "training_samples": training_result.get('samples', 0),
+            "training_status": training_result.get('status', 'success'),
+            "current_stock": current_stock
+        }
+    )
+    prediction_cache.set(cache_key, response)
+
+    return response
+
+
+def generate_fallback_predictions(product_id: str, days: int, include_confidence: bool = True,
+                                  training_status: str = "no_data") -> PredictionResponse:
+    """Generate fallback predictions when there is no sales history to fit, or no model yet"""
     predictions = []
     base_date = datetime.now()
     
     for i in range(days):
         date = base_date + timedelta(days=i+1)
         quantity = 50 + (i * 2.5)
-        predictions.append(PredictionPoint(
-            date=date.strftime("%Y-%m-%d"),
-            predicted_quantity=round(quantity, 2),
-            confidence_level=0.5,
-            lower_bound=round(quantity * 0.8, 2),
-            upper_bound=round(quantity * 1.2, 2),
-        ))
+        point = PredictionPoint(date=date.strftime("%Y-%m-%d"), predicted_quantity=round(quantity, 2))
+        if include_confidence:
+            point.confidence_level = 0.5
+            point.lower_bound = round(quantity * 0.8, 2)
+            point.upper_bound = round(quantity * 1.2, 2)
+        predictions.append(point)
     
+    if training_status == "training_queued":
+        recommendation = "The model for this product is being trained. Predictions are based on default estimates until it is ready."
+    else:
+        recommendation = "No historical data available. Predictions are based on default estimates."
+
     return PredictionResponse(
         product_id=product_id,
         predictions=predictions,
         model_used="Fallback",
         accuracy_score=0.5,
         generated_at=datetime.now(),
-        recommendations=["No historical data available. Predictions are based on default estimates."],
-        metadata={"training_samples": 0, "training_status": "no_data"}
+        recommendations=[recommendation],
+        metadata={"training_samples": 0, "training_status": training_status}
     )
 
 
 # Batch prediction endpoint
+def forecast_products(product_ids: List[str], days: int, end_day: int,
+                      include_confidence: bool = True) -> Tuple[List[Dict], List[float]]:
+    """Fetch and forecast products with pooling and stored backends, with their current stock
+
+    The one forecasting path of every multi-product endpoint; runs on a worker thread.
+    """
+    since_day = window_start_day(Config.HISTORY_DAYS, end_day, Config.RESAMPLE_BUCKET_DAYS)
+    with metrics.stage("db_fetch"):
+        daily_sales = db_client.get_daily_sales_bulk(product_ids, since_day, Config.RESAMPLE_BUCKET_DAYS)
+        products = db_client.get_products_info_bulk(product_ids)
+    current_stock = [
+        products[product_id]['quantity'] if product_id in products else 0
+        for product_id in product_ids
+    ]
+
+    pooling = None
+    categories = None
+    if Config.CATEGORY_POOLING:
+        pooling = category_pooling
+        pooling.ensure_fitted(db_client, end_day)
+        categories = [products.get(product_id, {}).get('category') for product_id in product_ids]
+
+    backends = model_registry.stored_backends(product_ids) if model_selector is not None else None
+    forecasts = batch_forecaster.forecast(
+        product_ids, daily_sales, current_stock, days, end_day,
+        categories=categories, pooling=pooling, selector=model_selector, backends=backends,
+        include_confidence=include_confidence,
+    )
+    return forecasts, current_stock
+
+
+def forecast_waste_horizon(product_ids: List[str]) -> List[Dict]:
+    """Forecast products over the waste engine's horizon; runs on a worker thread"""
+    return forecast_products(product_ids, waste_engine.horizon_days, training_end_day())[0]
+
+
+def forecast_chunk(product_ids: List[str], days: int, end_day: int, include_confidence: bool = True) -> List[tuple]:
+    """Fetch and forecast one chunk of products; runs on a worker thread"""
+    forecasts, current_stock = forecast_products(product_ids, days, end_day, include_confidence)
+    return [
+        (forecast['product_id'], batch_response(forecast, stock, days, include_confidence))
+        for forecast, stock in zip(forecasts, current_stock)
+    ]
+
+
+def batch_response(forecast: Dict, current_stock: float, days: int, include_confidence: bool = True) -> PredictionResponse:
+    """Build the response for one product of a batch forecast"""
+    if forecast['status'] == 'no_data':
+        return generate_fallback_predictions(forecast['product_id'], days, include_confidence=include_confidence)
+
+    training_result = forecast['training']
+    return PredictionResponse(
+        product_id=forecast['product_id'],
+        predictions=[PredictionPoint(**pred) for pred in forecast['predictions']],
+        model_used=training_result.get('model', "LinearRegression"),
+        accuracy_score=training_result.get('accuracy', 0.85),
+        generated_at=datetime.now(),
+        recommendations=forecast['recommendations'],
+        metadata={
+            "training_samples": training_result.get('samples'),
+            "training_status": training_result.get('status', 'success'),
+            "current_stock": current_stock
+        }
+    )
+
+
+async def iter_batch_predictions(product_ids: List[str], days: int, include_confidence: bool = True):
+    """
+    Forecast products in chunks of BATCH_SIZE, yielding (product_id, result) as chunks finish
+
+    Up to MAX_WORKERS chunks run at once on worker threads, so one chunk's DB fetch
+    overlaps another's fitting; the next chunk starts only when one finishes, so memory
+    stays bounded however large the batch. A chunk that fails is retried product by
+    product, and a product that still fails yields an error entry instead of failing
+    the whole batch.
+    """
+    end_day = training_end_day()
+
+    async def run(chunk: List[str]) -> List[tuple]:
+        try:
+            return await run_in_threadpool(forecast_chunk, chunk, days, end_day, include_confidence)
+        except Exception as e:
+            logger.error(f"Batch chunk of {len(chunk)} products failed: {e}")
+            if len(chunk) == 1:
+                metrics.errors.inc("predict_batch_product")
+                return [(chunk[0], {"product_id": chunk[0], "status": "error", "error": str(e)})]
+
+        # Isolate the failing products
+        results = []
+        for product_id in chunk:
+            results.extend(await run([product_id]))
+        return results
+
+    chunks = iter([product_ids[i:i + Config.BATCH_SIZE] for i in range(0, len(product_ids), Config.BATCH_SIZE)])
+    pending = set()
+    try:
+        while True:
+            while len(pending) < Config.MAX_WORKERS:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(asyncio.ensure_future(run(chunk)))
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for item in task.result():
+                    yield item
+    finally:
+        # Stop outstanding chunks if the consumer goes away early
+        for task in pending:
+            task.cancel()
+
+
 @app.post("/predict/batch")
+@metrics.instrument("predict_batch")
 async def batch_predict(request: BatchPredictionRequest):
-    """Generate predictions for multiple products"""
+    """
+    Generate predictions for multiple products
+
+    Products are fetched and fitted in vectorized chunks running concurrently; a product
+    that fails is reported in place instead of failing the batch
+    """
     try:
-        results = []
-        
-        for product_id in request.product_ids:
-            pred_request = PredictionRequest(
-                product_id=product_id,
-                days=request.days
-            )
-            result = await predict(pred_request)
-            results.append(result)
-        
+        logger.info(f"Batch prediction request for {len(request.product_ids)} products, days: {request.days}")
+
+        if not ML_AVAILABLE:
+            raise HTTPException(status_code=503, detail="ML service not available")
+
+        by_product = {}
+        async for product_id, result in iter_batch_predictions(
+            list(dict.fromkeys(request.product_ids)), request.days, request.include_confidence
+        ):
+            by_product[product_id] = result
+
+        results = [by_product[product_id] for product_id in request.product_ids]
+
         return {
             "predictions": results,
             "total_products": len(request.product_ids),
+            "failed": sum(1 for result in by_product.values() if isinstance(result, dict)),
             "generated_at": datetime.now().isoformat(),
         }
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.error(f"Batch prediction failed: {e}")
         raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
 
+@app.post("/predict/batch/stream")
+@metrics.instrument("predict_batch_stream")
+async def batch_predict_stream(request: BatchPredictionRequest):
+    """
+    Stream batch predictions as newline-delimited JSON
+
+    Writes one PredictionResponse (or error entry) per line as soon as its chunk is
+    forecast, in completion order rather than request order
+    """
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    logger.info(f"Streaming batch prediction for {len(request.product_ids)} products, days: {request.days}")
+
+    async def lines():
+        async for _, result in iter_batch_predictions(
+            list(dict.fromkeys(request.product_ids)), request.days, request.include_confidence
+        ):
+            if isinstance(result, dict):
+                yield json.dumps(result) + "\n"
+            else:
+                yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Vendor forecast endpoint
+@app.get("/predict/vendor/{vendor_id}")
+@metrics.instrument("predict_vendor")
+async def predict_vendor(vendor_id: str, days: int = 7):
+    """
+    Forecast every active product of a vendor in one request
+
+    Returns vendor-level demand totals, per-product cover and the SKUs at risk of
+    stocking out, expiring unsold or being overstocked over the horizon
+    """
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+    if not 1 <= days <= Config.MAX_FORECAST_DAYS:
+        raise HTTPException(status_code=422, detail=f"days must be between 1 and {Config.MAX_FORECAST_DAYS}")
+
+    end_day = training_end_day()
+
+    def forecast(product_ids: List[str]) -> List[Dict]:
+        return forecast_products(product_ids, days, end_day, include_confidence=False)[0]
+
+    summary = await run_in_threadpool(forecast_vendor, db_client, vendor_id, days, forecast)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No active products for vendor")
+
+    return {
+        "vendor_id": vendor_id,
+        "days": days,
+        **summary,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+# Waste risk endpoint
+@app.get("/waste/risk")
+@metrics.instrument("waste_risk")
+async def waste_risk(vendor_id: Optional[str] = None, limit: int = 50, sort: str = "units"):
+    """
+    Rank products by expected waste at expiry
+
+    Projects the stock left unsold when each product expires from its demand forecast
+    (as /predict/batch serves it), adds handling losses calibrated on waste_logs, and ranks
+    the whole catalogue (or one vendor's products) by expected units (sort=units) or cost
+    (sort=value). Nothing is recorded; see POST /waste/projections.
+    """
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+    if sort not in ("units", "value"):
+        raise HTTPException(status_code=422, detail="sort must be 'units' or 'value'")
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=422, detail="limit must be between 1 and 1000")
+
+    result = await run_in_threadpool(
+        rank_waste_risk, db_client, waste_engine, forecast_waste_horizon, waste_projections, vendor_id, limit, sort,
+    )
+
+    return {
+        "vendor_id": vendor_id,
+        **result,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+@app.post("/waste/projections")
+@metrics.instrument("waste_projections")
+async def waste_projections_record():
+    """
+    Record waste projections for the whole catalogue now
+
+    The leader also records them every WASTE_PROJECTION_INTERVAL_HOURS. Once projected
+    stock has expired, the expiry waste logged for it calibrates later /waste/risk rankings.
+    """
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    summary = await run_in_threadpool(
+        record_waste_projections, db_client, waste_engine, forecast_waste_horizon, waste_projections,
+    )
+
+    return {
+        **summary,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+# Sale events endpoint
+@app.post("/sales/events")
+async def ingest_sale_events(batch: SaleEventBatch):
+    """
+    Fold newly recorded sales into stored models
+
+    Lets the backend push sales as they happen so models stay current without
+    re-reading history. Products without a stored model are trained on next request.
+    """
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    events = batch.events
+    updated = await run_in_threadpool(
+        fold_sales,
+        model_registry,
+        np.array([e.product_id for e in events], dtype=object),
+        np.array([to_epoch_days(e.sold_at) for e in events], dtype=np.float64),
+        np.array([e.quantity for e in events], dtype=np.float64),
+        np.array([created_ms(e.created_at) for e in events], dtype=np.int64),
+    )
+
+    return {
+        "received": len(events),
+        "models_updated": len(updated),
+        "product_ids": updated,
+    }
+
 # Models info endpoint
 @app.get("/models")
 async def get_models():
-    """Get information about available models"""
-    # TODO: Load actual model information
+    """Get information about the stored forecasting models"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    summary = await run_in_threadpool(model_registry.summary)
+    last_trained = summary["last_trained"]
     models = [
         ModelInfo(
-            name="ARIMA",
-            version="1.0.0",
-            accuracy=0.78,
-            last_trained="2026-01-20",
-            status="active"
-        ),
-        ModelInfo(
-            name="Prophet",
-            version="1.0.0",
-            accuracy=0.83,
-            last_trained="2026-01-20",
-            status="active"
-        ),
-        ModelInfo(
-            name="LSTM",
-            version="1.0.0",
-            accuracy=0.88,
-            last_trained="2026-01-20",
-            status="active"
-        ),
-        ModelInfo(
-            name="Ensemble",
-            version="1.0.0",
-            accuracy=0.89,
-            last_trained="2026-01-20",
-            status="active"
+            name="LinearRegression",
+            version=summary["version"],
+            accuracy=summary["mean_accuracy"] or 0.0,
+            last_trained=last_trained.isoformat() if last_trained else None,
+            status="active" if summary["stored_models"] else "untrained",
         ),
     ]
+    # Backends selected per product at training time, by backtest error
+    selectable = model_selector.backends[1:] if model_selector is not None else []
+    models.extend(
+        ModelInfo(
+            name=backend.label,
+            version=summary["version"],
+            accuracy=0.0,
+            last_trained=None,
+            status="selectable",
+        )
+        for backend in selectable
+    )
     
     return {
         "models": models,
         "total": len(models),
+        "registry": summary,
     }
 
 # Model metrics endpoint
 @app.get("/metrics")
-async def get_metrics():
-    """Get model performance metrics"""
-    # TODO: Implement actual metrics calculation
+async def get_metrics(format: str = "json"):
+    """Get request, latency and model error metrics as JSON or Prometheus text (?format=prometheus)"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    cache = prediction_cache.stats()
+    coalescing = predict_flights.stats()
+    if format == "prometheus":
+        return PlainTextResponse(metrics.to_prometheus(cache, coalescing), media_type="text/plain; version=0.0.4")
+
     return {
-        "overall_accuracy": 0.87,
-        "rmse": 4.2,
-        "mae": 3.1,
-        "mape": 8.5,
-        "predictions_today": 145,
-        "models_trained": 4,
+        **metrics.to_dict(cache, coalescing),
         "last_updated": datetime.now().isoformat(),
     }
 
+# Backtest endpoint
+@app.post("/backtest")
+async def backtest(request: Optional[BacktestRequest] = None):
+    """
+    Rolling-origin backtest of the serving model
+
+    Refits the model at several past origins, scores each forecast against the sales
+    that followed and publishes the overall MAE/RMSE/MAPE in /metrics
+    """
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    request = request or BacktestRequest()
+    if request.backend not in BACKENDS:
+        raise HTTPException(status_code=422, detail=f"backend must be one of {sorted(BACKENDS)}")
+    model = create_backend(request.backend, Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)
+
+    product_ids = request.product_ids
+    if product_ids is None:
+        product_ids = await run_in_threadpool(db_client.get_active_product_ids)
+    product_ids = list(dict.fromkeys(product_ids))
+
+    source = db_client
+    if sales_snapshot is not None:
+        await run_in_threadpool(sales_snapshot.sync, db_client)
+        source = sales_snapshot
+
+    # Score up to yesterday, the last complete day
+    result = await run_in_threadpool(
+        run_backtest, source, product_ids, training_end_day(), request.horizon, request.origins,
+        request.step, Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS, model,
+    )
+    metrics.record_backtest(result["summary"])
+
+    response = {
+        "backend": request.backend,
+        **result["summary"],
+        "generated_at": datetime.now().isoformat(),
+    }
+    if request.product_ids is not None:
+        per_product = result["per_product"]
+        response["per_product"] = [
+            {
+                "product_id": product_id,
+                "scored": int(per_product["scored"][i]),
+                "mae": None if np.isnan(per_product["mae"][i]) else round(float(per_product["mae"][i]), 4),
+                "rmse": None if np.isnan(per_product["rmse"][i]) else round(float(per_product["rmse"][i]), 4),
+                "mape": None if np.isnan(per_product["mape"][i]) else round(float(per_product["mape"][i]), 2),
+            }
+            for i, product_id in enumerate(product_ids)
+        ]
+
+    return response
+
 # Model training endpoint
 @app.post("/train")
-async def train_models():
-    """Trigger model retraining"""
+async def train_models(request: Optional[TrainRequest] = None):
+    """Trigger model retraining in the background"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    product_ids = request.product_ids if request else None
+    job = await run_in_threadpool(training_scheduler.start_job, product_ids)
+
     return {
         "status": "training_started",
         "message": "Model training initiated in background",
-        "estimated_time": "15-30 minutes",
+        "job": job,
         "started_at": datetime.now().isoformat(),
     }
 
+@app.get("/train/jobs")
+async def list_training_jobs():
+    """List background training jobs"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    jobs = training_scheduler.list_jobs()
+    return {
+        "jobs": jobs,
+        "total": len(jobs),
+    }
+
+@app.get("/train/{job_id}")
+async def get_training_job(job_id: str):
+    """Get status and progress of a training job"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    job = training_scheduler.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+
+    return job
+
+# Precomputed forecasts
+@app.post("/predictions/precompute")
+async def precompute_predictions(request: Optional[PrecomputeRequest] = None):
+    """Forecast products in bulk, as /predict/batch serves them, and store the results in the predictions table"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    request = request or PrecomputeRequest()
+    try:
+        summary = await run_in_threadpool(
+            precompute.precompute_forecasts, db_client, forecast_products, request.days, request.product_ids
+        )
+    except Exception as e:
+        logger.error(f"Forecast precompute failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "status": "completed",
+        **summary,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+@app.get("/predictions/{product_id}")
+async def get_precomputed_predictions(product_id: str):
+    """Latest precomputed forecast for a product, from today onwards"""
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML service not available")
+
+    today = datetime.utcnow().date().isoformat()
+    predictions = await run_in_threadpool(db_client.get_precomputed_predictions, product_id, today)
+    if not predictions:
+        raise HTTPException(status_code=404, detail="No precomputed predictions for product")
+
+    return {
+        "product_id": product_id,
+        "predictions": predictions,
+        "generated_at": predictions[0]["created_at"],
+    }
+
 
 # Run server
 if __name__ == "__main__":
+    import uvicorn
+    from config.settings import Config
+
+    # RELOAD=true is the development server; set RELOAD=false and WORKERS=N in production.
+    # Workers share trained models through MODEL_PATH, so it must be the same directory for all
+    if Config.RELOAD and Config.WORKERS > 1:
+        logging.warning("RELOAD=true runs a single worker; set RELOAD=false to use WORKERS")
     uvicorn.run(
         "app:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=Config.HOST,
+        port=Config.PORT,
+        reload=Config.RELOAD,
+        workers=1 if Config.RELOAD else Config.WORKERS,
     )
 
@@ -0,0 +1,221 @@
+"""Throughput, latency, memory and accuracy baseline of the forecasting path
+
+Runs against a database from ``benchmarks.generate_data`` (or any copy of the backend
+database) and prints a JSON report:
+
+- per-stage latency of the single-product path: fetch → feature prep → train → predict
+  → recommendations
+- the bulk path (one query + vectorized fit) for a batch of products
+- end-to-end /predict (cold: trained inline, warm: stored model) and /predict/batch
+- peak Python heap allocation of each path (tracemalloc)
+- a rolling-origin backtest with MAE/RMSE/MAPE
+
+    python -m benchmarks.generate_data --products 10000 --days 730 --path /tmp/bench.sqlite
+    python -m benchmarks.run_benchmarks --path /tmp/bench.sqlite --output baseline.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def latency_stats(samples: List[float]) -> Dict:
+    """Latency percentiles in milliseconds and throughput per second"""
+    values = np.asarray(samples) * 1000
+    total = values.sum() / 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+        "per_second": round(len(values) / total, 1) if total > 0 else None,
+    }
+
+
+def timed(fn: Callable, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(fn: Callable, *args) -> float:
+    """Peak traced heap allocation of one call, in MiB"""
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 2 ** 20, 3)
+
+
+def bench_stages(db_client, product_ids: List[str], days: int, Config, DemandForecaster, window_start_day,
+                 end_day: int) -> Dict:
+    """Time each stage of the single-product path separately"""
+    since_day = window_start_day(Config.HISTORY_DAYS, end_day, Config.RESAMPLE_BUCKET_DAYS)
+    stages = {name: [] for name in ("db_fetch", "feature_prep", "train", "predict", "recommendations")}
+
+    def run_one(product_id: str, record: bool = True):
+        daily, t_fetch = timed(db_client.get_daily_sales, product_id, since_day, Config.RESAMPLE_BUCKET_DAYS)
+        forecaster = DemandForecaster(Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)
+        (_, series), t_prep = timed(forecaster.prepare_series, daily['bucket'], daily['quantity'], end_day)
+        _, t_train = timed(forecaster.train_series, series, end_day)
+        predictions, t_predict = timed(forecaster.predict, days)
+        _, t_recommend = timed(forecaster.get_recommendations, predictions, 100.0)
+
+        if record:
+            for name, value in zip(stages, (t_fetch, t_prep, t_train, t_predict, t_recommend)):
+                stages[name].append(value)
+
+    for product_id in product_ids:
+        run_one(product_id)
+
+    return {
+        "latency": {name: latency_stats(values) for name, values in stages.items()},
+        "peak_memory_mib": peak_memory(run_one, product_ids[0], False),
+    }
+
+
+def bench_bulk(db_client, product_ids: List[str], days: int, batch_size: int, Config, BatchForecaster,
+               window_start_day, end_day: int) -> Dict:
+    """Time the bulk fetch and the vectorized forecast of whole batches"""
+    since_day = window_start_day(Config.HISTORY_DAYS, end_day, Config.RESAMPLE_BUCKET_DAYS)
+    forecaster = BatchForecaster(Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)
+    fetch, forecast = [], []
+
+    def run_batch(batch: List[str], record: bool = True):
+        daily, t_fetch = timed(db_client.get_daily_sales_bulk, batch, since_day, Config.RESAMPLE_BUCKET_DAYS)
+        _, t_forecast = timed(forecaster.forecast, batch, daily, [100.0] * len(batch), days, end_day)
+        if record:
+            fetch.append(t_fetch)
+            forecast.append(t_forecast)
+
+    batches = [product_ids[i:i + batch_size] for i in range(0, len(product_ids), batch_size)]
+    for batch in batches:
+        run_batch(batch)
+
+    total = sum(fetch) + sum(forecast)
+    return {
+        "batch_size": batch_size,
+        "db_fetch": latency_stats(fetch),
+        "forecast": latency_stats(forecast),
+        "products_per_second": round(len(product_ids) / total, 1) if total > 0 else None,
+        "peak_memory_mib": peak_memory(run_batch, batches[0], False),
+    }
+
+
+def bench_endpoints(client, product_ids: List[str], days: int, batch_size: int) -> Dict:
+    """End-to-end latency of /predict (cold and warm) and /predict/batch"""
+    def predict(product_id: str):
+        response = client.post("/predict", json={"product_id": product_id, "days": days})
+        response.raise_for_status()
+
+    def predict_batch(batch: List[str]):
+        response = client.post("/predict/batch", json={"product_ids": batch, "days": days})
+        response.raise_for_status()
+
+    cold = [timed(predict, product_id)[1] for product_id in product_ids]
+    warm = [timed(predict, product_id)[1] for product_id in product_ids]
+
+    batches = [product_ids[i:i + batch_size] for i in range(0, len(product_ids), batch_size)]
+    batch = [timed(predict_batch, ids)[1] for ids in batches]
+
+    return {
+        "predict_cold": latency_stats(cold),
+        "predict_warm": latency_stats(warm),
+        "predict_batch": {
+            **latency_stats(batch),
+            "batch_size": batch_size,
+            "products_per_second": round(len(product_ids) / sum(batch), 1),
+        },
+        "peak_memory_mib": {
+            "predict_warm": peak_memory(predict, product_ids[0]),
+            "predict_batch": peak_memory(predict_batch, batches[0]),
+        },
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark and backtest the forecasting path")
+    parser.add_argument("--path", required=True, help="SQLite database to benchmark against")
+    parser.add_argument("--sample", type=int, default=200, help="Products timed one by one")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--days", type=int, default=7, help="Forecast horizon")
+    parser.add_argument("--backtest-origins", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    # The service reads its configuration on import: point it at the benchmark database,
+    # a throwaway model directory and no background work or response caching
+    os.environ.update({
+        "SQLITE_PATH": os.path.abspath(args.path),
+        "MODEL_PATH": tempfile.mkdtemp(prefix="ml-bench-models-"),
+        "AUTO_RETRAIN": "false",
+        "CACHE_PREDICTIONS": "false",
+        "SALES_TAIL_INTERVAL_SECONDS": "0",
+        "PRECOMPUTE_INTERVAL_HOURS": "0",
+    })
+    logging.basicConfig(level=logging.WARNING)
+
+    from fastapi.testclient import TestClient
+
+    import app
+    from config.settings import Config
+    from prediction.backtest import run_backtest
+    from prediction.batch import BatchForecaster
+    from prediction.forecaster import DemandForecaster
+    from preprocessing.features import training_end_day, window_start_day
+    from utils.database import DatabaseClient
+
+    logging.getLogger().setLevel(logging.WARNING)
+    db_client = DatabaseClient()
+    end_day = training_end_day()
+
+    all_ids = db_client.get_active_product_ids()
+    if not all_ids:
+        sys.exit(f"No active products in {args.path}")
+    rng = np.random.default_rng(args.seed)
+    sample = sorted(rng.choice(all_ids, size=min(args.sample, len(all_ids)), replace=False).tolist())
+
+    report = {
+        "database": os.path.abspath(args.path),
+        "active_products": len(all_ids),
+        "sample": len(sample),
+        "history_days": Config.HISTORY_DAYS,
+        "bucket_days": Config.RESAMPLE_BUCKET_DAYS,
+        "stages": bench_stages(db_client, sample, args.days, Config, DemandForecaster, window_start_day, end_day),
+        "bulk": bench_bulk(db_client, sample, args.days, args.batch_size, Config, BatchForecaster,
+                           window_start_day, end_day),
+    }
+
+    with TestClient(app.app) as client:
+        report["endpoints"] = bench_endpoints(client, sample, args.days, args.batch_size)
+
+    # Score every active product up to yesterday, the last complete day
+    backtest, seconds = timed(
+        run_backtest, db_client, all_ids, end_day, args.days, args.backtest_origins, 7,
+        Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS,
+    )
+    report["backtest"] = {**backtest["summary"], "seconds": round(seconds, 3)}
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,21 +15,36 @@ class Config:
     
     # Database
     DATABASE_URL = os.getenv('DATABASE_URL', '')
+    SQLITE_PATH = os.getenv('SQLITE_PATH', '')  # Defaults to backend/dev_database.sqlite
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))
+    ENSURE_INDEXES = os.getenv('ENSURE_INDEXES', 'true').lower() == 'true'  # Enable WAL and create read-path indexes at startup
     
     # Model Configuration
     MODEL_PATH = os.getenv('MODEL_PATH', './models')
-    MODEL_VERSION = os.getenv('MODEL_VERSION', 'v1.0')
+    MODEL_VERSION = os.getenv('MODEL_VERSION', 'v1.1')
     RETRAIN_INTERVAL_DAYS = int(os.getenv('RETRAIN_INTERVAL_DAYS', 7))
+    HISTORY_DAYS = int(os.getenv('HISTORY_DAYS', 90))
+    RESAMPLE_BUCKET_DAYS = int(os.getenv('RESAMPLE_BUCKET_DAYS', 1))
+    AUTO_RETRAIN = os.getenv('AUTO_RETRAIN', 'true').lower() == 'true'  # Retrain all products every RETRAIN_INTERVAL_DAYS
+    INLINE_TRAINING = os.getenv('INLINE_TRAINING', 'false').lower() == 'true'  # Fit a product without a stored model on its request
+    SALES_TAIL_INTERVAL_SECONDS = float(os.getenv('SALES_TAIL_INTERVAL_SECONDS', 0))  # 0 disables polling
+    PRECOMPUTE_INTERVAL_HOURS = float(os.getenv('PRECOMPUTE_INTERVAL_HOURS', 0))  # 24 for nightly, 0 disables
+    WASTE_PROJECTION_INTERVAL_HOURS = float(os.getenv('WASTE_PROJECTION_INTERVAL_HOURS', 24))  # Record waste projections; 0 disables
     
     # Prediction Settings
     DEFAULT_FORECAST_DAYS = int(os.getenv('DEFAULT_FORECAST_DAYS', 7))
     MAX_FORECAST_DAYS = int(os.getenv('MAX_FORECAST_DAYS', 30))
     CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.7))
+    CATEGORY_POOLING = os.getenv('CATEGORY_POOLING', 'true').lower() == 'true'  # Forecast sparse products from their category
+    POOLING_PRIOR_DAYS = float(os.getenv('POOLING_PRIOR_DAYS', 5))  # Sales days that weigh as much as the category profile
+    PREDICTION_INTERVAL_LEVEL = float(os.getenv('PREDICTION_INTERVAL_LEVEL', 0.8))  # Coverage of lower/upper bounds
+    PREDICTION_INTERVAL_METHOD = os.getenv('PREDICTION_INTERVAL_METHOD', 'normal')  # 'normal' or 'empirical' residual quantiles
     
     # Feature Engineering
     ENABLE_WEATHER_FEATURE = os.getenv('ENABLE_WEATHER_FEATURE', 'false').lower() == 'true'
-    ENABLE_HOLIDAY_FEATURE = os.getenv('ENABLE_HOLIDAY_FEATURE', 'true').lower() == 'true'
-    ENABLE_SEASONAL_FEATURE = os.getenv('ENABLE_SEASONAL_FEATURE', 'true').lower() == 'true'
+    ENABLE_HOLIDAY_FEATURE = os.getenv('ENABLE_HOLIDAY_FEATURE', 'true').lower() == 'true'  # Deprecated: has no effect
+    ENABLE_SEASONAL_FEATURE = os.getenv('ENABLE_SEASONAL_FEATURE', 'true').lower() == 'true'  # Weekly Holt-Winters backend
+    FORECAST_BACKENDS = [b.strip() for b in os.getenv('FORECAST_BACKENDS', 'linear,holt_winters').split(',') if b.strip()]
     
     # External APIs
     WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', '')
@@ -42,9 +57,11 @@ class Config:
     # Cache
     CACHE_PREDICTIONS = os.getenv('CACHE_PREDICTIONS', 'true').lower() == 'true'
     CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 3600))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
     
     # Performance
     BATCH_SIZE = int(os.getenv('BATCH_SIZE', 32))
     MAX_WORKERS = int(os.getenv('MAX_WORKERS', 2))
+    SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', '')  # Columnar sales snapshot for retrains and backtests; empty disables
 
 config = Config()
@@ -0,0 +1,183 @@
+import numpy as np
+from typing import Callable, Dict, List
+import logging
+
+from prediction.backtest import LinearTrendModel, error_summary, rolling_origin_errors
+from prediction.forecaster import normal_spread
+from prediction.param_store import BACKEND_PARAMS
+from prediction.seasonal import SeasonalSmoothingModel
+
+logger = logging.getLogger(__name__)
+
+# A backend is built from (bucket_days, history_days) and fits many series at once:
+#   fit(series, params)      (products, buckets) matrix -> per-product arrays with 'trained',
+#                            and in-sample 'r2', 'mae' and 'rmse'; with ``params`` it refits
+#                            with parameters it chose earlier
+#   params(state)            (products, <= BACKEND_PARAMS) parameters chosen by a fit
+#   forecast(state, ahead)   daily demand for the given buckets after the window
+#   __call__(train, horizon) fit + forecast, the ForecastModel form backtests take
+# and may add backtest(series, horizon, origins, step) to score every origin in one pass,
+# returning the whole-series fit alongside the errors as 'fit'
+BACKENDS: Dict[str, Callable] = {}
+
+
+def register_backend(name: str, factory: Callable) -> None:
+    """Make a forecasting backend available under ``name``"""
+    BACKENDS[name] = factory
+
+
+def create_backend(name: str, bucket_days: int = 1, history_days: int = 90):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown forecasting backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](bucket_days, history_days)
+
+
+register_backend(LinearTrendModel.name, LinearTrendModel)
+register_backend(SeasonalSmoothingModel.name, SeasonalSmoothingModel)
+
+
+class BackendSelector:
+    """Per-product choice of forecasting backend by rolling-origin backtest error
+
+    Every backend is backtested on the products' own training series (the last
+    ``origins`` weeks, one week ahead each) and each product is served by the backend
+    with the lowest MAE. The first backend is the baseline, and its forecasts are left
+    to the caller: another backend replaces it only when its MAE is below ``margin``
+    times the baseline's, so a few weeks of noise don't flip products between models.
+
+    Choosing (``choose``) runs at training time and is stored with the model; serving
+    (``evaluate``) only refits the chosen backend with its stored parameters.
+    """
+
+    def __init__(self, names: List[str], bucket_days: int = 1, history_days: int = 90, origins: int = 3,
+                 margin: float = 0.95):
+        self.backends = [create_backend(name, bucket_days, history_days) for name in names]
+        self.bucket_days = bucket_days
+        self.horizon = -(-7 // bucket_days)  # One week, in buckets
+        self.origins = origins
+        self.margin = margin
+
+    @property
+    def names(self) -> List[str]:
+        return [backend.name for backend in self.backends]
+
+    def select(self, series: np.ndarray) -> Dict:
+        """Backtest MAE of every backend as (products, backends) and the index of the best
+
+        ``fits`` holds the whole-series fits backends produced while backtesting, by index.
+        """
+        n_products, length = series.shape
+        window = length - self.horizon * self.origins
+        mae = np.full((n_products, len(self.backends)), np.inf)
+        fits = {}
+
+        if n_products and window > 0:
+            for k, backend in enumerate(self.backends):
+                if hasattr(backend, 'backtest'):
+                    result = backend.backtest(series, self.horizon, self.origins, self.horizon)
+                    fits[k] = result['fit']
+                else:
+                    result = rolling_origin_errors(series, window, self.horizon, self.origins, self.horizon, backend)
+                mae[:, k] = np.nan_to_num(error_summary(result['errors'], result['actuals'])['mae'], nan=np.inf)
+
+        handicap = np.ones(len(self.backends))
+        handicap[1:] = 1 / self.margin
+        return {'mae': mae, 'choice': np.argmin(mae * handicap, axis=1), 'fits': fits}
+
+    def choose(self, series: np.ndarray) -> Dict[str, np.ndarray]:
+        """Backtest every backend and keep each product's choice in the form the registry stores
+
+        ``backend`` is the chosen backend's name (empty for the baseline), ``backend_mae``
+        and ``baseline_mae`` the backtest errors, and ``backend_params`` the parameters
+        the chosen backend refits with (NaN-padded to BACKEND_PARAMS).
+        """
+        selection = self.select(series)
+        choice, mae, fits = selection['choice'], selection['mae'], selection['fits']
+        n_products = len(series)
+
+        params = np.full((n_products, BACKEND_PARAMS), np.nan)
+        for k, backend in enumerate(self.backends[1:], start=1):
+            rows = np.flatnonzero(choice == k)
+            if not len(rows):
+                continue
+            if k in fits:
+                state = {key: value[rows] if isinstance(value, np.ndarray) else value for key, value in fits[k].items()}
+            else:
+                state = backend.fit(series[rows])
+            chosen = backend.params(state)
+            params[rows, :chosen.shape[1]] = chosen
+
+        names = np.array([''] + self.names[1:])
+        return {
+            'backend': names[choice],
+            'backend_mae': mae[np.arange(n_products), choice],
+            'baseline_mae': mae[:, 0],
+            'backend_params': params,
+        }
+
+    def evaluate(self, series: np.ndarray, stored: Dict[str, np.ndarray], days: int, end_day: int,
+                 offset: int = 0) -> Dict[str, np.ndarray]:
+        """Forecast the days after ``end_day + offset`` with each product's stored choice (see ``choose``)
+
+        Only the chosen backend is refitted, with its stored parameters; nothing is
+        backtested. ``quantity`` is (products, days) daily demand for products whose choice
+        is not the baseline (NaN rows otherwise); ``fit_r2``, ``fit_mae`` and ``fit_rmse``
+        are that backend's in-sample fit. Products whose stored backend is no longer
+        configured are left to the baseline.
+        """
+        n_products = len(series)
+        index = {name: k for k, name in enumerate(self.names) if k > 0}
+        choice = np.array([index.get(name, 0) for name in stored['backend']], dtype=np.int64)
+
+        # Backtest errors as (products, backends), known for the baseline and the choice
+        mae = np.full((n_products, len(self.backends)), np.inf)
+        mae[:, 0] = stored['baseline_mae']
+        switched = np.flatnonzero(choice > 0)
+        mae[switched, choice[switched]] = stored['backend_mae'][switched]
+        mae = np.nan_to_num(mae, nan=np.inf)
+
+        # Bucket holding each forecast day, counted from the window's last bucket
+        day = end_day + offset + np.arange(1, days + 1)
+        ahead = day // self.bucket_days - end_day // self.bucket_days
+
+        quantity = np.full((n_products, days), np.nan)
+        fit = {f"fit_{key}": np.full(n_products, np.nan) for key in ('r2', 'mae', 'rmse')}
+        for k, backend in enumerate(self.backends[1:], start=1):
+            rows = np.flatnonzero(choice == k)
+            if not len(rows):
+                continue
+            params = np.asarray(stored['backend_params'], dtype=np.float64)[rows]
+            state = backend.fit(series[rows], params=params[:, ~np.isnan(params).all(axis=0)])
+            quantity[rows] = backend.forecast(state, ahead)
+            for key in ('r2', 'mae', 'rmse'):
+                fit[f"fit_{key}"][rows] = state[key]
+
+        return {'mae': mae, 'choice': choice, 'quantity': quantity, **fit}
+
+    def spread(self, selection: Dict[str, np.ndarray]) -> np.ndarray:
+        """Interval offsets of every product's selected backend, from its backtest MAE
+
+        The backtest errors are already out of sample over the week ahead, so they are
+        used as they are along the horizon, with σ ≈ MAE·sqrt(π/2) for normal errors.
+        """
+        mae = selection['mae'][np.arange(len(selection['choice'])), selection['choice']]
+        return normal_spread(mae * np.sqrt(np.pi / 2))
+
+    def describe(self, training: Dict, selection: Dict[str, np.ndarray], i: int) -> Dict:
+        """Training result of row ``i`` with the selected backend and the backtest errors"""
+        k = int(selection['choice'][i])
+        training = dict(training, backtest_mae={
+            backend.name: round(float(mae), 4) if np.isfinite(mae) else None
+            for backend, mae in zip(self.backends, selection['mae'][i].tolist())
+        })
+        if k == 0:
+            return training
+
+        training.update({
+            "model": self.backends[k].label,
+            "backend": self.backends[k].name,
+            "accuracy": round(float(selection['fit_r2'][i]), 4),
+            "mae": round(float(selection['fit_mae'][i]), 4),
+            "rmse": round(float(selection['fit_rmse'][i]), 4),
+        })
+        return training
@@ -0,0 +1,150 @@
+import numpy as np
+from typing import Callable, Dict, List, Tuple
+import logging
+
+from prediction.batch import BatchForecaster
+from preprocessing.features import resample_series_bulk, window_end_bucket, window_length
+from utils.database import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+# Fits a (products, buckets) training matrix and returns (products, horizon) daily forecasts
+# and a mask of the products the model could be fitted for
+ForecastModel = Callable[[np.ndarray, int], Tuple[np.ndarray, np.ndarray]]
+
+
+class LinearTrendModel:
+    """The serving model (BatchForecaster's linear trend) in backtest form"""
+
+    name = "linear"
+    label = "LinearRegression"
+
+    def __init__(self, bucket_days: int = 1, history_days: int = 90):
+        self.bucket_days = bucket_days
+        self.forecaster = BatchForecaster(bucket_days, history_days)
+
+    def fit(self, series: np.ndarray, params: np.ndarray = None) -> Dict[str, np.ndarray]:
+        length = series.shape[1]
+        x = (np.arange(length, dtype=np.float64) - (length - 1)) * self.bucket_days
+        return self.forecaster.fit(series, x)
+
+    def params(self, state: Dict[str, np.ndarray]) -> np.ndarray:
+        """Nothing to keep: the trend is a closed-form fit"""
+        return np.zeros((len(state['intercept']), 0))
+
+    def forecast(self, params: Dict[str, np.ndarray], ahead: np.ndarray) -> np.ndarray:
+        """Daily demand ``ahead`` buckets after the window, as (products, len(ahead))"""
+        days = np.asarray(ahead, dtype=np.float64) * self.bucket_days
+        return np.maximum(params['intercept'][:, None] + params['slope'][:, None] * days, 0.0)
+
+    def __call__(self, train: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        params = self.fit(train)
+        return self.forecast(params, np.arange(1, horizon + 1)), params['trained']
+
+
+def rolling_origin_errors(series: np.ndarray, window: int, horizon: int, origins: int, step: int,
+                          model: ForecastModel) -> Dict[str, np.ndarray]:
+    """Forecast errors of ``model`` over several forecast origins, for every product at once
+
+    ``series`` is a (products, buckets) demand matrix ending at the latest bucket. Origin k
+    trains on the ``window`` buckets before it and is scored on the ``horizon`` buckets
+    after it; the last origin's horizon ends at the last bucket and earlier origins step
+    back ``step`` buckets each. Returns the signed errors as (products, origins, horizon)
+    with NaN where the model could not be fitted, alongside the actuals.
+    """
+    n_products, length = series.shape
+    needed = window + horizon + (origins - 1) * step
+    if length < needed:
+        raise ValueError(f"Backtest needs {needed} buckets of history, got {length}")
+
+    errors = np.full((n_products, origins, horizon), np.nan)
+    actuals = np.zeros((n_products, origins, horizon))
+
+    for k in range(origins):
+        origin = length - horizon - (origins - 1 - k) * step  # First forecast bucket
+        train = series[:, origin - window:origin]
+        actual = series[:, origin:origin + horizon]
+
+        forecast, fitted = model(train, horizon)
+        errors[fitted, k] = forecast[fitted] - actual[fitted]
+        actuals[:, k] = actual
+
+    return {'errors': errors, 'actuals': actuals}
+
+
+def error_summary(errors: np.ndarray, actuals: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-product MAE, RMSE and MAPE (over buckets with demand) of rolling-origin errors"""
+    flat_errors = errors.reshape(len(errors), -1)
+    flat_actuals = actuals.reshape(len(actuals), -1)
+    scored = ~np.isnan(flat_errors)
+    absolute = np.where(scored, np.abs(flat_errors), 0.0)
+    with_demand = scored & (flat_actuals > 0)
+
+    n_scored = scored.sum(axis=1)
+    n_demand = with_demand.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = np.where(with_demand, absolute / flat_actuals, 0.0)
+        return {
+            'mae': np.where(n_scored > 0, absolute.sum(axis=1) / n_scored, np.nan),
+            'rmse': np.where(n_scored > 0, np.sqrt((absolute ** 2).sum(axis=1) / n_scored), np.nan),
+            'mape': np.where(n_demand > 0, percentage.sum(axis=1) / n_demand * 100, np.nan),
+            'scored': n_scored,
+        }
+
+
+def _overall(errors: np.ndarray, actuals: np.ndarray) -> Dict:
+    scored = ~np.isnan(errors)
+    if not scored.any():
+        return {"mae": None, "rmse": None, "mape": None, "wape": None}
+
+    error = errors[scored]
+    actual = actuals[scored]
+    demand = actual > 0
+    return {
+        "mae": round(float(np.abs(error).mean()), 4),
+        "rmse": round(float(np.sqrt((error ** 2).mean())), 4),
+        "mape": round(float((np.abs(error[demand]) / actual[demand]).mean() * 100), 2) if demand.any() else None,
+        "wape": round(float(np.abs(error).sum() / actual.sum() * 100), 2) if actual.sum() > 0 else None,
+    }
+
+
+def backtest_series(series: np.ndarray, horizon: int = 7, origins: int = 4, step: int = 7,
+                    bucket_days: int = 1, history_days: int = 90, model: ForecastModel = None) -> Dict:
+    """Rolling-origin backtest of a (products, buckets) demand matrix"""
+    window = window_length(history_days, bucket_days)
+    model = model or LinearTrendModel(bucket_days, history_days)
+    result = rolling_origin_errors(series, window, horizon, origins, step, model)
+
+    per_product = error_summary(result['errors'], result['actuals'])
+    summary = {
+        "products": len(series),
+        "products_scored": int(np.count_nonzero(per_product['scored'])),
+        "origins": origins,
+        "horizon": horizon,
+        "step": step,
+        **_overall(result['errors'], result['actuals']),
+    }
+    return {"summary": summary, "per_product": per_product}
+
+
+def run_backtest(db_client: DatabaseClient, product_ids: List[str], end_day: int, horizon: int = 7,
+                 origins: int = 4, step: int = 7, bucket_days: int = 1, history_days: int = 90,
+                 model: ForecastModel = None) -> Dict:
+    """Fetch enough history for every origin and backtest the given products
+
+    Horizon and step are in buckets of ``bucket_days`` days. The last origin is scored
+    against the most recent ``horizon`` buckets up to ``end_day``. ``db_client`` may
+    also be a SalesSnapshot.
+    """
+    length = window_length(history_days, bucket_days) + horizon + (origins - 1) * step
+    since_day = (window_end_bucket(end_day, bucket_days) - length + 1) * bucket_days
+
+    daily = db_client.get_daily_sales_bulk(product_ids, since_day, bucket_days)
+    series = resample_series_bulk(
+        daily['product_index'], daily['bucket'], daily['quantity'],
+        len(product_ids), length, end_day, bucket_days,
+    )
+
+    result = backtest_series(series, horizon, origins, step, bucket_days, history_days, model)
+    logger.info(f"Backtest over {len(product_ids)} products: {result['summary']}")
+    return result
@@ -0,0 +1,185 @@
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+import logging
+
+from prediction.forecaster import (
+    DemandForecaster, fallback_horizon, forecast_horizon, horizon_records, quantity_horizon, recommend_bulk,
+    residual_spread,
+)
+from preprocessing.features import epoch_day, resample_series_bulk, series_days, window_length
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BatchForecaster:
+    """Vectorized demand forecasting for many products at once
+
+    Fits the same model as DemandForecaster (a linear trend over the resampled daily
+    demand series) for every product together: the series are stacked into one
+    (products, days) matrix sharing a single design, so all fits are a few matrix ops.
+    """
+
+    MIN_SALES_DAYS = DemandForecaster.MIN_SALES_DAYS
+
+    def __init__(self, bucket_days: int = 1, history_days: int = 90):
+        self.bucket_days = bucket_days
+        self.history_days = history_days
+
+    def build_series(self, daily: Dict[str, np.ndarray], n_products: int, end_day: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Stack every product's zero-filled demand series and the shared day offsets"""
+        length = window_length(self.history_days, self.bucket_days)
+        series = resample_series_bulk(
+            daily['product_index'], daily['bucket'], daily['quantity'],
+            n_products, length, end_day, self.bucket_days,
+        )
+        return series, series_days(length, end_day, self.bucket_days)
+
+    def fit(self, series: np.ndarray, x: np.ndarray) -> Dict[str, np.ndarray]:
+        """Solve every per-product least-squares fit together in closed form"""
+        sales_days = np.count_nonzero(series, axis=1)
+
+        # Every product shares the design [1, x], so the normal equations reduce to
+        # one centered dot product per product
+        mean_x = x.mean()
+        centered_x = x - mean_x
+        sxx = centered_x @ centered_x
+        mean_y = series.mean(axis=1)
+        slope = series @ centered_x / sxx if sxx > 0 else np.zeros(len(series))
+        intercept = mean_y - slope * mean_x
+
+        # R² per product
+        residual = series - (intercept[:, None] + slope[:, None] * x)
+        ss_res = np.einsum('ij,ij->i', residual, residual)
+        deviation = series - mean_y[:, None]
+        ss_tot = np.einsum('ij,ij->i', deviation, deviation)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(ss_tot > 0, 1.0 - ss_res / ss_tot, np.where(ss_res < 1e-12, 1.0, 0.0))
+
+        return {
+            'sales_days': sales_days,
+            'intercept': intercept,
+            'slope': slope,
+            'r2': r2,
+            'mae': np.abs(residual).mean(axis=1),
+            'rmse': np.sqrt(ss_res / series.shape[1]),
+            'trained': sales_days >= self.MIN_SALES_DAYS,
+        }
+
+    def predict(self, params: Dict[str, np.ndarray], days: int, offset: int = 0,
+                series: np.ndarray = None, x: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Predict the forecast horizon for every product as (products, days) arrays
+
+        ``offset`` is the number of days between the training window end and today. Given
+        the fitted ``series`` and their day offsets ``x``, the horizon has prediction intervals.
+        """
+        spread = None
+        if series is not None and x is not None:
+            spread = residual_spread(self.residuals(series, x, params['intercept'], params['slope']))
+        return forecast_horizon(params['intercept'], params['slope'], days, offset, spread=spread, x=x)
+
+    @staticmethod
+    def residuals(series: np.ndarray, x: np.ndarray, intercept: np.ndarray, slope: np.ndarray) -> np.ndarray:
+        """Each series' deviations from its trend, as a (products, length) matrix"""
+        return series - (intercept[:, None] + slope[:, None] * x)
+
+    def forecast(self, product_ids: List[str], daily: Dict[str, np.ndarray],
+                 current_stock: List[float], days: int, end_day: int,
+                 categories: List[Optional[str]] = None, pooling=None, selector=None,
+                 backends: Dict[str, np.ndarray] = None, include_confidence: bool = True) -> List[Dict]:
+        """Forecast every product from bucketed sales and build per-product results in request order
+
+        With ``pooling`` (a CategoryPooling) and the products' ``categories``, products
+        too sparse for their own fit are forecast from their category profile. With a
+        ``selector`` (a BackendSelector) and the products' stored ``backends`` choice
+        (see ``ModelRegistry.stored_backends``) fitted products are served by the backend
+        chosen for them at training time. Prediction intervals are skipped without
+        ``include_confidence``. The horizon starts after today, however long ago ``end_day`` was.
+        """
+        offset = epoch_day() - end_day
+        with metrics.stage("feature_prep"):
+            series, x = self.build_series(daily, len(product_ids), end_day)
+        with metrics.stage("train"):
+            params = self.fit(series, x)
+
+            fitted_rows = np.flatnonzero(params['trained'])
+            selection = None
+            if selector is not None and backends is not None and len(fitted_rows):
+                stored = {key: value[fitted_rows] for key, value in backends.items()}
+                selection = selector.evaluate(series[fitted_rows], stored, days, end_day, offset)
+        has_sales = np.bincount(daily['product_index'], minlength=len(product_ids)) > 0
+
+        intercept, slope = params['intercept'], params['slope']
+        pooled = np.zeros(len(product_ids), dtype=bool)
+        if pooling is not None and categories is not None:
+            pool = pooling.shrink(series, categories)
+            pooled = pool['pooled'] & ~params['trained']
+            intercept = np.where(pooled, pool['intercept'], intercept)
+            slope = np.where(pooled, pool['slope'], slope)
+
+        with metrics.stage("predict"):
+            # Intervals from each series' residuals around the trend it is served;
+            # a category trend was not fitted on the product's own series
+            spread = None
+            if include_confidence:
+                residual = self.residuals(series, x, intercept, slope)
+                spread = residual_spread(residual, np.where(pooled, 0, 2))
+
+            # Products with neither a fit nor a category profile get the fallback horizon
+            horizon = forecast_horizon(intercept, slope, days, offset, spread=spread, x=x)
+            fallback = fallback_horizon(len(product_ids), days)
+            fitted = (params['trained'] | pooled)[:, None]
+            horizon = {key: np.where(fitted, horizon[key], fallback[key]) for key in horizon}
+
+            if selection is not None:
+                # Products another backend backtested better on take that backend's forecast
+                switched = selection['choice'] > 0
+                if switched.any():
+                    selected_spread = selector.spread(selection)[switched] if include_confidence else None
+                    selected = quantity_horizon(selection['quantity'][switched], spread=selected_spread)
+                    for key in horizon:
+                        horizon[key][fitted_rows[switched]] = selected[key]
+
+        with metrics.stage("recommendations"):
+            recommendations = recommend_bulk(horizon['predicted_quantity'], np.asarray(current_stock, dtype=np.float64))
+
+        results = []
+        for i, product_id in enumerate(product_ids):
+            if not has_sales[i] and not pooled[i]:
+                results.append({'product_id': product_id, 'status': 'no_data'})
+                continue
+
+            sales_days = int(params['sales_days'][i])
+
+            if pooled[i]:
+                training = pooling.describe(pool, i, categories[i])
+            elif params['trained'][i]:
+                training = {
+                    "status": "trained",
+                    "samples": sales_days,
+                    "series_length": len(x),
+                    "accuracy": round(float(params['r2'][i]), 4),
+                    "coefficient": round(float(params['slope'][i]), 4),
+                    "intercept": round(float(params['intercept'][i]), 4),
+                    "mae": round(float(params['mae'][i]), 4),
+                    "rmse": round(float(params['rmse'][i]), 4),
+                }
+                if selection is not None:
+                    training = selector.describe(training, selection, int(np.searchsorted(fitted_rows, i)))
+            else:
+                training = {
+                    "status": "insufficient_data",
+                    "message": f"Need sales on at least {self.MIN_SALES_DAYS} days",
+                    "samples": sales_days,
+                }
+
+            results.append({
+                'product_id': product_id,
+                'status': training['status'],
+                'predictions': horizon_records(horizon, i),
+                'training': training,
+                'recommendations': recommendations[i],
+            })
+
+        logger.info(f"Batch forecast generated for {len(product_ids)} products")
+        return results
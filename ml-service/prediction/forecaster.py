@@ -1,76 +1,90 @@
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+from statistics import NormalDist
 from typing import List, Tuple, Dict
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
 import logging
 
+from config.settings import Config
+from preprocessing.features import (
+    bucket_sales, epoch_day, pending_demand, resample_series, series_days, training_end_day, window_end_bucket,
+    window_length,
+)
+
 logger = logging.getLogger(__name__)
 
+
 class DemandForecaster:
-    """Simple demand forecasting using moving average and linear regression"""
+    """Simple demand forecasting using moving average and linear regression
+
+    Sales are resampled into a fixed-length, zero-filled series of daily demand
+    (optionally in buckets of several days) ending on the last complete day before
+    training, and the trend is fitted on day offsets relative to that day. Demand in
+    the bucket still in progress is kept aside as ``pending`` until the window reaches it.
+
+    The fit is kept as sufficient statistics of the series (sums of y, t·y and y²
+    over the bucket index t), so new sales and window shifts are folded in with
+    ``update`` in O(new rows) and the least-squares solution is re-derived in O(1).
+    """
+    
+    MIN_SALES_DAYS = 3
     
-    def __init__(self):
-        self.model = LinearRegression()
-        self.scaler = StandardScaler()
+    def __init__(self, bucket_days: int = 1, history_days: int = 90):
         self.is_trained = False
+        self.bucket_days = bucket_days
+        self.history_days = history_days
+        self.length = window_length(history_days, bucket_days)
+        self.window_end = None  # Last day of the training window (days since epoch)
+        self.first_bucket = None  # Bucket index of series[0]
+        self.series = np.zeros(self.length)
+        self.pending = 0.0  # Daily demand in the bucket after the window, not yet part of the fit
+        self.intercept = 0.0
+        self.slope = 0.0
+        self.r2 = 0.0
+        self.fitted_params = 2  # Parameters fitted on the series, for the residual degrees of freedom
+        # Sufficient statistics over the bucket index t = 0..length-1
+        self._sum_y = 0.0
+        self._sum_ty = 0.0
+        self._sum_yy = 0.0
+        self._sales_days = 0
     
-    def prepare_features(self, sales_data: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
-        """Prepare features from sales data"""
-        if not sales_data:
-            return np.array([]), np.array([])
-        
-        # Extract dates and quantities
-        dates = []
-        quantities = []
+    def prepare_series(self, bucket: np.ndarray, quantity: np.ndarray, end_day: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-fill bucketed sales into the fixed-length training series"""
+        if end_day is None:
+            end_day = training_end_day()
         
-        for sale in sales_data:
-            date_str = sale.get('soldAt') or sale.get('sold_at')
-            if date_str:
-                dates.append(datetime.fromisoformat(date_str.replace('Z', '+00:00')))
-                quantities.append(float(sale.get('quantity', 0)))
-        
-        if not dates:
-            return np.array([]), np.array([])
-        
-        # Sort by date
-        sorted_data = sorted(zip(dates, quantities), key=lambda x: x[0])
-        dates, quantities = zip(*sorted_data)
-        
-        # Convert to numerical features (days since first date)
-        base_date = dates[0]
-        X = np.array([(d - base_date).days for d in dates]).reshape(-1, 1)
-        y = np.array(quantities)
+        y = resample_series(bucket, quantity, self.length, end_day, self.bucket_days)
+        X = series_days(self.length, end_day, self.bucket_days).reshape(-1, 1)
         
         return X, y
     
-    def train(self, sales_data: List[Dict]) -> Dict:
-        """Train the forecasting model"""
+    def train_columnar(self, sold_day: np.ndarray, quantity: np.ndarray, end_day: int = None) -> Dict:
+        """Train the forecasting model from columnar sales arrays (days since epoch, quantity)"""
+        end_day = training_end_day() if end_day is None else end_day
+        bucket, totals, _ = bucket_sales(sold_day, quantity, self.bucket_days)
+        self.pending = float(pending_demand(np.zeros(len(bucket)), bucket, totals, 1, end_day, self.bucket_days)[0])
+        return self._fit(*self.prepare_series(bucket, totals, end_day), end_day)
+    
+    def train_series(self, series: np.ndarray, end_day: int = None, pending: float = 0.0) -> Dict:
+        """Train the forecasting model from an already resampled demand series
+
+        ``pending`` is the daily demand recorded so far in the bucket after the window.
+        """
+        self.pending = float(pending)
+        return self._fit(None, series, end_day)
+    
+    def _fit(self, X: np.ndarray, y: np.ndarray, end_day: int = None) -> Dict:
         try:
-            X, y = self.prepare_features(sales_data)
+            self.window_end = training_end_day() if end_day is None else end_day
+            self.first_bucket = window_end_bucket(self.window_end, self.bucket_days) - self.length + 1
+            self.series = np.asarray(y, dtype=np.float64).copy()
             
-            if len(X) < 3:
-                logger.warning("Insufficient data for training")
-                return {
-                    "status": "insufficient_data",
-                    "message": "Need at least 3 sales records",
-                    "samples": len(X)
-                }
+            t = np.arange(self.length, dtype=np.float64)
+            self._sum_y = float(self.series.sum())
+            self._sum_ty = float(t @ self.series)
+            self._sum_yy = float(self.series @ self.series)
+            self._sales_days = int(np.count_nonzero(self.series))
             
-            # Train model
-            self.model.fit(X, y)
-            self.is_trained = True
-            
-            # Calculate accuracy (R² score)
-            score = self.model.score(X, y)
-            
-            return {
-                "status": "trained",
-                "samples": len(X),
-                "accuracy": round(score, 4),
-                "coefficient": round(float(self.model.coef_[0]), 4),
-                "intercept": round(float(self.model.intercept_), 4)
-            }
+            return self._solve()
         
         except Exception as e:
             logger.error(f"Training failed: {e}")
@@ -79,106 +93,351 @@ class DemandForecaster:
                 "message": str(e)
             }
     
-    def predict(self, days: int, last_date: datetime = None) -> List[Dict]:
-        """Generate demand forecast"""
+    def _solve(self) -> Dict:
+        """Derive the least-squares trend from the sufficient statistics"""
+        if self._sales_days < self.MIN_SALES_DAYS:
+            logger.warning("Insufficient data for training")
+            self.is_trained = False
+            return {
+                "status": "insufficient_data",
+                "message": f"Need sales on at least {self.MIN_SALES_DAYS} days",
+                "samples": self._sales_days
+            }
+        
+        # Closed-form sums of t and t² for t = 0..n-1
+        n = self.length
+        sum_t = n * (n - 1) / 2
+        sum_tt = (n - 1) * n * (2 * n - 1) / 6
+        
+        s_tt = sum_tt - sum_t * sum_t / n
+        s_ty = self._sum_ty - sum_t * self._sum_y / n
+        s_yy = max(self._sum_yy - self._sum_y * self._sum_y / n, 0.0)
+        
+        slope_t = s_ty / s_tt if s_tt > 0 else 0.0
+        intercept_t = self._sum_y / n - slope_t * sum_t / n
+        
+        # Bucket index t sits at day offset x = t * bucket_days + shift from the window end
+        shift = self.first_bucket * self.bucket_days - self.window_end
+        self.slope = slope_t / self.bucket_days
+        self.intercept = intercept_t - self.slope * shift
+        
+        # R² = explained / total variance (1.0 for a perfectly flat series)
+        if s_yy > 1e-12:
+            self.r2 = min(1.0, s_ty * s_ty / (s_tt * s_yy)) if s_tt > 0 else 0.0
+        else:
+            self.r2 = 1.0
+        
+        # In-sample error of the trend, in units per day
+        residual = self.series - (intercept_t + slope_t * np.arange(n))
+        
+        self.is_trained = True
+        
+        return {
+            "status": "trained",
+            "samples": self._sales_days,
+            "series_length": n,
+            "accuracy": round(self.r2, 4),
+            "coefficient": round(self.slope, 4),
+            "intercept": round(self.intercept, 4),
+            "mae": round(float(np.abs(residual).mean()), 4),
+            "rmse": round(float(np.sqrt(residual @ residual / n)), 4),
+        }
+    
+    def use_trend(self, intercept: float, slope: float, end_day: int, series: np.ndarray = None) -> None:
+        """Serve a trend fitted elsewhere (e.g. a category profile) for the window ending on end_day
+
+        The product's own ``series``, when given, sets its forecast intervals.
+        """
+        self.window_end = end_day
+        self.intercept = float(intercept)
+        self.slope = float(slope)
+        self.fitted_params = 0
+        if series is not None:
+            self.series = np.asarray(series, dtype=np.float64).copy()
+        self.is_trained = True
+    
+    def update(self, sold_day: np.ndarray, quantity: np.ndarray, end_day: int = None) -> Dict:
+        """Fold new sales into the fitted state without re-reading history
+
+        Slides the window forward to ``end_day`` (default: yesterday), adds the new
+        quantities to their buckets and re-solves the fit. Sales in the bucket after the
+        window go to ``pending``. Cost is proportional to the number of new rows and
+        elapsed buckets.
+        """
+        if self.window_end is None:
+            return self.train_columnar(sold_day, quantity, end_day)
+        
+        sold_day = np.asarray(sold_day, dtype=np.float64)
+        quantity = np.asarray(quantity, dtype=np.float64)
+        
+        if end_day is None:
+            end_day = training_end_day()
+        if end_day > self.window_end:
+            self._advance(end_day)
+        
+        if len(sold_day):
+            bucket, totals, _ = bucket_sales(sold_day, quantity, self.bucket_days)
+            position = bucket - self.first_bucket
+            self.pending += float(totals[position == self.length].sum()) / self.bucket_days
+            in_window = (position >= 0) & (position < self.length)
+            position, delta = position[in_window], totals[in_window] / self.bucket_days
+            
+            old = self.series[position]
+            new = old + delta
+            self.series[position] = new
+            
+            self._sum_y += float(delta.sum())
+            self._sum_ty += float(position @ delta)
+            self._sum_yy += float(new @ new - old @ old)
+            self._sales_days += int(np.count_nonzero(new)) - int(np.count_nonzero(old))
+        
+        return self._solve()
+    
+    def _advance(self, end_day: int) -> None:
+        """Slide the training window so it ends on end_day"""
+        shift = window_end_bucket(end_day, self.bucket_days) - window_end_bucket(self.window_end, self.bucket_days)
+        self.window_end = end_day
+        if shift <= 0:
+            return
+        
+        pending, self.pending = self.pending, 0.0
+        if shift >= self.length:
+            self.series = np.zeros(self.length)
+            self._sum_y = self._sum_ty = self._sum_yy = 0.0
+            self._sales_days = 0
+        else:
+            dropped = self.series[:shift]
+            self._sum_y -= float(dropped.sum())
+            self._sum_ty -= float(np.arange(shift) @ dropped)
+            self._sum_yy -= float(dropped @ dropped)
+            self._sales_days -= int(np.count_nonzero(dropped))
+            # Remaining buckets move shift places towards t = 0
+            self._sum_ty -= shift * self._sum_y
+            self.series = np.concatenate([self.series[shift:], np.zeros(shift)])
+        
+        self.first_bucket += shift
+        
+        # The bucket that was in progress is now complete and inside the window
+        position = self.length - shift
+        if position >= 0 and pending > 0:
+            self.series[position] = pending
+            self._sum_y += pending
+            self._sum_ty += position * pending
+            self._sum_yy += pending * pending
+            self._sales_days += 1
+    
+    def predict(self, days: int, last_date: datetime = None, include_confidence: bool = True) -> List[Dict]:
+        """Generate demand forecast for the days following last_date (default: today)
+
+        Prediction intervals come from the residuals of the series around the trend;
+        without ``include_confidence`` they are not computed.
+        """
         if not self.is_trained:
             # Return default predictions based on moving average
-            return self._fallback_predict(days)
+            return self._fallback_predict(days, include_confidence)
         
         try:
             if last_date is None:
-                last_date = datetime.now()
-            
-            predictions = []
-            base_day = 0  # Days since training base
+                last_date = datetime.utcnow()
             
-            for i in range(days):
-                day = base_day + i + 1
-                X_pred = np.array([[day]])
-                
-                # Predict quantity
-                pred_quantity = float(self.model.predict(X_pred)[0])
-                pred_quantity = max(0, pred_quantity)  # No negative predictions
-                
-                # Calculate confidence interval (simple approach)
-                confidence = 0.85 if pred_quantity > 0 else 0.5
-                margin = pred_quantity * 0.15
-                
-                date = last_date + timedelta(days=i+1)
-                
-                predictions.append({
-                    "date": date.strftime("%Y-%m-%d"),
-                    "predicted_quantity": round(pred_quantity, 2),
-                    "confidence_level": confidence,
-                    "lower_bound": round(max(0, pred_quantity - margin), 2),
-                    "upper_bound": round(pred_quantity + margin, 2)
-                })
+            spread = x = None
+            if include_confidence:
+                x = series_days(self.length, self.window_end, self.bucket_days)
+                residual = self.series - (self.intercept + self.slope * x)
+                spread = residual_spread(residual[None, :], self.fitted_params)
             
-            return predictions
+            offset = epoch_day(last_date) - self.window_end  # Days since training window end
+            horizon = forecast_horizon(
+                np.array([self.intercept]), np.array([self.slope]), days, offset, last_date, spread, x
+            )
+            return horizon_records(horizon, 0)
         
         except Exception as e:
             logger.error(f"Prediction failed: {e}")
-            return self._fallback_predict(days)
+            return self._fallback_predict(days, include_confidence)
     
-    def _fallback_predict(self, days: int) -> List[Dict]:
+    def _fallback_predict(self, days: int, include_confidence: bool = True) -> List[Dict]:
         """Fallback prediction when model is not trained"""
-        predictions = []
-        base_date = datetime.now()
-        base_quantity = 50.0  # Default baseline
-        
-        for i in range(days):
-            date = base_date + timedelta(days=i+1)
-            quantity = base_quantity + (i * 2.0)  # Simple linear increase
-            
-            predictions.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "predicted_quantity": round(quantity, 2),
-                "confidence_level": 0.6,
-                "lower_bound": round(quantity * 0.8, 2),
-                "upper_bound": round(quantity * 1.2, 2)
-            })
-        
-        return predictions
+        horizon = fallback_horizon(1, days)
+        if not include_confidence:
+            horizon = {key: horizon[key] for key in ('date', 'predicted_quantity')}
+        return horizon_records(horizon, 0)
     
     def get_recommendations(self, predictions: List[Dict], current_stock: float) -> List[str]:
         """Generate inventory recommendations based on predictions"""
-        recommendations = []
-        
         if not predictions:
             return ["Insufficient data for recommendations"]
         
-        # Calculate total predicted demand
-        total_demand = sum(p['predicted_quantity'] for p in predictions)
-        avg_daily_demand = total_demand / len(predictions)
-        
-        # Stock level recommendations
-        if current_stock < avg_daily_demand * 2:
-            recommendations.append(f"⚠️ Low stock warning: Restock soon (current: {current_stock:.0f}, avg daily: {avg_daily_demand:.0f})")
-        
-        if current_stock > avg_daily_demand * 10:
-            recommendations.append(f"📦 High stock: Consider reducing orders (current: {current_stock:.0f}, avg daily: {avg_daily_demand:.0f})")
-        
-        # Trend analysis
-        if len(predictions) >= 3:
-            first_half = predictions[:len(predictions)//2]
-            second_half = predictions[len(predictions)//2:]
-            
-            avg_first = sum(p['predicted_quantity'] for p in first_half) / len(first_half)
-            avg_second = sum(p['predicted_quantity'] for p in second_half) / len(second_half)
-            
-            if avg_second > avg_first * 1.2:
-                recommendations.append("📈 Demand increasing: Consider ordering more stock")
-            elif avg_second < avg_first * 0.8:
-                recommendations.append("📉 Demand decreasing: Reduce order quantities")
-        
-        # Optimal order quantity
-        safety_stock = avg_daily_demand * 2
-        optimal_order = max(0, (avg_daily_demand * 7) - current_stock + safety_stock)
-        
-        if optimal_order > 0:
-            recommendations.append(f"💡 Suggested order quantity: {optimal_order:.0f} units for next 7 days")
-        
-        if not recommendations:
-            recommendations.append("✅ Stock levels look good!")
-        
-        return recommendations
+        quantity = np.fromiter((p['predicted_quantity'] for p in predictions), dtype=np.float64, count=len(predictions))
+        return recommend_bulk(quantity[None, :], np.array([current_stock], dtype=np.float64))[0]
+
+
+def _horizon_dates(start: datetime, days: int) -> np.ndarray:
+    """ISO dates of the ``days`` days following ``start``"""
+    first = np.datetime64(start.date(), 'D')
+    return np.datetime_as_string(first + np.arange(1, days + 1), unit='D')
+
+
+def residual_spread(residual: np.ndarray, ddof=2) -> np.ndarray:
+    """Interval offsets below and above the forecast as (products, 2), from (products, length) residuals
+
+    ``PREDICTION_INTERVAL_METHOD`` ``normal`` takes ±z·σ, σ the residual standard error
+    after ``ddof`` fitted parameters (per product or shared); ``empirical`` takes the
+    residuals' own quantiles, which keeps the skew of intermittent demand.
+    """
+    n = residual.shape[1]
+    dof = np.maximum(n - np.asarray(ddof, dtype=np.float64), 1.0)
+
+    if Config.PREDICTION_INTERVAL_METHOD == 'empirical':
+        tail = (1 - Config.PREDICTION_INTERVAL_LEVEL) / 2
+        low, high = np.quantile(residual, [tail, 1 - tail], axis=1)
+        return np.stack([low, high], axis=1) * np.sqrt(n / dof).reshape(-1, 1)
+
+    return normal_spread(np.sqrt(np.einsum('ij,ij->i', residual, residual) / dof))
+
+
+def normal_spread(sigma: np.ndarray) -> np.ndarray:
+    """Offsets of a ``PREDICTION_INTERVAL_LEVEL`` normal interval with standard deviations ``sigma``"""
+    z = NormalDist().inv_cdf((1 + Config.PREDICTION_INTERVAL_LEVEL) / 2)
+    return np.stack([-z * sigma, z * sigma], axis=1)
+
+
+def trend_growth(x: np.ndarray, horizon_days: np.ndarray) -> np.ndarray:
+    """Growth of a linear trend's forecast error at each horizon day, relative to the residuals
+
+    Adds the uncertainty of the fitted level and slope, larger the further a day is from
+    the centre of the training days ``x``: sqrt(1 + 1/n + (h - x̄)² / Σ(x - x̄)²).
+    """
+    centered = x - x.mean()
+    sxx = centered @ centered
+    leverage = 1.0 / len(x) + ((horizon_days - x.mean()) ** 2 / sxx if sxx > 0 else 0.0)
+    return np.sqrt(1.0 + leverage)
+
+
+def forecast_horizon(intercept: np.ndarray, slope: np.ndarray, days: int, offset: int = 0,
+                     start: datetime = None, spread: np.ndarray = None, x: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Predict the forecast horizon of many fitted trends as (products, days) arrays
+
+    ``offset`` is the number of days between the training window end and ``start``
+    (default: today, UTC); the horizon covers the ``days`` days after ``start``. With a
+    ``spread`` (see ``residual_spread``) and the training days ``x`` the intervals widen
+    along the horizon as the trend is extrapolated.
+    """
+    horizon = np.arange(offset + 1, offset + days + 1, dtype=np.float64)
+    growth = trend_growth(x, horizon) if spread is not None and x is not None else None
+    return quantity_horizon(intercept[:, None] + slope[:, None] * horizon, start, spread, growth)
+
+
+def quantity_horizon(quantity: np.ndarray, start: datetime = None, spread: np.ndarray = None,
+                     growth: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """Horizon arrays around a (products, days) matrix of forecast daily demand after ``start``
+
+    ``spread`` holds each product's interval offsets, scaled per day by ``growth``; the
+    bounds and ``confidence_level`` (the interval's coverage) are left out without it.
+    """
+    # Forecast dates are shared by every product
+    dates = _horizon_dates(start or datetime.utcnow(), quantity.shape[1])
+
+    horizon = {
+        'date': np.broadcast_to(dates, quantity.shape),
+        'predicted_quantity': np.round(np.maximum(quantity, 0.0), 2),  # No negative predictions
+    }
+    if spread is None:
+        return horizon
+
+    growth = np.ones(quantity.shape[1]) if growth is None else growth
+    horizon.update({
+        'confidence_level': np.full(quantity.shape, Config.PREDICTION_INTERVAL_LEVEL),
+        'lower_bound': np.round(np.maximum(quantity + spread[:, :1] * growth, 0.0), 2),
+        'upper_bound': np.round(np.maximum(quantity + spread[:, 1:] * growth, 0.0), 2),
+    })
+    return horizon
+
+
+def fallback_horizon(n_products: int, days: int) -> Dict[str, np.ndarray]:
+    """Default forecast for products without a trained model: 50 units plus 2 per day"""
+    quantity = np.broadcast_to(50.0 + 2.0 * np.arange(days), (n_products, days))
+
+    return {
+        'date': np.broadcast_to(_horizon_dates(datetime.now(), days), (n_products, days)),
+        'predicted_quantity': np.round(quantity, 2),
+        'confidence_level': np.full((n_products, days), 0.6),
+        'lower_bound': np.round(quantity * 0.8, 2),
+        'upper_bound': np.round(quantity * 1.2, 2),
+    }
+
+
+def horizon_records(horizon: Dict[str, np.ndarray], i: int) -> List[Dict]:
+    """Prediction dicts for row ``i`` of a horizon, as plain Python values (None for missing intervals)"""
+    missing = [None] * horizon['date'].shape[1]
+
+    def column(key: str) -> list:
+        return horizon[key][i].tolist() if key in horizon else missing
+
+    return [
+        {
+            "date": date,
+            "predicted_quantity": quantity,
+            "confidence_level": confidence,
+            "lower_bound": lower,
+            "upper_bound": upper,
+        }
+        for date, quantity, confidence, lower, upper in zip(
+            column('date'),
+            column('predicted_quantity'),
+            column('confidence_level'),
+            column('lower_bound'),
+            column('upper_bound'),
+        )
+    ]
+
+
+def recommend_bulk(predicted: np.ndarray, current_stock: np.ndarray) -> List[List[str]]:
+    """Inventory recommendations for many products from a (products, days) demand matrix
+
+    Every threshold is evaluated as an array operation; only the messages that apply
+    are formatted per product.
+    """
+    n_products, days = predicted.shape
+    if days == 0:
+        return [["Insufficient data for recommendations"] for _ in range(n_products)]
+
+    avg_daily = predicted.sum(axis=1) / days
+
+    low_stock = current_stock < avg_daily * 2
+    high_stock = current_stock > avg_daily * 10
+
+    # Trend: compare the mean of the second half of the horizon with the first
+    increasing = np.zeros(n_products, dtype=bool)
+    decreasing = np.zeros(n_products, dtype=bool)
+    if days >= 3:
+        avg_first = predicted[:, :days // 2].mean(axis=1)
+        avg_second = predicted[:, days // 2:].mean(axis=1)
+        increasing = avg_second > avg_first * 1.2
+        decreasing = ~increasing & (avg_second < avg_first * 0.8)
+
+    # Optimal order quantity
+    safety_stock = avg_daily * 2
+    optimal_order = np.maximum(0.0, avg_daily * 7 - current_stock + safety_stock)
+
+    recommendations = []
+    for stock, avg, low, high, up, down, order in zip(
+        current_stock.tolist(), avg_daily.tolist(), low_stock.tolist(), high_stock.tolist(),
+        increasing.tolist(), decreasing.tolist(), optimal_order.tolist(),
+    ):
+        messages = []
+        if low:
+            messages.append(f"⚠️ Low stock warning: Restock soon (current: {stock:.0f}, avg daily: {avg:.0f})")
+        if high:
+            messages.append(f"📦 High stock: Consider reducing orders (current: {stock:.0f}, avg daily: {avg:.0f})")
+        if up:
+            messages.append("📈 Demand increasing: Consider ordering more stock")
+        elif down:
+            messages.append("📉 Demand decreasing: Reduce order quantities")
+        if order > 0:
+            messages.append(f"💡 Suggested order quantity: {order:.0f} units for next 7 days")
+        if not messages:
+            messages.append("✅ Stock levels look good!")
+        recommendations.append(messages)
+
+    return recommendations
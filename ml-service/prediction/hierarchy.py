@@ -0,0 +1,135 @@
+import numpy as np
+import threading
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from prediction.batch import BatchForecaster
+from prediction.forecaster import DemandForecaster
+from preprocessing.features import training_end_day, window_start_day
+from utils.database import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+POOLED_MODEL = "CategoryPooled"
+
+
+class CategoryPooling:
+    """Category demand profiles that sparse and cold-start products are shrunk toward
+
+    One trend is fitted per ``category`` on the category's mean demand per selling
+    product, all categories in a single vectorized fit over one aggregate query. A
+    product with too few sales days for its own fit gets a blend of its own mean demand
+    and its category's trend, weighted by how much history it has:
+
+        weight = sales_days / (sales_days + prior_days)
+
+    so a product with no sales at all is served the category profile as is. Profiles
+    are refitted when the day changes.
+    """
+
+    def __init__(self, forecaster: BatchForecaster, prior_days: float = 5.0):
+        self.forecaster = forecaster
+        self.prior_days = prior_days  # Sales days weighing as much as the category profile
+        self.end_day = None
+        self.profiles: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def fit(self, db_client: DatabaseClient, end_day: int) -> Dict[str, Dict]:
+        """Fit every category's trend over the history window ending on ``end_day``"""
+        forecaster = self.forecaster
+        since_day = window_start_day(forecaster.history_days, end_day, forecaster.bucket_days)
+        daily = db_client.get_category_daily_sales(since_day, forecaster.bucket_days)
+
+        categories = sorted(daily['products'])
+        index = {category: i for i, category in enumerate(categories)}
+        rows = np.fromiter((index[c] for c in daily['category']), dtype=np.int64, count=len(daily['category']))
+
+        series, x = forecaster.build_series(
+            {'product_index': rows, 'bucket': daily['bucket'], 'quantity': daily['quantity']},
+            len(categories), end_day,
+        )
+        products = np.array([daily['products'][c] for c in categories], dtype=np.float64)
+        params = forecaster.fit(series / products[:, None], x)
+
+        # Categories that barely sell are no better a prior than the fallback
+        profiles = {
+            category: {
+                "intercept": float(params['intercept'][i]),
+                "slope": float(params['slope'][i]),
+                "accuracy": float(params['r2'][i]),
+                "products": int(products[i]),
+            }
+            for i, category in enumerate(categories) if params['trained'][i]
+        }
+
+        logger.info(f"Fitted {len(profiles)}/{len(categories)} category profiles")
+        return profiles
+
+    def ensure_fitted(self, db_client: DatabaseClient, end_day: int = None) -> Dict[str, Dict]:
+        """Current profiles, refitted first if they were fitted for another day"""
+        if end_day is None:
+            end_day = training_end_day()
+
+        with self._lock:
+            if self.end_day != end_day:
+                try:
+                    self.profiles = self.fit(db_client, end_day)
+                    self.end_day = end_day
+                except Exception as e:
+                    logger.error(f"Category profile fit failed: {e}")
+            return self.profiles
+
+    def shrink(self, series: np.ndarray, categories: List[Optional[str]]) -> Dict[str, np.ndarray]:
+        """Blend each series' mean demand with its category trend, for a (products, length) matrix
+
+        ``pooled`` is False for products whose category has no profile.
+        """
+        n_products = len(series)
+        profiles = self.profiles
+        known = [profiles.get(category) for category in categories]
+
+        pooled = np.array([profile is not None for profile in known], dtype=bool)
+        category_intercept = np.array([p["intercept"] if p else 0.0 for p in known], dtype=np.float64)
+        category_slope = np.array([p["slope"] if p else 0.0 for p in known], dtype=np.float64)
+        accuracy = np.array([p["accuracy"] if p else 0.0 for p in known], dtype=np.float64)
+        category_products = np.array([p["products"] if p else 0 for p in known], dtype=np.int64)
+
+        sales_days = np.count_nonzero(series, axis=1) if n_products else np.zeros(0, dtype=np.int64)
+        weight = sales_days / (sales_days + self.prior_days)
+        own_level = series.mean(axis=1) if n_products else np.zeros(0)
+
+        return {
+            'pooled': pooled,
+            'sales_days': sales_days,
+            'weight': weight,
+            'intercept': weight * own_level + (1 - weight) * category_intercept,
+            'slope': (1 - weight) * category_slope,
+            'accuracy': accuracy,
+            'category_products': category_products,
+        }
+
+    def describe(self, pool: Dict[str, np.ndarray], i: int, category: str) -> Dict:
+        """Training result of row ``i`` of a ``shrink`` result"""
+        return {
+            "status": "pooled",
+            "model": POOLED_MODEL,
+            "category": category,
+            "samples": int(pool['sales_days'][i]),
+            "weight": round(float(pool['weight'][i]), 4),
+            "accuracy": round(float(pool['accuracy'][i]), 4),
+            "coefficient": round(float(pool['slope'][i]), 4),
+            "intercept": round(float(pool['intercept'][i]), 4),
+            "category_products": int(pool['category_products'][i]),
+        }
+
+    def forecaster_for(self, db_client: DatabaseClient, series: np.ndarray,
+                       category: Optional[str]) -> Optional[Tuple[DemandForecaster, Dict]]:
+        """A forecaster serving one product's pooled trend with its training result, if its category has a profile"""
+        self.ensure_fitted(db_client)
+        pool = self.shrink(np.asarray(series, dtype=np.float64)[None, :], [category])
+        if not pool['pooled'][0]:
+            return None
+
+        forecaster = DemandForecaster(self.forecaster.bucket_days, self.forecaster.history_days)
+        forecaster.use_trend(pool['intercept'][0], pool['slope'][0], self.end_day, series)
+        return forecaster, self.describe(pool, 0, category)
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROJECTIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS waste_projections (
+        product_id TEXT NOT NULL,
+        expiry_day REAL NOT NULL,
+        projected_day REAL NOT NULL,
+        expected_unsold REAL NOT NULL,
+        PRIMARY KEY (product_id, expiry_day)
+    )
+"""
+
+
+class ProjectionStore:
+    """Expected unsold stock the waste engine projected for each product's expiring stock
+
+    Kept in the ML service's own SQLite file (``<MODEL_PATH>/waste_projections.sqlite``),
+    never in the backend's database. Only the first projection per (product, expiry) is
+    kept; once that stock has expired, the expiry waste logged for it is compared with
+    the projection to calibrate later ones (see ``WasteRiskEngine.expiry_bias``).
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(PROJECTIONS_TABLE_SQL)
+
+    @contextmanager
+    def _connection(self):
+        """Connection whose block runs as a single transaction; SQLite serializes writers across processes"""
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, product_ids: List[str], expiry_day: np.ndarray, projected_day: float,
+               expected_unsold: np.ndarray) -> int:
+        """Record projections, keeping the first one per (product, expiry); returns how many were new"""
+        try:
+            with self._connection() as conn:
+                before = conn.total_changes
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO waste_projections (product_id, expiry_day, projected_day, expected_unsold)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    zip(
+                        product_ids,
+                        np.asarray(expiry_day, dtype=np.float64).tolist(),
+                        [float(projected_day)] * len(product_ids),
+                        np.asarray(expected_unsold, dtype=np.float64).tolist(),
+                    ),
+                )
+                return conn.total_changes - before
+
+        except Exception as e:
+            logger.error(f"Failed to record waste projections: {e}")
+            return 0
+
+    def expired(self, since_day: float, until_day: float) -> Dict[str, np.ndarray]:
+        """Projections for stock expiring between ``since_day`` and ``until_day``, as columns"""
+        empty = {
+            'product_id': np.array([], dtype=object),
+            'expiry_day': np.array([], dtype=np.float64),
+            'projected_day': np.array([], dtype=np.float64),
+            'projected': np.array([], dtype=np.float64),
+        }
+
+        try:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT product_id, expiry_day, projected_day, expected_unsold
+                    FROM waste_projections
+                    WHERE expiry_day >= ? AND expiry_day <= ?
+                    """,
+                    (float(since_day), float(until_day)),
+                ).fetchall()
+
+            if not rows:
+                return empty
+
+            product_col, expiry_col, projected_day_col, projected_col = zip(*rows)
+
+            return {
+                'product_id': np.array(product_col, dtype=object),
+                'expiry_day': np.asarray(expiry_col, dtype=np.float64),
+                'projected_day': np.asarray(projected_day_col, dtype=np.float64),
+                'projected': np.asarray(projected_col, dtype=np.float64),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch waste projections: {e}")
+            return empty
+
+    def prune(self, before_day: float) -> int:
+        """Delete projections for stock that expired before ``before_day``; returns how many"""
+        try:
+            with self._connection() as conn:
+                return conn.execute("DELETE FROM waste_projections WHERE expiry_day < ?", (float(before_day),)).rowcount
+        except Exception as e:
+            logger.error(f"Failed to prune waste projections: {e}")
+            return 0
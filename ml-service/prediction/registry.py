@@ -0,0 +1,282 @@
+import os
+import copy
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from config.settings import Config
+from prediction.forecaster import DemandForecaster
+from prediction.param_store import BACKEND_PARAMS, STATUS_INSUFFICIENT_DATA, STATUS_TRAINED, ParameterStore
+from preprocessing.features import window_length
+from utils.database import format_watermark, parse_watermark
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BACKEND_FIELDS = ['backend', 'backend_mae', 'baseline_mae', 'backend_params']
+
+
+def no_backend(n_products: int = 1) -> Dict[str, np.ndarray]:
+    """Backend choice of products served by the linear trend, as BackendSelector.choose returns it"""
+    return {
+        'backend': np.full(n_products, ''),
+        'backend_mae': np.full(n_products, np.nan),
+        'baseline_mae': np.full(n_products, np.nan),
+        'backend_params': np.full((n_products, BACKEND_PARAMS), np.nan),
+    }
+
+
+def backend_arrays(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Backend choice of stored rows (BACKEND_FIELDS) as BackendSelector.choose returns it"""
+    return {
+        'backend': np.char.decode(values['backend']),
+        'backend_mae': values['backend_mae'].astype(np.float64),
+        'baseline_mae': values['baseline_mae'].astype(np.float64),
+        'backend_params': values['backend_params'].astype(np.float64),
+    }
+
+
+class ModelRegistry:
+    """Persistent registry of fitted forecasters for the whole catalogue
+
+    Models live in a memory-mapped ``ParameterStore`` under ``<MODEL_PATH>/<MODEL_VERSION>/``,
+    one fixed-size row per product with its trend, fit quality, training time, the
+    training-data watermark and the backend chosen for it at training time (see
+    ``BackendSelector.choose``), next to the product's demand series. A stored model is
+    reused until it is older than ``RETRAIN_INTERVAL_DAYS`` or new sales move the watermark.
+
+    Forecasters are rebuilt from their row on first use and kept in a bounded in-memory
+    cache keyed by the row's generation. The mapping is shared between worker processes,
+    so a model trained or updated by one worker is picked up by the others on their next read.
+    """
+
+    def __init__(self, model_path: str = None, model_version: str = None, retrain_interval_days: int = None,
+                 max_loaded: int = None):
+        self.model_path = model_path or Config.MODEL_PATH
+        self.model_version = model_version or Config.MODEL_VERSION
+        self.retrain_interval = timedelta(
+            days=Config.RETRAIN_INTERVAL_DAYS if retrain_interval_days is None else retrain_interval_days
+        )
+        self.bucket_days = Config.RESAMPLE_BUCKET_DAYS
+        self.history_days = Config.HISTORY_DAYS
+        self.version_dir = os.path.join(self.model_path, self.model_version)
+        self.store = ParameterStore(self.version_dir, window_length(self.history_days, self.bucket_days))
+        self.max_loaded = max_loaded or Config.CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[int, Dict]]" = OrderedDict()  # Entry per product and its row generation
+        self._lock = threading.Lock()
+
+        logger.info(f"Model registry path: {self.version_dir}")
+
+    def _is_current(self, entry: Dict, watermark: Optional[str]) -> bool:
+        if entry.get('watermark') != watermark:
+            return False
+        return datetime.now() - entry['trained_at'] < self.retrain_interval
+
+    def _remember(self, product_id: str, generation: int, entry: Dict) -> None:
+        with self._lock:
+            self._entries[product_id] = (generation, entry)
+            self._entries.move_to_end(product_id)
+            while len(self._entries) > self.max_loaded:
+                self._entries.popitem(last=False)
+
+    def _current_entry(self, product_id: str) -> Optional[Dict]:
+        """The in-memory entry, rebuilt from the store if its row changed (possibly in another process)"""
+        generation = self.store.generation(product_id)
+        if generation is None:
+            return None
+
+        with self._lock:
+            cached = self._entries.get(product_id)
+            if cached is not None and cached[0] == generation:
+                self._entries.move_to_end(product_id)
+                return cached[1]
+
+        loaded = self._load(product_id)
+        if loaded is not None:
+            self._remember(product_id, *loaded)
+            return loaded[1]
+        return None
+
+    def get(self, product_id: str, watermark: Optional[str], allow_stale: bool = False) -> Optional[Dict]:
+        """Return the stored model entry if it is still valid for this watermark
+
+        With ``allow_stale`` any entry of the current model version is returned, even if
+        new sales arrived or it is due for retraining.
+        """
+        entry = self._current_entry(product_id)
+
+        if entry is None:
+            return None
+        if not allow_stale and not self._is_current(entry, watermark):
+            return None
+
+        return entry
+
+    def _load(self, product_id: str) -> Optional[Tuple[int, Dict]]:
+        """Rebuild a product's entry from its stored row; the fit is re-derived from the series"""
+        try:
+            stored = self.store.read(product_id)
+            if stored is None:
+                return None
+            record, series = stored
+
+            forecaster = DemandForecaster(self.bucket_days, self.history_days)
+            training_result = forecaster.train_series(series, int(record['window_end']), float(record['pending']))
+            count = int(record['watermark_count'])
+
+            entry = {
+                'product_id': product_id,
+                'version': self.model_version,
+                'watermark': format_watermark(count, int(record['watermark_ms'])) if count >= 0 else None,
+                'trained_at': datetime.fromtimestamp(int(record['trained_at_ms']) / 1000),
+                'training_result': training_result,
+                'forecaster': forecaster,
+                'backend': backend_arrays(record[BACKEND_FIELDS][None]),
+            }
+            return int(record['generation']), entry
+        except Exception as e:
+            logger.error(f"Failed to load model for product {product_id}: {e}")
+            return None
+
+    def save(self, product_id: str, forecaster, watermark: Optional[str], training_result: Dict,
+             backend: Dict[str, np.ndarray] = None) -> Dict:
+        """Store a freshly fitted model in memory and in the parameter store
+
+        ``backend`` is the product's one-row backend choice; without it the product is
+        served by the linear trend.
+        """
+        entry = {
+            'product_id': product_id,
+            'version': self.model_version,
+            'watermark': watermark,
+            'trained_at': datetime.now(),
+            'training_result': training_result,
+            'forecaster': forecaster,
+            'backend': backend if backend is not None else no_backend(),
+        }
+
+        metrics.record_training(training_result)
+        generation = self._persist(product_id, entry)
+        if generation is not None:
+            self._remember(product_id, generation, entry)
+        return entry
+
+    def apply_sales(self, product_id: str, sold_day: np.ndarray, quantity: np.ndarray,
+                    created_ms: np.ndarray, total: Optional[int] = None) -> bool:
+        """Fold new sales into a stored model and move its watermark forward
+
+        ``total`` is the product's sale count in the database up to the last of these
+        sales, given in (createdAt, id) order; the sales beyond the watermark's count are
+        the new ones. When more are new than were passed, some were missed and the model
+        is left to go stale and retrain. Without ``total`` (pushed events), sales created
+        before the watermark's millisecond are skipped and those at it are kept; a sale
+        delivered twice then pushes the count past the database's, which also makes the
+        model stale. Returns False when there is no stored model or nothing new to apply.
+        """
+        created_ms = np.asarray(created_ms)
+
+        # Held across processes, so two workers never fold the same sales into one row
+        with self.store.locked():
+            entry = self._current_entry(product_id)
+            if entry is None or not entry.get('watermark'):
+                return False
+
+            count, last_created_ms = parse_watermark(entry['watermark'])
+            if total is not None:
+                new = total - count
+                if new <= 0 or new > len(created_ms):
+                    return False
+                fresh = np.arange(len(created_ms)) >= len(created_ms) - new
+            else:
+                fresh = created_ms >= last_created_ms
+                if not fresh.any():
+                    return False
+
+            # Update a copy and swap it in, so concurrent readers never see a half-applied fit
+            forecaster = copy.deepcopy(entry['forecaster'])
+            training_result = forecaster.update(np.asarray(sold_day)[fresh], np.asarray(quantity)[fresh])
+
+            updated = dict(
+                entry,
+                forecaster=forecaster,
+                training_result=training_result,
+                watermark=format_watermark(
+                    count + int(fresh.sum()), max(last_created_ms, int(created_ms[fresh].max())),
+                ),
+            )
+
+            generation = self._persist(product_id, updated)
+            if generation is None:
+                return False
+            self._remember(product_id, generation, updated)
+            return True
+
+    def stored_backends(self, product_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Backend choice of many products as BackendSelector.evaluate takes it; linear for products not stored"""
+        values, _ = self.store.read_fields(product_ids, BACKEND_FIELDS)
+        return backend_arrays(values)
+
+    def summary(self) -> Dict:
+        """Stored model counts and fit quality over every product in the store"""
+        records = self.store.records()
+        with self._lock:
+            loaded = len(self._entries)
+
+        trained = records[records['status'] == STATUS_TRAINED]
+
+        def mean(values: np.ndarray) -> Optional[float]:
+            return round(float(values.mean()), 4) if len(values) else None
+
+        return {
+            "version": self.model_version,
+            "stored_models": int(len(records)),
+            "loaded_models": loaded,
+            "trained_models": int(len(trained)),
+            "mean_accuracy": mean(trained['r2']),
+            "mean_mae": mean(trained['mae']),
+            "mean_rmse": mean(trained['rmse']),
+            "last_trained": (
+                datetime.fromtimestamp(int(records['trained_at_ms'].max()) / 1000) if len(records) else None
+            ),
+        }
+
+    def close(self) -> None:
+        self.store.flush()
+
+    def _persist(self, product_id: str, entry: Dict) -> Optional[int]:
+        """Write an entry's row; returns its generation, None if it was not stored"""
+        forecaster = entry['forecaster']
+        training_result = entry['training_result']
+        status = training_result.get('status')
+        if status not in ('trained', 'insufficient_data') or forecaster.window_end is None:
+            return None
+
+        try:
+            if entry['watermark']:
+                count, last_created_ms = parse_watermark(entry['watermark'])
+            else:
+                count, last_created_ms = -1, 0
+
+            fields = {
+                'status': STATUS_TRAINED if status == 'trained' else STATUS_INSUFFICIENT_DATA,
+                'window_end': forecaster.window_end,
+                'pending': forecaster.pending,
+                'sales_days': training_result.get('samples', 0),
+                'intercept': forecaster.intercept,
+                'slope': forecaster.slope,
+                'r2': forecaster.r2,
+                'mae': training_result.get('mae', 0.0),
+                'rmse': training_result.get('rmse', 0.0),
+                'trained_at_ms': int(entry['trained_at'].timestamp() * 1000),
+                'watermark_count': count,
+                'watermark_ms': last_created_ms,
+                **{name: entry['backend'][name][0] for name in BACKEND_FIELDS},
+            }
+            return self.store.write(product_id, fields, forecaster.series)
+        except Exception as e:
+            logger.error(f"Failed to persist model for product {product_id}: {e}")
+            return None
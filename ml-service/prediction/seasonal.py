@@ -0,0 +1,194 @@
+import numpy as np
+from typing import Dict, Tuple
+import logging
+
+from prediction.forecaster import DemandForecaster
+
+logger = logging.getLogger(__name__)
+
+# Weekday cycle of daily demand
+SEASON_DAYS = 7
+
+# Smoothing weights tried for every product: level, trend, season
+# (slow-moving: daily sales are noisy and forecasts look a week or more ahead)
+ALPHAS = (0.05, 0.1, 0.2)
+BETAS = (0.0, 0.02)
+GAMMAS = (0.05, 0.15)
+
+
+class SeasonalSmoothingModel:
+    """Additive Holt-Winters exponential smoothing with a weekly cycle, for many series at once
+
+    Each product keeps a level, a damped trend and one seasonal offset per position in
+    the week. All products and every combination of smoothing weights in ``ALPHAS`` x
+    ``BETAS`` x ``GAMMAS`` are run together as (products, combinations) arrays, one pass
+    over the series, and each product keeps the weights with the lowest one-step-ahead
+    squared error; given each product's chosen weights (``params``) a fit runs only
+    those. With buckets of several days the cycle is 7 / bucket_days buckets, or none
+    (plain Holt) when a week isn't a whole number of buckets.
+    """
+
+    name = "holt_winters"
+    label = "HoltWinters"
+
+    MIN_SALES_DAYS = DemandForecaster.MIN_SALES_DAYS
+
+    def __init__(self, bucket_days: int = 1, history_days: int = 90, damping: float = 0.98):
+        self.bucket_days = bucket_days
+        self.period = SEASON_DAYS // bucket_days if SEASON_DAYS % bucket_days == 0 else 1
+        self.damping = damping
+
+        alpha, beta, gamma = np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing='ij')
+        self.alpha = alpha.ravel()
+        self.beta = beta.ravel()
+        self.gamma = gamma.ravel() if self.period > 1 else np.zeros(alpha.size)
+
+    def _initial_state(self, series: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Level, trend and seasonal offsets from the first two cycles"""
+        m = max(self.period, 2)
+        first = series[:, :m].mean(axis=1)
+        second = series[:, m:2 * m].mean(axis=1)
+        trend = (second - first) / m
+
+        if self.period > 1:
+            season = series[:, :self.period] - first[:, None]
+        else:
+            season = np.zeros((len(series), 1))
+        return first, trend, season
+
+    def _smooth(self, series: np.ndarray, checkpoints: Tuple[int, ...] = (), weights: np.ndarray = None) -> Dict:
+        """One smoothing pass over every series; the best state after the window and at each checkpoint
+
+        The state at checkpoint c has seen buckets 0..c-1, with the weights chosen on
+        the one-step errors up to that point. ``weights`` (products, 3) fixes each
+        product's alpha, beta and gamma instead of trying the whole grid.
+        """
+        n_products, length = series.shape
+        m = self.period
+        rows = np.arange(n_products)
+
+        if weights is None:
+            alpha, beta, gamma = self.alpha, self.beta, self.gamma
+        else:
+            alpha, beta, gamma = (weights[:, j, None].astype(np.float64) for j in range(3))
+        n_combos = alpha.shape[-1]
+        phi = self.damping
+
+        level0, trend0, season0 = self._initial_state(series)
+        level = np.repeat(level0[:, None], n_combos, axis=1)
+        trend = np.repeat(trend0[:, None], n_combos, axis=1)
+        season = np.repeat(season0[:, None, :], n_combos, axis=1)  # (products, combos, period)
+
+        warmup = max(m, 2)
+        sse = np.zeros((n_products, n_combos))
+        sae = np.zeros((n_products, n_combos))
+
+        def best_state(end: int) -> Dict[str, np.ndarray]:
+            best = np.argmin(sse, axis=1)
+            chosen = [np.broadcast_to(w, (n_products, n_combos))[rows, best] for w in (alpha, beta, gamma)]
+            return {
+                'weights': np.stack(chosen, axis=1),  # (products, 3): alpha, beta, gamma
+                'level': level[rows, best],
+                'trend': trend[rows, best],
+                'season': season[rows, best],  # (products, period), position t % period
+                'end': end,  # Buckets seen; the next is position end % period
+                'sse': sse[rows, best],
+                'sae': sae[rows, best],
+            }
+
+        # Loop invariants of the update equations
+        keep_level, keep_trend, keep_season = 1 - alpha, (1 - beta) * phi, 1 - gamma
+
+        snapshots = {}
+        for t in range(length):
+            if t in checkpoints:
+                snapshots[t] = best_state(t)
+
+            y = series[:, t, None]
+            s = season[:, :, t % m]
+            expected = level + phi * trend  # Level forecast for t, before the season
+            if t >= warmup:
+                error = y - expected - s
+                sse += error * error
+                sae += np.abs(error)
+
+            new_level = alpha * (y - s) + keep_level * expected
+            trend = beta * (new_level - level) + keep_trend * trend
+            season[:, :, t % m] = gamma * (y - new_level) + keep_season * s
+            level = new_level
+
+        return {'final': best_state(length), 'snapshots': snapshots, 'warmup': warmup}
+
+    def fit(self, series: np.ndarray, params: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Smooth every series with every weight combination and keep the best per product
+
+        With ``params`` (see ``params``) each series is smoothed with its own weights only.
+        """
+        return self._fitted(series, self._smooth(series, weights=params))
+
+    def params(self, state: Dict[str, np.ndarray]) -> np.ndarray:
+        """The chosen alpha, beta and gamma of every product in a fit, as (products, 3)"""
+        return state['weights']
+
+    def _fitted(self, series: np.ndarray, smoothed: Dict) -> Dict[str, np.ndarray]:
+        """Fit result with in-sample accuracy from a smoothing pass over ``series``"""
+        state, warmup = smoothed['final'], smoothed['warmup']
+        scored = max(series.shape[1] - warmup, 1)
+
+        deviation = series[:, warmup:] - series[:, warmup:].mean(axis=1, keepdims=True)
+        ss_tot = np.einsum('ij,ij->i', deviation, deviation)
+        ss_res = state['sse']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(ss_tot > 0, 1.0 - ss_res / ss_tot, np.where(ss_res < 1e-12, 1.0, 0.0))
+
+        sales_days = np.count_nonzero(series, axis=1)
+        return {
+            **state,
+            'r2': r2,
+            'mae': state['sae'] / scored,
+            'rmse': np.sqrt(ss_res / scored),
+            'trained': (sales_days >= self.MIN_SALES_DAYS) & (series.shape[1] >= 2 * warmup),
+        }
+
+    def backtest(self, series: np.ndarray, horizon: int, origins: int, step: int) -> Dict[str, np.ndarray]:
+        """Rolling-origin errors like ``rolling_origin_errors``, from a single smoothing pass
+
+        Each origin forecasts from the state reached there, so it trains on all history
+        before it (an expanding window) rather than a fixed-length one. The same pass
+        gives the fit over the whole series, returned as ``fit``.
+        """
+        n_products, length = series.shape
+        first = [length - horizon - (origins - 1 - k) * step for k in range(origins)]
+        smoothed = self._smooth(series, tuple(first))
+
+        errors = np.full((n_products, origins, horizon), np.nan)
+        actuals = np.zeros((n_products, origins, horizon))
+        ahead = np.arange(1, horizon + 1)
+        for k, origin in enumerate(first):
+            actual = series[:, origin:origin + horizon]
+            fitted = (np.count_nonzero(series[:, :origin], axis=1) >= self.MIN_SALES_DAYS) \
+                & (origin >= 2 * smoothed['warmup'])
+            forecast = self.forecast(smoothed['snapshots'][origin], ahead)
+            errors[fitted, k] = forecast[fitted] - actual[fitted]
+            actuals[:, k] = actual
+
+        return {'errors': errors, 'actuals': actuals, 'fit': self._fitted(series, smoothed)}
+
+    def forecast(self, state: Dict[str, np.ndarray], ahead: np.ndarray) -> np.ndarray:
+        """Daily demand ``ahead`` buckets after the window, as (products, len(ahead))"""
+        ahead = np.asarray(ahead, dtype=np.int64)
+        phi = self.damping
+
+        # Damped trend: sum of phi^1 .. phi^h
+        if phi < 1:
+            damped = phi * (1 - phi ** ahead) / (1 - phi)
+        else:
+            damped = ahead.astype(np.float64)
+        position = (state['end'] + ahead - 1) % self.period
+
+        forecast = state['level'][:, None] + state['trend'][:, None] * damped + state['season'][:, position]
+        return np.maximum(forecast, 0.0)
+
+    def __call__(self, train: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        state = self.fit(train)
+        return self.forecast(state, np.arange(1, horizon + 1)), state['trained']
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from prediction.registry import ModelRegistry
+from utils.database import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+def fold_sales(registry: ModelRegistry, product_ids: np.ndarray, sold_day: np.ndarray,
+               quantity: np.ndarray, created_ms: np.ndarray, totals: Optional[Dict[str, int]] = None) -> List[str]:
+    """Apply a batch of new sales to the stored models of their products
+
+    ``totals`` holds each product's sale count in the database up to the batch's last
+    sale, when the batch was read from it (see ``ModelRegistry.apply_sales``). Returns the
+    ids of products whose model was updated. Products without a stored model are
+    skipped; they are trained from full history on their next request.
+    """
+    if len(product_ids) == 0:
+        return []
+
+    products, inverse = np.unique(np.asarray(product_ids, dtype=object), return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(products) + 1))
+
+    updated = []
+    for i, product_id in enumerate(products):
+        rows = order[bounds[i]:bounds[i + 1]]
+        total = totals.get(product_id) if totals is not None else None
+        if registry.apply_sales(product_id, sold_day[rows], quantity[rows], created_ms[rows], total):
+            updated.append(product_id)
+
+    return updated
+
+
+class SalesTailer:
+    """Polls the sales table for new rows and folds them into stored models
+
+    Starts from the newest sale at the time of the first poll; models trained
+    before that already include everything older.
+    """
+
+    def __init__(self, db_client: DatabaseClient, registry: ModelRegistry, batch_size: int = 1000):
+        self.db_client = db_client
+        self.registry = registry
+        self.batch_size = batch_size
+        self.cursor: Optional[Tuple[str, str]] = None
+        self._started = False
+
+    def poll_once(self) -> int:
+        """Fold every sale created since the last poll; returns the number of rows read"""
+        if not self._started:
+            self.cursor = self.db_client.get_sales_cursor()
+            self._started = True
+            return 0
+
+        total = 0
+        while True:
+            rows = self.db_client.get_sales_since(self.cursor, self.batch_size)
+            count = len(rows['product_id'])
+            if count == 0:
+                break
+
+            totals = self.db_client.get_sales_counts(np.unique(rows['product_id']).tolist(), rows['cursor'])
+            updated = fold_sales(
+                self.registry, rows['product_id'], rows['sold_day'], rows['quantity'], rows['created_ms'], totals
+            )
+            self.cursor = rows['cursor']
+            total += count
+            logger.info(f"Folded {count} new sales into {len(updated)} models")
+
+            if count < self.batch_size:
+                break
+
+        return total
+
+    async def run(self, interval_seconds: float) -> None:
+        """Poll forever, off the event loop"""
+        while True:
+            try:
+                await run_in_threadpool(self.poll_once)
+            except Exception as e:
+                logger.error(f"Sales tailer poll failed: {e}")
+            await asyncio.sleep(interval_seconds)
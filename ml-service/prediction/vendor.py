@@ -0,0 +1,124 @@
+import numpy as np
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import logging
+
+from prediction.forecaster import fallback_horizon
+from preprocessing.features import to_epoch_days
+from utils.database import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+# Same threshold as the per-product "High stock" recommendation
+OVERSTOCK_DAYS_OF_COVER = 10
+
+RISK_ORDER = {"stockout": 0, "expiry": 1, "overstock": 2}
+
+# Products served a forecast of their own or of their category
+FORECASTED_STATUSES = ("trained", "pooled")
+
+
+def _optional(value: float, digits: int = 2) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def summarize_vendor(products: List[Dict], forecasts: List[Dict], days: int, now_day: float) -> Dict:
+    """Vendor-level demand and at-risk SKUs from the batch forecasts of every product
+
+    ``forecasts`` are ``BatchForecaster.forecast`` results in the order of ``products``.
+    Only products served a fitted or category-pooled forecast contribute demand; the
+    rest are counted as lacking history. Risks are evaluated over the forecast horizon:
+
+    - stockout: current stock is below the forecast demand
+    - expiry: the product expires within the horizon with stock left over at that point
+    - overstock: stock covers more than ``OVERSTOCK_DAYS_OF_COVER`` days of demand
+    """
+    trained = np.array([forecast['status'] in FORECASTED_STATUSES for forecast in forecasts], dtype=bool)
+    demand = np.zeros((len(forecasts), days))
+    for i in np.flatnonzero(trained):
+        demand[i] = [prediction['predicted_quantity'] for prediction in forecasts[i]['predictions']]
+
+    stock = np.array([float(p.get('quantity') or 0) for p in products])
+    expiry_day = np.array([np.nan if p.get('expiryDay') is None else p['expiryDay'] for p in products], dtype=np.float64)
+
+    product_demand = demand.sum(axis=1)
+    avg_daily = product_demand / days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(avg_daily > 0, stock / avg_daily, np.inf)
+
+    # Demand sold before expiry: whole forecast days before the expiry time
+    days_left = expiry_day - now_day
+    covered = np.clip(np.floor(np.nan_to_num(days_left, nan=days)), 0, days).astype(np.int64)
+    cumulative = np.concatenate([np.zeros((len(demand), 1)), np.cumsum(demand, axis=1)], axis=1)
+    demand_before_expiry = cumulative[np.arange(len(demand)), covered]
+
+    shortfall = product_demand - stock
+    expiring_stock = stock - demand_before_expiry
+    stockout = trained & (shortfall > 0)
+    expiry = trained & ~stockout & (days_left <= days) & (expiring_stock > 0)
+    overstock = trained & ~stockout & ~expiry & (days_of_cover > OVERSTOCK_DAYS_OF_COVER)
+
+    summaries = []
+    at_risk = []
+    for i, product in enumerate(products):
+        summary = {
+            "product_id": product['id'],
+            "name": product.get('name'),
+            "category": product.get('category'),
+            "status": forecasts[i]['status'],
+            "model": forecasts[i]['training'].get('model', 'LinearRegression') if trained[i] else None,
+            "current_stock": float(stock[i]),
+            "predicted_demand": round(float(product_demand[i]), 2) if trained[i] else None,
+            "days_of_cover": _optional(days_of_cover[i], 1) if trained[i] else None,
+        }
+        summaries.append(summary)
+
+        if stockout[i]:
+            at_risk.append({**summary, "risk": "stockout", "units": round(float(shortfall[i]), 2)})
+        elif expiry[i]:
+            at_risk.append({
+                **summary, "risk": "expiry", "units": round(float(expiring_stock[i]), 2),
+                "expiry_date": product.get('expiryDate'),
+            })
+        elif overstock[i]:
+            at_risk.append({**summary, "risk": "overstock", "units": round(float(stock[i] - product_demand[i]), 2)})
+
+    at_risk.sort(key=lambda item: (RISK_ORDER[item["risk"]], -item["units"]))
+    daily_totals = demand.sum(axis=0)
+    # Every forecast shares the horizon dates; no_data results carry none
+    horizon = next((forecast['predictions'] for forecast in forecasts if 'predictions' in forecast), None)
+    dates = [p['date'] for p in horizon] if horizon else fallback_horizon(1, days)['date'][0].tolist()
+
+    return {
+        "total_products": len(products),
+        "forecasted_products": int(trained.sum()),
+        "insufficient_data_products": int(len(products) - trained.sum()),
+        "total_predicted_demand": round(float(product_demand.sum()), 2),
+        "total_stock": round(float(stock.sum()), 2),
+        "daily_demand": [
+            {"date": date, "predicted_quantity": round(quantity, 2)}
+            for date, quantity in zip(dates, daily_totals.tolist())
+        ] if len(products) else [],
+        "risk_counts": {risk: sum(1 for item in at_risk if item["risk"] == risk) for risk in RISK_ORDER},
+        "at_risk": at_risk,
+        "products": summaries,
+    }
+
+
+def forecast_vendor(db_client: DatabaseClient, vendor_id: str, days: int,
+                    forecast_products: Callable[[List[str]], List[Dict]]) -> Optional[Dict]:
+    """Forecast every active product of a vendor in one pass
+
+    ``forecast_products`` forecasts a list of product ids the way the batch endpoint
+    does (``BatchForecaster.forecast`` with category pooling and the stored backends),
+    so a vendor's products get the same forecasts as from /predict/batch. Returns None
+    when the vendor has no active products.
+    """
+    products = db_client.get_vendor_products(vendor_id)
+    if not products:
+        return None
+
+    forecasts = forecast_products([product['id'] for product in products])
+    summary = summarize_vendor(products, forecasts, days, to_epoch_days(datetime.utcnow()))
+    logger.info(f"Vendor forecast for {vendor_id}: {summary['forecasted_products']}/{len(products)} products")
+    return summary
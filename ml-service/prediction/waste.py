@@ -0,0 +1,389 @@
+import asyncio
+import numpy as np
+from datetime import datetime
+from statistics import NormalDist
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from scipy.special import ndtr
+
+from config.settings import Config
+from prediction.projection_store import ProjectionStore
+from preprocessing.features import to_epoch_days, training_end_day
+from utils.database import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+# Waste the expiry projection itself models; other reasons (damaged, other) are handling losses
+EXPIRY_REASONS = ('expired', 'excess')
+
+# Days after an expiry its waste may still be logged before the projection is scored
+OUTCOME_GRACE_DAYS = 7
+
+# Products served a forecast of their own or of their category
+FORECASTED_STATUSES = ("trained", "pooled")
+
+STATUS_EXPIRED = 'expired'
+STATUS_AT_RISK = 'assessed'
+STATUS_BEYOND_HORIZON = 'beyond_horizon'
+STATUS_NO_EXPIRY = 'no_expiry'
+
+
+class WasteRiskEngine:
+    """Expected waste at expiry for a whole catalogue, computed as array operations
+
+    For each product the demand forecast is integrated from now until its expiryDate and
+    compared with current stock. Demand is treated as normal around the forecast with the
+    fit's residual spread, so the expected unsold quantity is E[max(stock - demand, 0)],
+    which is non-zero even when stock and forecast demand match.
+
+    The projection is calibrated with waste_logs. Expiry waste logged for stock that has
+    already expired, against what was projected for it, gives a bias factor per product
+    (shrunk toward its category's, and that toward 1), which scales the expected unsold
+    stock. Losses the projection cannot see (damaged, other) give a handling-loss rate per
+    product, shrunk toward its category's rate when the product has little history, which
+    is charged on the stock expected to sell. Products expiring beyond ``horizon_days``
+    are not assessed.
+    """
+
+    def __init__(self, horizon_days: int = 30, history_days: int = 90, prior_units: float = 20.0):
+        self.horizon_days = horizon_days
+        self.history_days = history_days  # Days of sales and waste history the rates are calibrated on
+        self.prior_units = prior_units  # Units of history weighing as much as the category rate
+
+    def expected_unsold(self, rates: np.ndarray, sigma: np.ndarray, stock: np.ndarray, expiry_day: np.ndarray,
+                        now_day: float) -> Dict[str, np.ndarray]:
+        """Forecast demand until expiry and the expected stock left over at expiry
+
+        ``rates`` is the (products, horizon_days + 1) daily demand forecast for today
+        onward and ``sigma`` each product's daily demand standard deviation.
+        """
+        n_products = len(stock)
+        today = np.floor(now_day)
+
+        rates = np.maximum(rates, 0.0)
+        cumulative = np.concatenate([np.zeros((n_products, 1)), np.cumsum(rates, axis=1)], axis=1)
+        rows = np.arange(n_products)
+
+        def demand_until(t: np.ndarray) -> np.ndarray:
+            # Demand from the start of today until t days later, rates constant within a day
+            t = np.clip(t, 0.0, self.horizon_days + 1.0)
+            whole = np.minimum(np.floor(t).astype(np.int64), self.horizon_days)
+            return cumulative[rows, whole] + (t - whole) * rates[rows, whole]
+
+        start = now_day - today
+        end = expiry_day - today
+        has_expiry = ~np.isnan(expiry_day)
+        end = np.where(has_expiry, end, start)
+
+        demand = np.maximum(demand_until(end) - demand_until(start), 0.0)
+        sigma = sigma * np.sqrt(np.maximum(end - start, 0.0))
+
+        # E[max(S - D, 0)] for D ~ N(demand, sigma²)
+        gap = stock - demand
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(sigma > 0, gap / sigma, 0.0)
+            unsold = np.where(
+                sigma > 0,
+                gap * ndtr(z) + sigma * np.exp(-0.5 * z * z) / np.sqrt(2 * np.pi),
+                np.maximum(gap, 0.0),
+            )
+        unsold = np.clip(unsold, 0.0, stock)
+
+        expired = has_expiry & (end <= start)
+        beyond = has_expiry & (end > self.horizon_days + 1)
+        unsold = np.where(expired, stock, np.where(beyond | ~has_expiry, 0.0, unsold))
+
+        status = np.full(n_products, STATUS_AT_RISK, dtype=object)
+        status[~has_expiry] = STATUS_NO_EXPIRY
+        status[beyond] = STATUS_BEYOND_HORIZON
+        status[expired] = STATUS_EXPIRED
+
+        return {
+            'demand_until_expiry': np.where(expired | beyond | ~has_expiry, np.nan, demand),
+            'days_to_expiry': np.where(has_expiry, end - start, np.nan),
+            'expected_unsold': unsold,
+            'status': status,
+        }
+
+    def handling_rate(self, category: np.ndarray, sold: np.ndarray, expiry_waste: np.ndarray,
+                      handling_waste: np.ndarray) -> np.ndarray:
+        """Share of units moved lost to handling, per product, shrunk toward the category rate"""
+        categories, category_index = np.unique(category.astype(str), return_inverse=True)
+        moved = sold + expiry_waste + handling_waste
+
+        category_moved = np.bincount(category_index, weights=moved, minlength=len(categories))
+        category_lost = np.bincount(category_index, weights=handling_waste, minlength=len(categories))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            category_rate = np.where(category_moved > 0, category_lost / category_moved, 0.0)
+
+        prior = category_rate[category_index]
+        return (handling_waste + self.prior_units * prior) / (moved + self.prior_units)
+
+    def expiry_bias(self, category: np.ndarray, projected: np.ndarray, observed: np.ndarray) -> np.ndarray:
+        """Logged over projected expiry waste per product, shrunk toward the category ratio and that toward 1"""
+        categories, category_index = np.unique(category.astype(str), return_inverse=True)
+        category_projected = np.bincount(category_index, weights=projected, minlength=len(categories))
+        category_observed = np.bincount(category_index, weights=observed, minlength=len(categories))
+        category_bias = (category_observed + self.prior_units) / (category_projected + self.prior_units)
+
+        prior = category_bias[category_index]
+        return (observed + self.prior_units * prior) / (projected + self.prior_units)
+
+    def assess(self, inventory: Dict[str, np.ndarray], rates: np.ndarray, sigma: np.ndarray, sold: np.ndarray,
+               waste: Dict[str, np.ndarray], now_day: float,
+               outcomes: Dict[str, np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Expected waste of every product in ``inventory`` as arrays in inventory order
+
+        ``rates`` and ``sigma`` are the products' demand forecasts (see ``served_demand``)
+        and ``sold`` the units they sold over the history window. ``outcomes`` are past
+        projections and the expiry waste logged for them (see ``projection_outcomes``);
+        ``projected_unsold`` is the projection before that calibration, the one to record
+        for later outcomes.
+        """
+        product_ids = inventory['product_id']
+        n_products = len(product_ids)
+
+        stock = np.nan_to_num(inventory['quantity'], nan=0.0)
+        projection = self.expected_unsold(rates, sigma, stock, inventory['expiry_day'], now_day)
+
+        index = {product_id: i for i, product_id in enumerate(product_ids)}
+
+        # Calibrate the expected unsold stock on how past projections turned out
+        projected = np.zeros(n_products)
+        observed = np.zeros(n_products)
+        if outcomes is not None and len(outcomes['product_id']):
+            rows = np.array([index.get(product_id, -1) for product_id in outcomes['product_id']], dtype=np.int64)
+            known = rows >= 0
+            projected = np.bincount(rows[known], weights=outcomes['projected'][known], minlength=n_products)
+            observed = np.bincount(rows[known], weights=outcomes['observed'][known], minlength=n_products)
+        bias = self.expiry_bias(inventory['category'], projected, observed)
+
+        assessed = projection['status'] == STATUS_AT_RISK
+        projected_unsold = projection['expected_unsold']
+        expected_unsold = np.where(assessed, np.clip(projected_unsold * bias, 0.0, stock), projected_unsold)
+
+        # Historical waste per product, split by whether the projection models it
+        rows = np.array([index.get(product_id, -1) for product_id in waste['product_id']], dtype=np.int64)
+        known = rows >= 0
+        is_expiry = np.isin(waste['reason'].astype(str), EXPIRY_REASONS)
+        expiry_waste = np.bincount(rows[known & is_expiry], weights=waste['quantity'][known & is_expiry],
+                                   minlength=n_products)
+        handling_waste = np.bincount(rows[known & ~is_expiry], weights=waste['quantity'][known & ~is_expiry],
+                                     minlength=n_products)
+
+        rate = self.handling_rate(inventory['category'], sold, expiry_waste, handling_waste)
+
+        handling_loss = np.where(assessed, rate * (stock - expected_unsold), 0.0)
+        expected_waste = expected_unsold + handling_loss
+
+        cost = np.nan_to_num(inventory['cost_price'], nan=0.0)
+
+        return {
+            **projection,
+            'expected_unsold': expected_unsold,
+            'projected_unsold': projected_unsold,
+            'expiry_bias': bias,
+            'stock': stock,
+            'handling_loss': handling_loss,
+            'expected_waste': expected_waste,
+            'value_at_risk': expected_waste * cost,
+            'handling_rate': rate,
+            'historical_waste': expiry_waste + handling_waste,
+        }
+
+
+def served_demand(forecasts: List[Dict], horizon_days: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Daily demand rates and spread of served forecasts, as the waste engine takes them
+
+    ``forecasts`` are ``BatchForecaster.forecast`` results over ``horizon_days`` days
+    starting tomorrow; today's demand is taken at tomorrow's rate. The daily standard
+    deviation is read off the first day's upper bound, z standard deviations above the
+    forecast at its confidence level. Products without a forecast of their own or of
+    their category are given no demand.
+    """
+    rates = np.zeros((len(forecasts), horizon_days + 1))
+    sigma = np.zeros(len(forecasts))
+    for i, forecast in enumerate(forecasts):
+        if forecast['status'] not in FORECASTED_STATUSES:
+            continue
+        predictions = forecast['predictions']
+        quantity = [prediction['predicted_quantity'] for prediction in predictions[:horizon_days]]
+        rates[i, 0] = quantity[0]
+        rates[i, 1:len(quantity) + 1] = quantity
+
+        first = predictions[0]
+        if first.get('upper_bound') is not None and first.get('confidence_level'):
+            z = NormalDist().inv_cdf((1 + first['confidence_level']) / 2)
+            sigma[i] = max(first['upper_bound'] - first['predicted_quantity'], 0.0) / z
+    return rates, sigma
+
+
+def projection_outcomes(projections: Dict[str, np.ndarray], events: Dict[str, np.ndarray],
+                        grace_days: float = OUTCOME_GRACE_DAYS) -> Dict[str, np.ndarray]:
+    """Projected against logged expiry waste for each projection, as columns
+
+    ``observed`` is the waste of ``events`` logged for the product between the
+    projection and ``grace_days`` after its expiry.
+    """
+    observed = np.zeros(len(projections['product_id']))
+    if len(projections['product_id']) and len(events['product_id']):
+        # Events sorted by (product, day) under one numeric key, summed over each window by prefix sums
+        _, inverse = np.unique(
+            np.concatenate([projections['product_id'], events['product_id']]).astype(str), return_inverse=True,
+        )
+        inverse = inverse.ravel()
+        scale = np.ceil(max(np.abs(events['day']).max(), np.abs(projections['expiry_day']).max()) + grace_days + 1)
+        projection_code = inverse[:len(projections['product_id'])] * scale
+        event_key = inverse[len(projections['product_id']):] * scale + events['day']
+
+        order = np.argsort(event_key, kind='stable')
+        keys = event_key[order]
+        cumulative = np.concatenate([[0.0], np.cumsum(events['quantity'][order])])
+        low = np.searchsorted(keys, projection_code + projections['projected_day'], side='left')
+        high = np.searchsorted(keys, projection_code + projections['expiry_day'] + grace_days, side='right')
+        observed = cumulative[high] - cumulative[low]
+
+    return {
+        'product_id': projections['product_id'],
+        'projected': projections['projected'],
+        'observed': observed,
+    }
+
+
+def _optional(value: float, digits: int = 2) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def assess_catalogue(db_client: DatabaseClient, engine: WasteRiskEngine,
+                     forecast_products: Callable[[List[str]], List[Dict]], projections: ProjectionStore,
+                     vendor_id: str = None, batch_size: int = None) -> Tuple[Dict, Dict]:
+    """Assess every active product (optionally one vendor's); returns the inventory and the assessment
+
+    ``forecast_products`` forecasts a list of products over ``engine.horizon_days`` exactly
+    as the prediction endpoints serve them, and is called on chunks of ``batch_size``.
+    Set-based queries feed the rest: inventory, sales and waste totals over the history
+    window, and past projections with the expiry waste logged since they were made.
+    """
+    batch_size = batch_size or Config.BATCH_SIZE
+    inventory = db_client.get_inventory(vendor_id)
+    product_ids = inventory['product_id'].tolist()
+
+    rates = np.zeros((len(product_ids), engine.horizon_days + 1))
+    sigma = np.zeros(len(product_ids))
+    forecast_status = np.full(len(product_ids), 'no_data', dtype=object)
+    for start in range(0, len(product_ids), batch_size):
+        forecasts = forecast_products(product_ids[start:start + batch_size])
+        chunk = slice(start, start + len(forecasts))
+        rates[chunk], sigma[chunk] = served_demand(forecasts, engine.horizon_days)
+        forecast_status[chunk] = [forecast['status'] for forecast in forecasts]
+
+    since_day = training_end_day() - engine.history_days + 1
+    index = {product_id: i for i, product_id in enumerate(product_ids)}
+    totals = db_client.get_sales_totals(since_day)
+    rows = np.array([index.get(product_id, -1) for product_id in totals['product_id']], dtype=np.int64)
+    sold = np.bincount(rows[rows >= 0], weights=totals['quantity'][rows >= 0], minlength=len(product_ids))
+    waste = db_client.get_waste_totals(since_day)
+
+    now_day = to_epoch_days(datetime.utcnow())
+    expired = projections.expired(since_day, now_day - OUTCOME_GRACE_DAYS)
+    outcomes = None
+    if len(expired['product_id']):
+        events = db_client.get_waste_events(expired['projected_day'].min(), EXPIRY_REASONS)
+        outcomes = projection_outcomes(expired, events)
+
+    result = engine.assess(inventory, rates, sigma, sold, waste, now_day, outcomes)
+    result['forecast'] = forecast_status
+    result['now_day'] = now_day
+    result['since_day'] = since_day
+    return inventory, result
+
+
+def record_waste_projections(db_client: DatabaseClient, engine: WasteRiskEngine,
+                             forecast_products: Callable[[List[str]], List[Dict]],
+                             projections: ProjectionStore) -> Dict:
+    """Assess the whole catalogue and record the projections for stock at risk
+
+    Only the first projection per (product, expiry) is kept, so repeated runs calibrate
+    against what was expected when the stock was first assessed. Projections for stock
+    that expired before the history window are dropped.
+    """
+    started = datetime.now()
+    inventory, result = assess_catalogue(db_client, engine, forecast_products, projections)
+
+    assessed = np.flatnonzero(result['status'] == STATUS_AT_RISK)
+    recorded = projections.record(
+        [inventory['product_id'][i] for i in assessed.tolist()], inventory['expiry_day'][assessed],
+        result['now_day'], result['projected_unsold'][assessed],
+    )
+    pruned = projections.prune(result['since_day'])
+
+    summary = {
+        "products_evaluated": len(inventory['product_id']),
+        "assessed": len(assessed),
+        "recorded": recorded,
+        "pruned": pruned,
+        "duration_seconds": round((datetime.now() - started).total_seconds(), 3),
+    }
+    logger.info(f"Recorded waste projections: {summary}")
+    return summary
+
+
+async def run_periodic(db_client: DatabaseClient, engine: WasteRiskEngine,
+                       forecast_products: Callable[[List[str]], List[Dict]], projections: ProjectionStore,
+                       interval_hours: float) -> None:
+    """Record waste projections for the whole catalogue each ``interval_hours``, off the event loop"""
+    while True:
+        try:
+            await run_in_threadpool(record_waste_projections, db_client, engine, forecast_products, projections)
+        except Exception as e:
+            logger.error(f"Scheduled waste projection failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def rank_waste_risk(db_client: DatabaseClient, engine: WasteRiskEngine,
+                    forecast_products: Callable[[List[str]], List[Dict]], projections: ProjectionStore,
+                    vendor_id: str = None, limit: int = 50, sort_by: str = 'units') -> Dict:
+    """Assess every active product (optionally one vendor's) and rank them by expected waste
+
+    Read-only: projections are calibrated on the recorded ones but not recorded here
+    (see ``record_waste_projections``).
+    """
+    inventory, result = assess_catalogue(db_client, engine, forecast_products, projections, vendor_id)
+    product_ids = inventory['product_id'].tolist()
+
+    key = result['value_at_risk'] if sort_by == 'value' else result['expected_waste']
+    order = np.argsort(-key, kind='stable')
+    order = order[key[order] > 0][:limit]
+
+    ranked = [
+        {
+            "product_id": product_ids[i],
+            "vendor_id": inventory['vendor_id'][i],
+            "name": inventory['name'][i],
+            "category": inventory['category'][i],
+            "status": result['status'][i],
+            "current_stock": round(float(result['stock'][i]), 2),
+            "days_to_expiry": _optional(result['days_to_expiry'][i]),
+            "demand_until_expiry": _optional(result['demand_until_expiry'][i]),
+            "expected_unsold": round(float(result['expected_unsold'][i]), 2),
+            "expiry_bias": round(float(result['expiry_bias'][i]), 3),
+            "handling_loss": round(float(result['handling_loss'][i]), 2),
+            "expected_waste": round(float(result['expected_waste'][i]), 2),
+            "value_at_risk": round(float(result['value_at_risk'][i]), 2),
+            "historical_waste": round(float(result['historical_waste'][i]), 2),
+            "forecast": result['forecast'][i],
+        }
+        for i in order.tolist()
+    ]
+
+    statuses, counts = np.unique(result['status'].astype(str), return_counts=True)
+    return {
+        "products_evaluated": len(product_ids),
+        "status_counts": dict(zip(statuses.tolist(), counts.tolist())),
+        "total_expected_waste": round(float(result['expected_waste'].sum()), 2),
+        "total_value_at_risk": round(float(result['value_at_risk'].sum()), 2),
+        "horizon_days": engine.horizon_days,
+        "ranked": ranked,
+    }
@@ -0,0 +1,102 @@
+import numpy as np
+from datetime import datetime, date
+from typing import Tuple
+
+UNIX_EPOCH_DATE = date(1970, 1, 1)
+
+
+def epoch_day(value: date = None) -> int:
+    """Whole days since the Unix epoch for a date (defaults to today, UTC)"""
+    if value is None:
+        value = datetime.utcnow().date()
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value - UNIX_EPOCH_DATE).days
+
+
+def training_end_day(today: int = None) -> int:
+    """Last day of every training window: yesterday, the last complete day (UTC)
+
+    Sales for today are still coming in, so a bucket holding them would count as a
+    full (low) observation and drag the fit down.
+    """
+    return (epoch_day() if today is None else today) - 1
+
+
+def to_epoch_days(value: datetime) -> float:
+    """Fractional days since the Unix epoch; naive datetimes are taken as UTC"""
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return (value - datetime(1970, 1, 1)).total_seconds() / 86400
+
+
+def bucket_sales(sold_day: np.ndarray, quantity: np.ndarray, bucket_days: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Aggregate individual sales into buckets of ``bucket_days`` days
+
+    Returns the bucket index, total quantity and number of sales per non-empty bucket.
+    This mirrors the SQL ``GROUP BY`` used by DatabaseClient for in-memory callers.
+    """
+    buckets = np.floor(np.asarray(sold_day) / bucket_days).astype(np.int64)
+    bucket, inverse, counts = np.unique(buckets, return_inverse=True, return_counts=True)
+    totals = np.bincount(inverse, weights=quantity, minlength=len(bucket))
+    return bucket, totals, counts
+
+
+def window_end_bucket(end_day: int, bucket_days: int = 1) -> int:
+    """Bucket holding the last day of the training window"""
+    return end_day // bucket_days
+
+
+def window_length(history_days: int, bucket_days: int = 1) -> int:
+    """Number of buckets in a training window of ``history_days`` days"""
+    return max(1, -(-history_days // bucket_days))
+
+
+def window_start_day(history_days: int, end_day: int, bucket_days: int = 1) -> int:
+    """First day covered by the training window ending on ``end_day``"""
+    first_bucket = window_end_bucket(end_day, bucket_days) - window_length(history_days, bucket_days) + 1
+    return first_bucket * bucket_days
+
+
+def series_days(length: int, end_day: int, bucket_days: int = 1) -> np.ndarray:
+    """Day offset of each bucket relative to the window end (the last one is <= 0)"""
+    end_bucket = window_end_bucket(end_day, bucket_days)
+    buckets = np.arange(end_bucket - length + 1, end_bucket + 1, dtype=np.int64)
+    return (buckets * bucket_days - end_day).astype(np.float64)
+
+
+def resample_series(bucket: np.ndarray, quantity: np.ndarray, length: int, end_day: int,
+                    bucket_days: int = 1) -> np.ndarray:
+    """Zero-fill bucketed sales into a fixed-length series of daily demand
+
+    Buckets outside the window are dropped. Values are average units per day, so
+    the series is comparable whatever the bucket size.
+    """
+    series = np.zeros(length, dtype=np.float64)
+    position = np.asarray(bucket, dtype=np.int64) - (window_end_bucket(end_day, bucket_days) - length + 1)
+    in_window = (position >= 0) & (position < length)
+    np.add.at(series, position[in_window], np.asarray(quantity, dtype=np.float64)[in_window])
+    return series / bucket_days
+
+
+def pending_demand(product_index: np.ndarray, bucket: np.ndarray, quantity: np.ndarray,
+                   n_products: int, end_day: int, bucket_days: int = 1) -> np.ndarray:
+    """Daily demand already recorded in the bucket after the training window, per product
+
+    That bucket (today's) is still filling up, so it stays out of the fit; stored models
+    keep it aside and fold it in once their window moves over it.
+    """
+    after = np.asarray(bucket, dtype=np.int64) == window_end_bucket(end_day, bucket_days) + 1
+    weights = np.asarray(quantity, dtype=np.float64)[after]
+    return np.bincount(np.asarray(product_index, dtype=np.int64)[after], weights=weights,
+                       minlength=n_products) / bucket_days
+
+
+def resample_series_bulk(product_index: np.ndarray, bucket: np.ndarray, quantity: np.ndarray,
+                         n_products: int, length: int, end_day: int, bucket_days: int = 1) -> np.ndarray:
+    """Zero-fill bucketed sales of many products into a (products, length) matrix"""
+    position = np.asarray(bucket, dtype=np.int64) - (window_end_bucket(end_day, bucket_days) - length + 1)
+    in_window = (position >= 0) & (position < length)
+    flat = product_index[in_window] * length + position[in_window]
+    series = np.bincount(flat, weights=quantity[in_window], minlength=n_products * length)
+    return series.reshape(n_products, length) / bucket_days
@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+# Modules import each other from the service root (prediction.*, utils.*), as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate_data import generate  # noqa: E402
+from config.settings import Config  # noqa: E402
+
+# Synthetic catalogue behind the HTTP tests: product ids p000000 .., vendors v000 ..
+N_PRODUCTS = 60
+HISTORY_DAYS = 120
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+@pytest.fixture(scope="session")
+def sales_db_template(tmp_path_factory):
+    """A synthetic sales database, generated once and copied by each test that writes to it"""
+    path = str(tmp_path_factory.mktemp("db") / "sales.sqlite")
+    generate(path, N_PRODUCTS, HISTORY_DAYS)
+    return path
+
+
+@pytest.fixture
+def sales_db(tmp_path, sales_db_template):
+    path = str(tmp_path / "sales.sqlite")
+    shutil.copy(sales_db_template, path)
+    return path
+
+
+@pytest.fixture
+def service_config(tmp_path, monkeypatch, sales_db):
+    """Point the service at the test database and a fresh model directory, with no background jobs"""
+    for name, value in {
+        'SQLITE_PATH': sales_db,
+        'MODEL_PATH': str(tmp_path / "models"),
+        'SNAPSHOT_PATH': '',
+        'AUTO_RETRAIN': False,
+        'SALES_TAIL_INTERVAL_SECONDS': 0,
+        'PRECOMPUTE_INTERVAL_HOURS': 0,
+        'WASTE_PROJECTION_INTERVAL_HOURS': 0,
+    }.items():
+        monkeypatch.setattr(Config, name, value)
+    return Config
+
+
+@pytest.fixture
+def client(service_config):
+    """A TestClient over the app, started (and stopped) like a worker would be"""
+    from fastapi.testclient import TestClient
+    import app
+
+    with TestClient(app.app) as test_client:
+        yield test_client
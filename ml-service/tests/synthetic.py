@@ -0,0 +1,41 @@
+import sqlite3
+
+import numpy as np
+
+
+def demand_matrix(rng, n_products: int, days: int) -> np.ndarray:
+    """Trending, noisy whole-unit daily demand with about one day in five without sales"""
+    t = np.arange(days)
+    level = rng.uniform(5, 50, (n_products, 1))
+    slope = rng.uniform(-0.2, 0.5, (n_products, 1))
+    demand = np.maximum(np.round(level + slope * t + rng.normal(0, 3, (n_products, days))), 0)
+    return np.where(rng.random((n_products, days)) < 0.2, 0.0, demand)
+
+
+def sales_rows(series: np.ndarray, last_day: int):
+    """Sales of a (products, days) demand matrix whose last column is ``last_day``: product index, day, quantity"""
+    product_index, position = np.nonzero(series)
+    day = last_day - series.shape[1] + 1 + position
+    return product_index.astype(np.int64), day.astype(np.float64), series[product_index, position]
+
+
+def bucketed(product_index: np.ndarray, day: np.ndarray, quantity: np.ndarray, bucket_days: int):
+    """Bucketed sales as DatabaseClient.get_daily_sales_bulk returns them"""
+    keys = np.stack([product_index, np.floor(day / bucket_days).astype(np.int64)], axis=1)
+    groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=quantity, minlength=len(groups))
+    return {'product_index': groups[:, 0], 'bucket': groups[:, 1], 'quantity': totals}
+
+
+def insert_sales(path: str, rows):
+    """Insert (id, productId, quantity, soldAt, createdAt) sales"""
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO sales VALUES (?, 'v000', ?, ?, 2.5, 0, ?, ?, ?)",
+                [(sale_id, product_id, quantity, sold_at, created_at, created_at)
+                 for sale_id, product_id, quantity, sold_at, created_at in rows],
+            )
+    finally:
+        conn.close()
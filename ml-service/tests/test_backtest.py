@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from prediction.backtest import LinearTrendModel, error_summary, rolling_origin_errors, run_backtest
+from preprocessing.features import training_end_day
+
+
+def last_value(train: np.ndarray, horizon: int):
+    """Naive forecast: the last training bucket repeated, fitted for every product"""
+    return np.repeat(train[:, -1:], horizon, axis=1), np.ones(len(train), dtype=bool)
+
+
+def test_rolling_origins_score_the_buckets_after_each_origin():
+    series = np.arange(20, dtype=np.float64)[None, :]
+    result = rolling_origin_errors(series, window=5, horizon=3, origins=3, step=4, model=last_value)
+
+    # Origins at buckets 9, 13 and 17; the last horizon ends on the last bucket
+    np.testing.assert_array_equal(result['actuals'][0], [[9, 10, 11], [13, 14, 15], [17, 18, 19]])
+    # Each forecast is the bucket before its origin, so errors are -1, -2, -3
+    np.testing.assert_array_equal(result['errors'][0], np.tile([-1.0, -2.0, -3.0], (3, 1)))
+
+
+def test_linear_trend_forecasts_a_linear_series_exactly():
+    t = np.arange(60, dtype=np.float64)
+    series = np.stack([5 + 0.5 * t, 40 - 0.2 * t])
+    result = rolling_origin_errors(series, window=30, horizon=7, origins=4, step=7, model=LinearTrendModel())
+
+    np.testing.assert_allclose(result['errors'], 0.0, atol=1e-9)
+
+
+def test_products_the_model_cannot_fit_are_not_scored():
+    series = np.zeros((2, 40))
+    series[0] = 10.0
+    series[1, -1] = 3.0  # One sales day: too sparse for a trend
+    result = rolling_origin_errors(series, window=20, horizon=5, origins=2, step=5, model=LinearTrendModel())
+
+    assert not np.isnan(result['errors'][0]).any()
+    assert np.isnan(result['errors'][1]).all()
+
+    summary = error_summary(result['errors'], result['actuals'])
+    assert summary['mae'][0] == pytest.approx(0.0)
+    assert summary['scored'].tolist() == [10, 0]
+    assert np.isnan(summary['mae'][1])
+
+
+def test_error_summary_on_known_errors():
+    errors = np.array([[[2.0, -2.0], [4.0, np.nan]]])
+    actuals = np.array([[[10.0, 0.0], [8.0, 5.0]]])
+    summary = error_summary(errors, actuals)
+
+    assert summary['mae'][0] == pytest.approx(8.0 / 3)
+    assert summary['rmse'][0] == pytest.approx(np.sqrt(24.0 / 3))
+    # Percentage errors only where there was demand: 2/10 and 4/8
+    assert summary['mape'][0] == pytest.approx(35.0)
+
+
+def test_too_short_history_is_rejected():
+    with pytest.raises(ValueError):
+        rolling_origin_errors(np.ones((1, 10)), window=8, horizon=3, origins=1, step=1, model=last_value)
+
+
+def test_backtest_endpoint_scores_the_requested_products(client):
+    import app
+    from config.settings import Config
+
+    request = {"product_ids": ["p000001", "p000002", "missing", "p000001"], "horizon": 7, "origins": 2}
+    body = client.post("/backtest", json=request).json()
+
+    expected = run_backtest(app.db_client, ["p000001", "p000002", "missing"], training_end_day(), 7, 2, 7,
+                            Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS)["summary"]
+    assert body["backend"] == "linear"
+    assert {key: body[key] for key in expected} == expected
+    assert [entry["product_id"] for entry in body["per_product"]] == ["p000001", "p000002", "missing"]
+    assert (body["per_product"][2]["scored"], body["per_product"][2]["mae"]) == (0, None)
+
+    published = client.get("/metrics").json()["backtest"]
+    assert (published["mae"], published["products"]) == (body["mae"], 3)
+
+
+def test_backtest_endpoint_checks_the_backend(client):
+    assert client.post("/backtest", json={"product_ids": ["p000001"], "backend": "prophet"}).status_code == 422
+
+    body = client.post("/backtest", json={"product_ids": ["p000001"], "backend": "holt_winters"}).json()
+    assert (body["backend"], body["products"]) == ("holt_winters", 1)
+    assert "per_product" in body
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from prediction.batch import BatchForecaster
+from prediction.forecaster import DemandForecaster
+from preprocessing.features import series_days, training_end_day
+from synthetic import bucketed, demand_matrix, sales_rows
+
+HISTORY_DAYS = 30
+
+
+def test_fit_matches_least_squares_per_product(rng):
+    series = demand_matrix(rng, 5, HISTORY_DAYS)
+    x = series_days(HISTORY_DAYS, 20000)
+    params = BatchForecaster(1, HISTORY_DAYS).fit(series, x)
+
+    for i, row in enumerate(series):
+        slope, intercept = np.polyfit(x, row, 1)
+        assert params['slope'][i] == pytest.approx(slope)
+        assert params['intercept'][i] == pytest.approx(intercept)
+    assert params['sales_days'].tolist() == np.count_nonzero(series, axis=1).tolist()
+
+
+@pytest.mark.parametrize("bucket_days", [1, 3])
+def test_batch_forecast_equals_single_product_forecast(rng, bucket_days):
+    end_day = training_end_day()
+    series = demand_matrix(rng, 6, HISTORY_DAYS)
+    series[4] = 0.0
+    series[4, -2:] = 5.0  # Too few sales days for a fit
+    series[5] = 0.0  # No sales at all
+    product_index, day, quantity = sales_rows(series, end_day)
+
+    product_ids = [f"p{i}" for i in range(len(series))]
+    stock = [40.0, 500.0, 0.0, 120.0, 10.0, 0.0]
+    batch = BatchForecaster(bucket_days, HISTORY_DAYS).forecast(
+        product_ids, bucketed(product_index, day, quantity, bucket_days), stock, 7, end_day,
+    )
+
+    assert [result['status'] for result in batch] == ['trained'] * 4 + ['insufficient_data', 'no_data']
+    for i, result in enumerate(batch[:5]):
+        rows = product_index == i
+        single = DemandForecaster(bucket_days, HISTORY_DAYS)
+        training = single.train_columnar(day[rows], quantity[rows], end_day)
+        predictions = single.predict(7)
+
+        assert result['predictions'] == predictions
+        assert result['recommendations'] == single.get_recommendations(predictions, stock[i])
+        assert result['training'] == training
+
+
+def test_batch_endpoint_matches_single_product_requests(client, monkeypatch):
+    from config.settings import Config
+
+    monkeypatch.setattr(Config, "INLINE_TRAINING", True)
+    product_ids = [f"p{i:06d}" for i in range(12)] + ["p000004", "missing"]
+    body = client.post("/predict/batch", json={"product_ids": product_ids, "days": 7}).json()
+
+    # One entry per requested id, in request order, duplicates included
+    assert [entry["product_id"] for entry in body["predictions"]] == product_ids
+    assert (body["total_products"], body["failed"]) == (len(product_ids), 0)
+    assert body["predictions"][-1]["model_used"] == "Fallback"
+
+    for entry in body["predictions"][:12]:
+        single = client.post("/predict", json={"product_id": entry["product_id"], "days": 7}).json()
+        assert single["model_used"] == entry["model_used"]
+        assert single["predictions"] == pytest.approx(entry["predictions"])
+        assert single["recommendations"] == entry["recommendations"]
+
+
+def test_a_failing_product_does_not_fail_the_batch(client, monkeypatch):
+    import app
+    from config.settings import Config
+
+    monkeypatch.setattr(Config, "BATCH_SIZE", 3)
+    forecast_products = app.forecast_products
+
+    def failing(product_ids, *args, **kwargs):
+        if "p000004" in product_ids:
+            raise RuntimeError("corrupt sales row")
+        return forecast_products(product_ids, *args, **kwargs)
+
+    monkeypatch.setattr(app, "forecast_products", failing)
+    errors = client.get("/metrics").json()["errors"].get("predict_batch_product", 0)
+    product_ids = [f"p{i:06d}" for i in range(8)]
+    body = client.post("/predict/batch", json={"product_ids": product_ids, "days": 7}).json()
+
+    # The failing chunk is retried product by product, so only p000004 is lost
+    assert body["failed"] == 1
+    assert body["predictions"][4] == {"product_id": "p000004", "status": "error", "error": "corrupt sales row"}
+    assert all(len(entry["predictions"]) == 7 for i, entry in enumerate(body["predictions"]) if i != 4)
+    assert client.get("/metrics").json()["errors"]["predict_batch_product"] == errors + 1
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import PredictionCache, SingleFlight
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves forward by hand"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_hit_after_set():
+    cache = PredictionCache(ttl_seconds=60)
+    cache.set(("p1", 7, "3:100"), "forecast")
+
+    assert cache.get(("p1", 7, "3:100")) == "forecast"
+    assert cache.get(("p1", 14, "3:100")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_new_watermark_drops_entries_of_the_old_one():
+    cache = PredictionCache(ttl_seconds=60)
+    cache.set(("p1", 7, "3:100"), "week")
+    cache.set(("p1", 14, "3:100"), "fortnight")
+    cache.set(("p2", 7, "5:200"), "other product")
+
+    # A lookup under a newer watermark misses and invalidates everything cached before it
+    assert cache.get(("p1", 7, "4:150")) is None
+    assert cache.get(("p1", 14, "3:100")) is None
+    assert cache.get(("p2", 7, "5:200")) == "other product"
+    assert cache.invalidations == 2
+
+
+def test_set_under_new_watermark_invalidates():
+    cache = PredictionCache(ttl_seconds=60)
+    cache.set(("p1", 7, "3:100"), "old")
+    cache.set(("p1", 14, "4:150"), "new")
+
+    assert cache.stats()["size"] == 1
+    assert cache.invalidations == 1
+    assert cache.get(("p1", 14, "4:150")) == "new"
+
+
+def test_invalidate_product():
+    cache = PredictionCache(ttl_seconds=60)
+    cache.set(("p1", 7, "3:100"), "week")
+    cache.set(("p1", 14, "3:100"), "fortnight")
+
+    assert cache.invalidate("p1") == 2
+    assert cache.get(("p1", 7, "3:100")) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(ttl_seconds=60)
+    cache.set(("p1", 7, "3:100"), "forecast")
+
+    clock[0] += 59
+    assert cache.get(("p1", 7, "3:100")) == "forecast"
+
+    clock[0] += 1
+    assert cache.get(("p1", 7, "3:100")) is None
+    assert cache.expirations == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(ttl_seconds=60, max_entries=2)
+    cache.set(("p1", 7, "w"), "p1")
+    cache.set(("p2", 7, "w"), "p2")
+
+    # Reading p1 makes p2 the least recently used
+    assert cache.get(("p1", 7, "w")) == "p1"
+    cache.set(("p3", 7, "w"), "p3")
+
+    assert cache.get(("p2", 7, "w")) is None
+    assert cache.get(("p1", 7, "w")) == "p1"
+    assert cache.get(("p3", 7, "w")) == "p3"
+    assert cache.evictions == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(ttl_seconds=60, enabled=False)
+    cache.set(("p1", 7, "w"), "forecast")
+
+    assert cache.get(("p1", 7, "w")) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_repeated_predict_is_served_from_the_cache(client, monkeypatch):
+    from config.settings import Config
+
+    monkeypatch.setattr(Config, "INLINE_TRAINING", True)
+    request = {"product_id": "p000001", "days": 7}
+    first = client.post("/predict", json=request).json()
+    hits = client.get("/metrics").json()["predict_outcomes"].get("cache_hit", 0)
+
+    assert client.post("/predict", json=request).json() == first
+    body = client.get("/metrics").json()
+    assert body["predict_outcomes"]["cache_hit"] == hits + 1
+    assert body["cache"]["hits"] >= 1
+    # A different horizon is a different entry
+    assert len(client.post("/predict", json={**request, "days": 3}).json()["predictions"]) == 3
+
+
+def test_concurrent_calls_with_one_key_share_one_computation():
+    joins = []
+    flights = SingleFlight(on_join=joins.append)
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"forecast {key}"
+
+    async def main():
+        results = await asyncio.gather(*[flights.run(key, lambda key=key: compute(key)) for key in "aaab"])
+        # Nothing is kept once the computation finishes
+        assert flights.stats()["in_flight"] == 0
+        assert await flights.run("a", lambda: compute("a")) == "forecast a"
+        return results
+
+    assert asyncio.run(main()) == ["forecast a"] * 3 + ["forecast b"]
+    assert calls == ["a", "b", "a"]
+    assert joins == ["a", "a"]
+    assert flights.stats() == {"in_flight": 0, "started": 3, "joined": 2}
+
+
+def test_every_caller_gets_the_shared_exception():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*[flights.run("a", compute) for _ in range(3)], return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert [str(error) for error in errors] == ["boom"] * 3
+    assert errors[0] is errors[1] is errors[2]
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+    release = None
+
+    async def compute():
+        await release.wait()
+        return "forecast"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.ensure_future(flights.run("a", compute))
+        second = asyncio.ensure_future(flights.run("a", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, result = asyncio.run(main())
+    assert first.cancelled()
+    assert result == "forecast"
+    assert flights.stats()["started"] == 1
+
+
+def test_metrics_report_coalescing(client):
+    client.post("/predict", json={"product_id": "p000001", "days": 7})
+
+    coalescing = client.get("/metrics").json()["coalescing"]
+    assert coalescing["started"] >= 1
+    assert coalescing["in_flight"] == 0
+    assert "ml_predict_computations_total" in client.get("/metrics", params={"format": "prometheus"}).text
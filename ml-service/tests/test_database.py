@@ -0,0 +1,151 @@
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from preprocessing.features import to_epoch_days, training_end_day
+from utils.database import READ_PATH_INDEXES, DatabaseClient, created_ms, format_watermark
+
+
+@pytest.fixture
+def db(sales_db):
+    client = DatabaseClient(sales_db)
+    yield client
+    client.pool.close()
+
+
+def index_names(path: str) -> set:
+    conn = sqlite3.connect(path)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    return names
+
+
+def test_missing_read_path_indexes_are_created_once(sales_db, db):
+    wanted = [name for name, _, _ in READ_PATH_INDEXES]
+
+    assert db.ensure_indexes() == wanted
+    assert index_names(sales_db) >= set(wanted)
+    assert db.ensure_indexes() == []
+
+
+def test_indexes_with_the_same_leading_columns_are_reused(sales_db, db):
+    conn = sqlite3.connect(sales_db)
+    conn.execute("CREATE INDEX sales_by_product ON sales (productId, soldAt, quantity, total)")
+    conn.close()
+
+    created = db.ensure_indexes()
+
+    assert "idx_ml_sales_product_sold" not in created
+    assert "idx_ml_sales_product_created" in created
+
+
+def test_tables_the_database_lacks_are_skipped(tmp_path):
+    path = str(tmp_path / "sales_only.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sales (id TEXT, productId TEXT, quantity REAL, soldAt TEXT, createdAt TEXT)")
+    conn.close()
+
+    db = DatabaseClient(path)
+    assert db.ensure_indexes() == [name for name, table, _ in READ_PATH_INDEXES if table == "sales"]
+    db.pool.close()
+
+
+def test_read_path_queries_use_the_indexes(db):
+    before = db.explain_read_path()
+    assert any(step.startswith("SCAN sales") for step in before["daily_sales"])
+
+    db.ensure_indexes()
+    plans = db.explain_read_path()
+
+    assert set(plans) == {"daily_sales", "sales_watermark", "vendor_products"}
+    assert "USING COVERING INDEX idx_ml_sales_product_sold" in " ".join(plans["daily_sales"])
+    assert "idx_ml_sales_product_created" in " ".join(plans["sales_watermark"])
+    for plan in plans.values():
+        assert not any(step.startswith("SCAN") and "INDEX" not in step for step in plan)
+
+
+def raw_sales(path: str) -> list:
+    """(productId, soldAt as fractional epoch days, quantity) of every sale"""
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT productId, soldAt, quantity FROM sales").fetchall()
+    conn.close()
+    return [
+        (product_id, to_epoch_days(datetime.strptime(sold_at, '%Y-%m-%dT%H:%M:%S.%fZ')), quantity)
+        for product_id, sold_at, quantity in rows
+    ]
+
+
+@pytest.mark.parametrize("bucket_days", [1, 3])
+def test_daily_sales_match_the_raw_rows(sales_db, db, bucket_days):
+    since_day = training_end_day() - 30
+    product_ids = ["p000003", "missing", "p000001"]
+    expected = defaultdict(lambda: [0.0, 0])
+    for product_id, day, quantity in raw_sales(sales_db):
+        if product_id in product_ids and day >= since_day:
+            totals = expected[(product_ids.index(product_id), int(day // bucket_days))]
+            totals[0] += quantity
+            totals[1] += 1
+
+    bulk = db.get_daily_sales_bulk(product_ids, since_day, bucket_days)
+    rows = zip(bulk['product_index'].tolist(), bulk['bucket'].tolist(), bulk['quantity'].tolist(),
+               bulk['sales'].tolist())
+    assert {(i, bucket): [quantity, sales] for i, bucket, quantity, sales in rows} == dict(expected)
+
+    for i, product_id in enumerate(product_ids):
+        single = db.get_daily_sales(product_id, since_day, bucket_days)
+        mine = bulk['product_index'] == i
+        np.testing.assert_array_equal(single['bucket'], bulk['bucket'][mine])
+        np.testing.assert_array_equal(single['quantity'], bulk['quantity'][mine])
+    assert len(db.get_daily_sales_bulk([], since_day, bucket_days)['bucket']) == 0
+
+
+def test_bulk_watermarks_count_and_date_every_product_sale(sales_db, db):
+    product_ids = ["p000001", "p000002", "missing"]
+    conn = sqlite3.connect(sales_db)
+    expected = {}
+    for product_id in product_ids[:2]:
+        created = [row[0] for row in conn.execute("SELECT createdAt FROM sales WHERE productId = ?", (product_id,))]
+        last_ms = max(created_ms(datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ')) for value in created)
+        expected[product_id] = format_watermark(len(created), last_ms)
+    conn.close()
+
+    watermarks = db.get_sales_watermarks_bulk(product_ids)
+    assert watermarks == expected
+    assert all(db.get_sales_watermark(product_id) == watermarks.get(product_id) for product_id in product_ids)
+    assert db.get_sales_watermarks_bulk([]) == {}
+
+
+def test_bulk_product_info_matches_single_lookups(db):
+    product_ids = ["p000001", "p000007", "missing", "p000001"]
+    info = db.get_products_info_bulk(product_ids)
+
+    assert sorted(info) == ["p000001", "p000007"]
+    for product_id in info:
+        assert info[product_id] == db.get_product_info(product_id)
+    assert info["p000007"]["category"] == "fruits"
+    assert db.get_products_info_bulk([]) == {}
+
+
+def test_inventory_columns_follow_the_products_table(sales_db, db):
+    conn = sqlite3.connect(sales_db)
+    with conn:
+        conn.execute("UPDATE products SET isActive = 0 WHERE id = 'p000050'")
+        conn.execute("UPDATE products SET expiryDate = NULL WHERE id = 'p000000'")
+        rows = conn.execute("SELECT id, vendorId, quantity, costPrice, expiryDate FROM products "
+                            "WHERE isActive = 1 ORDER BY id").fetchall()
+    conn.close()
+
+    inventory = db.get_inventory()
+    assert inventory['product_id'].tolist() == [row[0] for row in rows]
+    np.testing.assert_array_equal(inventory['quantity'], [row[2] for row in rows])
+    np.testing.assert_array_equal(inventory['cost_price'], [row[3] for row in rows])
+    assert np.isnan(inventory['expiry_day'][0])
+    expiry = [to_epoch_days(datetime.strptime(row[4], '%Y-%m-%dT%H:%M:%S.%fZ')) for row in rows[1:]]
+    np.testing.assert_allclose(inventory['expiry_day'][1:], expiry, atol=1e-6)
+
+    vendor = db.get_inventory("v000")
+    assert vendor['product_id'].tolist() == [row[0] for row in rows if row[1] == "v000"]
+    assert len(db.get_inventory("unknown")['product_id']) == 0
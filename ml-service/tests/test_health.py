@@ -0,0 +1,39 @@
+import app
+
+
+def test_health_reports_ready_once_started(client):
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["error"] is None
+    assert body["startup_seconds"] >= 0
+    # The only worker takes the leader lock and runs the background tasks
+    assert body["leader"] is True
+
+
+def test_health_is_503_when_initialization_fails(service_config, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    def fail():
+        raise RuntimeError("database unreachable")
+
+    monkeypatch.setattr(app, "init_services", fail)
+    # Restored afterwards, so later tests start from a clean state
+    monkeypatch.setattr(app, "readiness", {**app.readiness, "warming_up": []})
+    monkeypatch.setattr(app, "ML_AVAILABLE", app.ML_AVAILABLE)
+    with TestClient(app.app) as test_client:
+        response = test_client.get("/health")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert "database unreachable" in response.json()["error"]
+
+
+def test_root_lists_the_endpoints(client):
+    body = client.get("/").json()
+
+    assert body["service"] == "Vendor Platform ML Service"
+    for path in body["endpoints"].values():
+        assert any(route.path == path for route in app.app.routes)
@@ -0,0 +1,106 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from prediction.batch import BatchForecaster
+from prediction.hierarchy import POOLED_MODEL, CategoryPooling
+from preprocessing.features import training_end_day, window_start_day
+from utils.database import DatabaseClient
+
+HISTORY_DAYS = 90
+
+
+@pytest.fixture
+def db(sales_db):
+    client = DatabaseClient(sales_db)
+    yield client
+    client.pool.close()
+
+
+def iso_day(day: int) -> str:
+    return (datetime(1970, 1, 1) + timedelta(days=day)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def test_profiles_follow_each_category_mean_demand(sales_db, db):
+    end_day = training_end_day()
+    since_day = window_start_day(HISTORY_DAYS, end_day)
+    profiles = CategoryPooling(BatchForecaster(1, HISTORY_DAYS)).fit(db, end_day)
+
+    conn = sqlite3.connect(sales_db)
+    products = dict(conn.execute(
+        """SELECT p.category, COUNT(DISTINCT s.productId) FROM sales s JOIN products p ON p.id = s.productId
+           WHERE s.soldAt >= ? GROUP BY p.category""", (iso_day(since_day),)
+    ).fetchall())
+    totals = dict(conn.execute(
+        """SELECT p.category, SUM(s.quantity) FROM sales s JOIN products p ON p.id = s.productId
+           WHERE s.soldAt >= ? AND s.soldAt < ? GROUP BY p.category""", (iso_day(since_day), iso_day(end_day + 1))
+    ).fetchall())
+    conn.close()
+
+    assert sorted(profiles) == sorted(products)
+    for category, profile in profiles.items():
+        assert profile["products"] == products[category]
+        # A least-squares trend passes through the mean: day offsets run -89 .. 0
+        mean_demand = totals[category] / products[category] / HISTORY_DAYS
+        assert profile["intercept"] + profile["slope"] * -(HISTORY_DAYS - 1) / 2 == pytest.approx(mean_demand)
+
+
+def test_products_are_shrunk_by_their_sales_days():
+    pooling = CategoryPooling(BatchForecaster(1, HISTORY_DAYS), prior_days=5.0)
+    pooling.profiles = {"dairy": {"intercept": 4.0, "slope": 0.1, "accuracy": 0.5, "products": 10}}
+    series = np.zeros((3, HISTORY_DAYS))
+    series[1, -5:] = 9.0
+    series[2, :] = 2.0
+
+    pool = pooling.shrink(series, ["dairy", "dairy", "unknown"])
+
+    assert pool['pooled'].tolist() == [True, True, False]
+    np.testing.assert_allclose(pool['weight'][:2], [0.0, 0.5])
+    # Without sales the category profile is served as is
+    assert (pool['intercept'][0], pool['slope'][0]) == (4.0, pytest.approx(0.1))
+    own_level = 45.0 / HISTORY_DAYS
+    assert pool['intercept'][1] == pytest.approx(0.5 * own_level + 0.5 * 4.0)
+    assert pool['slope'][1] == pytest.approx(0.05)
+
+
+def test_profiles_are_refitted_only_when_the_day_changes(db, monkeypatch):
+    pooling = CategoryPooling(BatchForecaster(1, HISTORY_DAYS))
+    fits = []
+    fit = pooling.fit
+    monkeypatch.setattr(pooling, "fit", lambda db_client, end_day: fits.append(end_day) or fit(db_client, end_day))
+
+    end_day = training_end_day()
+    first = pooling.ensure_fitted(db, end_day)
+    assert pooling.ensure_fitted(db, end_day) is first
+    pooling.ensure_fitted(db, end_day + 1)
+    assert fits == [end_day, end_day + 1]
+
+
+def test_forecaster_for_serves_the_pooled_trend(db):
+    pooling = CategoryPooling(BatchForecaster(1, HISTORY_DAYS))
+    forecaster, result = pooling.forecaster_for(db, np.zeros(HISTORY_DAYS), "dairy")
+
+    profile = pooling.profiles["dairy"]
+    assert (result["status"], result["model"], result["weight"]) == ("pooled", POOLED_MODEL, 0.0)
+    assert (forecaster.intercept, forecaster.slope) == (profile["intercept"], profile["slope"])
+    assert forecaster.window_end == training_end_day()
+    assert pooling.forecaster_for(db, np.zeros(HISTORY_DAYS), None) is None
+
+
+def test_a_new_product_is_served_its_category_profile(client, sales_db):
+    conn = sqlite3.connect(sales_db)
+    with conn:
+        conn.execute(
+            "INSERT INTO products (id, vendorId, name, category, quantity, isActive) VALUES (?, ?, ?, ?, ?, ?)",
+            ("p-new", "v000", "New product", "dairy", 10.0, 1),
+        )
+    conn.close()
+
+    pooled = client.get("/metrics").json()["predict_outcomes"].get("pooled", 0)
+    response = client.post("/predict", json={"product_id": "p-new", "days": 7}).json()
+    assert response["model_used"] == POOLED_MODEL
+    assert response["metadata"]["training_status"] == "pooled"
+    assert len(response["predictions"]) == 7
+    assert client.get("/metrics").json()["predict_outcomes"]["pooled"] == pooled + 1
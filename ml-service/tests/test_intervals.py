@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from config.settings import Config
+from prediction.batch import BatchForecaster
+from prediction.forecaster import residual_spread
+from preprocessing.features import series_days
+
+END_DAY = 20000
+
+
+@pytest.mark.parametrize("method", ["normal", "empirical"])
+def test_prediction_interval_coverage(rng, monkeypatch, method):
+    monkeypatch.setattr(Config, 'PREDICTION_INTERVAL_METHOD', method)
+    n_products, history_days, days = 3000, 90, 7
+
+    # Linear trends with normal noise; the last week is held out
+    t = np.arange(history_days + days)
+    level = rng.uniform(80, 120, (n_products, 1))
+    slope = rng.uniform(-0.3, 0.3, (n_products, 1))
+    demand = level + slope * t + rng.normal(0, 5, (n_products, len(t)))
+    series, actual = demand[:, :history_days], demand[:, history_days:]
+
+    forecaster = BatchForecaster(1, history_days)
+    x = series_days(history_days, END_DAY)
+    horizon = forecaster.predict(forecaster.fit(series, x), days, 0, series, x)
+
+    covered = (actual >= horizon['lower_bound']) & (actual <= horizon['upper_bound'])
+    assert covered.mean() == pytest.approx(Config.PREDICTION_INTERVAL_LEVEL, abs=0.03)
+    assert (horizon['confidence_level'] == Config.PREDICTION_INTERVAL_LEVEL).all()
+
+
+def test_empirical_spread_keeps_the_skew(monkeypatch):
+    monkeypatch.setattr(Config, 'PREDICTION_INTERVAL_METHOD', 'empirical')
+    # Mostly small shortfalls with a few large spikes, as intermittent demand leaves them
+    residual = np.concatenate([np.full(80, -1.0), np.full(20, 9.0)])[None, :]
+    low, high = residual_spread(residual, ddof=0)[0]
+
+    assert low == pytest.approx(-1.0)
+    assert high == pytest.approx(9.0)
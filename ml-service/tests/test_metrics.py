@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pytest
+
+from prediction.forecaster import DemandForecaster
+from utils.metrics import Counter, Histogram, ServiceMetrics
+
+
+def test_counter_is_exact_under_threads_and_reading_changes_nothing():
+    counter = Counter()
+
+    def work():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [counter.value for _ in range(3)] == [80000] * 3
+    counter.inc()
+    assert counter.value == 80001
+
+
+def test_histogram_counts_sum_and_quantiles():
+    histogram = Histogram(bounds=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["counts"] == [1, 2, 1, 1]
+    assert (snapshot["count"], snapshot["sum"]) == (5, pytest.approx(16.5))
+    # The median (rank 2.5) lies 3/4 of the way through the (1, 2] bucket
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    assert histogram.summary()["mean"] == pytest.approx(3.3)
+    assert Histogram().summary()["p50"] is None
+
+
+def test_failed_requests_are_counted_as_errors():
+    metrics = ServiceMetrics()
+    with metrics.request("predict"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.request("predict"):
+            raise ValueError("boom")
+
+    summary = metrics.to_dict()
+    assert summary["requests"] == {"predict": 2}
+    assert summary["errors"] == {"predict": 1}
+    assert summary["request_latency_seconds"]["predict"]["count"] == 2
+
+
+def test_prometheus_histograms_are_cumulative():
+    metrics = ServiceMetrics()
+    metrics.record_training({"status": "trained", "accuracy": 0.85, "mae": 1.2, "rmse": 1.5})
+    metrics.record_training({"status": "insufficient_data"})
+    text = metrics.to_prometheus()
+
+    assert 'ml_models_trained_total{status="trained"} 1' in text
+    assert 'ml_models_trained_total{status="insufficient_data"} 1' in text
+    assert 'ml_model_accuracy_r2_bucket{le="0.8"} 0' in text
+    assert 'ml_model_accuracy_r2_bucket{le="0.9"} 1' in text
+    assert 'ml_model_accuracy_r2_bucket{le="+Inf"} 1' in text
+    assert "ml_model_accuracy_r2_count 1" in text
+
+
+def test_metrics_endpoint_counts_requests(client):
+    before = client.get("/metrics").json()["requests"].get("predict_batch", 0)
+    client.post("/predict/batch", json={"product_ids": ["p000001", "p000002"], "days": 7})
+
+    body = client.get("/metrics").json()
+    assert body["requests"]["predict_batch"] == before + 1
+    assert body["stage_latency_seconds"]["db_fetch"]["count"] > 0
+    assert body["cache"] is not None
+
+    text = client.get("/metrics", params={"format": "prometheus"})
+    assert text.headers["content-type"].startswith("text/plain")
+    assert f'ml_requests_total{{endpoint="predict_batch"}} {before + 1}' in text.text
+
+
+def test_models_endpoint_summarizes_the_registry(client):
+    import app
+
+    assert client.get("/models").json()["registry"]["stored_models"] == 0
+
+    forecaster = DemandForecaster(app.model_registry.bucket_days, app.model_registry.history_days)
+    training = forecaster.train_series(np.arange(app.model_registry.history_days, dtype=np.float64) % 7 + 5, 20000)
+    app.model_registry.save("p000001", forecaster, "1:1", training)
+
+    body = client.get("/models").json()
+    linear = body["models"][0]
+    assert (linear["name"], linear["status"]) == ("LinearRegression", "active")
+    assert linear["accuracy"] == pytest.approx(training["accuracy"], abs=1e-4)
+    assert body["registry"]["stored_models"] == 1
+    assert [model["status"] for model in body["models"][1:]] == ["selectable"]
@@ -0,0 +1,80 @@
+import numpy as np
+
+from prediction.param_store import STATUS_TRAINED, ParameterStore
+
+LENGTH = 30
+
+
+def fields(intercept: float, slope: float) -> dict:
+    return {
+        'status': STATUS_TRAINED,
+        'window_end': 20000,
+        'pending': 1.5,
+        'sales_days': 25,
+        'intercept': intercept,
+        'slope': slope,
+        'r2': 0.5,
+        'trained_at_ms': 1_700_000_000_000,
+        'watermark_count': 42,
+        'watermark_ms': 1_700_000_000_123,
+        'backend': b'holt_winters',
+        'backend_params': [0.1, 0.02, 0.15, np.nan],
+    }
+
+
+def test_write_then_read_round_trip(tmp_path, rng):
+    store = ParameterStore(str(tmp_path), LENGTH)
+    series = np.round(rng.uniform(0, 40, LENGTH), 1)
+    store.write("p1", fields(12.5, -0.25), series)
+
+    record, stored = store.read("p1")
+    assert record['product_id'] == b"p1"
+    for name, value in fields(12.5, -0.25).items():
+        np.testing.assert_array_equal(record[name], value)
+    np.testing.assert_allclose(stored, series, rtol=1e-6)
+    assert store.read("missing") is None
+
+
+def test_rewrites_bump_the_generation_and_are_seen_by_other_handles(tmp_path):
+    store = ParameterStore(str(tmp_path), LENGTH)
+    first = store.write("p1", fields(10.0, 0.1), np.ones(LENGTH))
+    second = store.write("p1", fields(20.0, 0.2), np.full(LENGTH, 2.0))
+
+    assert (first, second) == (2, 4)
+    assert store.generation("p1") == 4
+
+    # Another handle on the same files, as another worker process would have
+    other = ParameterStore(str(tmp_path), LENGTH)
+    record, series = other.read("p1")
+    assert int(record['generation']) == 4
+    assert float(record['intercept']) == 20.0
+    np.testing.assert_array_equal(series, 2.0)
+
+    store.write("p1", fields(30.0, 0.3), np.full(LENGTH, 3.0))
+    assert other.generation("p1") == 6
+    assert float(other.read("p1")[0]['intercept']) == 30.0
+
+
+def test_rows_survive_growth_and_reopening(tmp_path):
+    store = ParameterStore(str(tmp_path), LENGTH, capacity=2)
+    other = ParameterStore(str(tmp_path), LENGTH, capacity=2)
+    for i in range(5):
+        store.write(f"p{i}", fields(float(i), 0.0), np.full(LENGTH, float(i)))
+    store.flush()
+
+    assert len(other) == 5
+    reopened = ParameterStore(str(tmp_path), LENGTH)
+    for i in range(5):
+        record, series = reopened.read(f"p{i}")
+        assert float(record['intercept']) == i
+        np.testing.assert_array_equal(series, float(i))
+
+    values, found = reopened.read_fields(["p3", "missing"], ['intercept'])
+    assert found.tolist() == [True, False]
+    assert values['intercept'].tolist() == [3.0, 0.0]
+
+
+def test_store_with_another_layout_is_replaced(tmp_path):
+    ParameterStore(str(tmp_path), LENGTH).write("p1", fields(1.0, 0.0), np.ones(LENGTH))
+
+    assert len(ParameterStore(str(tmp_path), LENGTH + 1)) == 0
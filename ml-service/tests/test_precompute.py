@@ -0,0 +1,82 @@
+import json
+import sqlite3
+
+import pytest
+
+from training import precompute
+
+DAYS = 5
+
+
+def stored_rows(sales_db: str) -> list:
+    conn = sqlite3.connect(sales_db)
+    try:
+        return conn.execute(
+            "SELECT product_id, forecast_date, predicted_quantity, model_used, created_at FROM predictions"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def sparse_product(sales_db):
+    """A new dairy product with two sales yesterday: too few for a fit of its own"""
+    product_id = "p-sparse"
+    conn = sqlite3.connect(sales_db)
+    with conn:
+        conn.execute(
+            "INSERT INTO products (id, vendorId, name, category, quantity, isActive) VALUES (?, 'v001', ?, 'dairy', 20, 1)",
+            (product_id, product_id),
+        )
+        conn.executemany(
+            "INSERT INTO sales (id, productId, quantity, soldAt, createdAt)"
+            " VALUES (?, ?, 3, datetime('now', '-1 day'), datetime('now', '-1 day'))",
+            [(f"{product_id}-s{i}", product_id) for i in range(2)],
+        )
+    conn.close()
+    return product_id
+
+
+def test_precomputed_forecasts_are_the_served_forecasts(sparse_product, client, sales_db):
+    summary = client.post("/predictions/precompute", json={"days": DAYS}).json()
+
+    assert summary["total_products"] == 61
+    assert summary["forecasted"] + sum(summary["skipped"].values()) == 61
+    assert summary["rows_written"] == summary["forecasted"] * DAYS
+
+    rows = stored_rows(sales_db)
+    product_ids = sorted({row[0] for row in rows})
+    served = {
+        entry["product_id"]: entry
+        for entry in client.post("/predict/batch", json={"product_ids": product_ids, "days": DAYS}).json()["predictions"]
+    }
+    for product_id in product_ids:
+        stored = client.get(f"/predictions/{product_id}").json()["predictions"]
+        assert [p["predicted_quantity"] for p in stored] == [
+            p["predicted_quantity"] for p in served[product_id]["predictions"]
+        ]
+        assert {p["model_used"] for p in stored} == {served[product_id]["model_used"]}
+
+    # Sparse products are stored from their category profile
+    assert {row[3] for row in rows if row[0] == sparse_product} == {"CategoryPooled"}
+
+
+def test_a_run_replaces_the_earlier_ones(client, sales_db):
+    client.post("/predictions/precompute", json={"days": DAYS})
+    first = stored_rows(sales_db)
+    client.post("/predictions/precompute", json={"days": DAYS})
+    client.post("/predictions/precompute", json={"days": DAYS, "product_ids": ["p000001"]})
+    rows = stored_rows(sales_db)
+
+    assert len(rows) == len(first)
+    assert len({row[4] for row in rows if row[0] == "p000001"}) == 1
+    assert client.get("/predictions/missing").status_code == 404
+
+
+def test_command_line_run(service_config, sales_db, capsys):
+    precompute.main(["--days", str(DAYS), "--product-id", "p000001", "--product-id", "p000002"])
+    summary = json.loads(capsys.readouterr().out)
+
+    assert summary["total_products"] == 2
+    assert {row[0] for row in stored_rows(sales_db)} <= {"p000001", "p000002"}
+    assert len(stored_rows(sales_db)) == summary["rows_written"]
@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+import pytest
+
+from prediction.forecaster import DemandForecaster
+from prediction.registry import ModelRegistry, no_backend
+
+WATERMARK = "90:1700000000000"
+
+
+@pytest.fixture
+def trained(rng):
+    forecaster = DemandForecaster(1, 90)
+    training = forecaster.train_series(np.round(rng.uniform(5, 40, 90)), 20000, pending=3.0)
+    return forecaster, training
+
+
+def registry(path, retrain_interval_days: int = 7) -> ModelRegistry:
+    return ModelRegistry(model_path=str(path), model_version="test", retrain_interval_days=retrain_interval_days)
+
+
+def test_registry_reloads_saved_models(tmp_path, trained):
+    forecaster, training = trained
+    saved = registry(tmp_path)
+    backend = no_backend()
+    saved.save("p1", forecaster, WATERMARK, training, backend)
+    saved.close()
+
+    # A fresh registry (another process, or after a restart) rebuilds the forecaster from the store
+    reloaded = registry(tmp_path)
+    entry = reloaded.get("p1", WATERMARK)
+    assert entry is not None
+
+    loaded = entry['forecaster']
+    assert entry['training_result'] == pytest.approx(training)
+    assert loaded.window_end == forecaster.window_end
+    assert loaded.pending == forecaster.pending
+    assert loaded.intercept == pytest.approx(forecaster.intercept)
+    assert loaded.slope == pytest.approx(forecaster.slope)
+    np.testing.assert_array_equal(entry['backend']['backend'], backend['backend'])
+
+
+def test_new_sales_or_age_make_a_model_stale(tmp_path, trained):
+    forecaster, training = trained
+    fresh = registry(tmp_path)
+    fresh.save("p1", forecaster, WATERMARK, training)
+
+    assert fresh.get("p1", WATERMARK) is not None
+    assert fresh.get("p1", "91:1700000000500") is None
+    assert fresh.get("p1", "91:1700000000500", allow_stale=True)['watermark'] == WATERMARK
+    assert fresh.get("missing", WATERMARK) is None
+
+    # With a zero retrain interval every stored model is already due for retraining
+    due = registry(tmp_path, retrain_interval_days=0)
+    assert due.get("p1", WATERMARK) is None
+    assert due.get("p1", WATERMARK, allow_stale=True) is not None
+
+
+def test_summary_counts_stored_models(tmp_path, trained):
+    forecaster, training = trained
+    models = registry(tmp_path)
+    assert models.summary()['stored_models'] == 0
+
+    models.save("p1", forecaster, WATERMARK, training)
+    models.save("p2", forecaster, WATERMARK, training)
+    summary = models.summary()
+    assert (summary['stored_models'], summary['trained_models']) == (2, 2)
+    assert summary['mean_accuracy'] == pytest.approx(training['accuracy'], abs=1e-4)
+
+
+def test_predict_serves_the_stored_model(client, sales_db):
+    import app
+    from preprocessing.features import training_end_day
+    from synthetic import insert_sales
+    from utils.database import DatabaseClient
+
+    db = DatabaseClient(sales_db)
+    forecaster = DemandForecaster(app.model_registry.bucket_days, app.model_registry.history_days)
+    training = forecaster.train_series(np.full(app.model_registry.history_days, 5.0), training_end_day())
+    app.model_registry.save("p000001", forecaster, db.get_sales_watermark("p000001"), training)
+    before = client.get("/metrics").json()["predict_outcomes"].get("stored_model", 0)
+
+    body = client.post("/predict", json={"product_id": "p000001", "days": 5}).json()
+    assert [point["predicted_quantity"] for point in body["predictions"]] == pytest.approx([5.0] * 5)
+    assert client.get("/metrics").json()["predict_outcomes"]["stored_model"] == before + 1
+
+    # New sales make it stale: still served while the product is queued for retraining
+    insert_sales(sales_db, [("s-late", "p000001", 3.0, "2100-01-01T00:00:00.000Z", "2100-01-01T00:00:00.000Z")])
+    body = client.post("/predict", json={"product_id": "p000001", "days": 5}).json()
+    assert [point["predicted_quantity"] for point in body["predictions"]] == pytest.approx([5.0] * 5)
+    deadline = time.monotonic() + 10
+    while not app.training_scheduler.list_jobs() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [job["scope"] for job in app.training_scheduler.list_jobs()] == ["requested"]
+    db.pool.close()
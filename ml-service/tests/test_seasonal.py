@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from prediction.backends import BackendSelector
+from prediction.seasonal import SEASON_DAYS, SeasonalSmoothingModel
+
+WEEK = np.array([10.0, 12.0, 15.0, 11.0, 20.0, 35.0, 30.0])
+LENGTH = 84
+
+
+def weekly(rng, n_products: int, noise: float = 0.0) -> np.ndarray:
+    """Products selling the same weekly pattern, scaled per product, with optional noise"""
+    scale = rng.uniform(0.5, 2.0, (n_products, 1))
+    series = scale * np.tile(WEEK, LENGTH // SEASON_DAYS)[None, :]
+    return np.maximum(series + rng.normal(0, noise, series.shape), 0.0)
+
+
+def test_a_pure_weekly_pattern_is_forecast_exactly(rng):
+    series = weekly(rng, 3)
+    model = SeasonalSmoothingModel()
+    state = model.fit(series)
+
+    # The window ends on a whole week, so the next two weeks repeat the pattern from Monday
+    forecast = model.forecast(state, np.arange(1, 15))
+    np.testing.assert_allclose(forecast, series[:, :14], atol=1e-9)
+    assert state['trained'].all()
+    np.testing.assert_allclose(state['r2'], 1.0)
+
+
+def test_refitting_with_the_chosen_weights_reproduces_the_fit(rng):
+    series = weekly(rng, 4, noise=3.0)
+    model = SeasonalSmoothingModel()
+    state = model.fit(series)
+    refit = model.fit(series, params=model.params(state))
+
+    for key in ('weights', 'level', 'trend', 'season', 'mae'):
+        np.testing.assert_allclose(refit[key], state[key])
+
+
+def test_backtest_in_one_pass_equals_refitting_at_each_origin(rng):
+    series = weekly(rng, 3, noise=3.0)
+    model = SeasonalSmoothingModel()
+    result = model.backtest(series, horizon=7, origins=3, step=7)
+
+    for k, origin in enumerate((LENGTH - 21, LENGTH - 14, LENGTH - 7)):
+        forecast = model.forecast(model.fit(series[:, :origin]), np.arange(1, 8))
+        np.testing.assert_allclose(result['errors'][:, k], forecast - series[:, origin:origin + 7])
+    np.testing.assert_allclose(result['fit']['level'], model.fit(series)['level'])
+
+
+def test_products_too_sparse_to_fit_are_not_trained():
+    series = np.zeros((2, LENGTH))
+    series[:, -SeasonalSmoothingModel.MIN_SALES_DAYS:] = 4.0
+    series[1, -SeasonalSmoothingModel.MIN_SALES_DAYS] = 0.0
+
+    assert SeasonalSmoothingModel().fit(series)['trained'].tolist() == [True, False]
+
+
+@pytest.fixture
+def mixed(rng):
+    """One product with a weekly cycle, one on a noiseless linear trend"""
+    trend = 5.0 + 0.3 * np.arange(LENGTH)
+    return np.vstack([weekly(rng, 1, noise=1.0), trend[None, :]])
+
+
+def test_selector_keeps_the_baseline_unless_another_backend_wins(mixed):
+    selector = BackendSelector(["linear", "holt_winters"])
+    choice = selector.choose(mixed)
+
+    assert choice['backend'].tolist() == ["holt_winters", ""]
+    assert choice['backend_mae'][0] < 0.95 * choice['baseline_mae'][0]
+    assert choice['baseline_mae'][1] == pytest.approx(0.0, abs=1e-9)
+    # Only the switched product carries the smoothing weights it refits with
+    assert not np.isnan(choice['backend_params'][0, :3]).any()
+    assert np.isnan(choice['backend_params'][1]).all()
+
+
+def test_serving_refits_only_the_stored_choice(mixed):
+    selector = BackendSelector(["linear", "holt_winters"])
+    stored = selector.choose(mixed)
+    selection = selector.evaluate(mixed, stored, days=10, end_day=20000)
+
+    model = SeasonalSmoothingModel()
+    expected = model.forecast(model.fit(mixed[:1], params=stored['backend_params'][:1, :3]), np.arange(1, 11))
+    assert selection['choice'].tolist() == [1, 0]
+    np.testing.assert_allclose(selection['quantity'][0], expected[0])
+    assert np.isnan(selection['quantity'][1]).all()
+
+    # A stored backend that is no longer configured falls back to the baseline
+    linear_only = BackendSelector(["linear"]).evaluate(mixed, stored, days=10, end_day=20000)
+    assert linear_only['choice'].tolist() == [0, 0]
+
+
+def test_holiday_flag_is_still_readable():
+    from config.settings import Config
+
+    assert isinstance(Config.ENABLE_HOLIDAY_FEATURE, bool)
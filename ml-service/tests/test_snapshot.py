@@ -0,0 +1,114 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from preprocessing.features import training_end_day, window_start_day
+from synthetic import insert_sales
+from utils.database import DatabaseClient
+from utils.snapshot import MANIFEST, SalesSnapshot
+
+PRODUCT_IDS = [f"p{i:06d}" for i in range(60)] + ["p-new", "missing"]
+
+
+@pytest.fixture
+def db(sales_db):
+    client = DatabaseClient(sales_db)
+    yield client
+    client.pool.close()
+
+
+def by_position(daily):
+    order = np.lexsort((daily['bucket'], daily['product_index']))
+    return {key: values[order] for key, values in daily.items()}
+
+
+def assert_reads_match(snapshot: SalesSnapshot, db: DatabaseClient):
+    """The snapshot answers the training queries exactly as the database does"""
+    since_day = window_start_day(90, training_end_day(), 1)
+    for bucket_days in (1, 3):
+        # The database orders rows by product id, the snapshot by position in the request
+        expected = by_position(db.get_daily_sales_bulk(PRODUCT_IDS, since_day, bucket_days))
+        actual = by_position(snapshot.get_daily_sales_bulk(PRODUCT_IDS, since_day, bucket_days))
+        for key in ('product_index', 'bucket', 'sales'):
+            np.testing.assert_array_equal(actual[key], expected[key])
+        np.testing.assert_allclose(actual['quantity'], expected['quantity'])
+    assert snapshot.get_sales_watermarks_bulk(PRODUCT_IDS) == db.get_sales_watermarks_bulk(PRODUCT_IDS)
+
+
+def add_sales(sales_db: str, tag: str, product_ids, days_ahead: float):
+    """One sale per product, created after every sale already in the database"""
+    at = (datetime.utcnow() + timedelta(days=days_ahead)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    insert_sales(sales_db, [(f"s-{tag}-{product_id}", product_id, 2.0, at, at) for product_id in product_ids])
+
+
+def segment_dirs(path: str):
+    return sorted(entry for entry in os.listdir(path) if entry.startswith("seg-"))
+
+
+def test_first_sync_exports_every_sale(tmp_path, db):
+    snapshot = SalesSnapshot(str(tmp_path / "snapshot"))
+    summary = snapshot.sync(db, page_rows=500)
+
+    assert summary["full"]
+    manifest = snapshot.manifest()
+    assert summary["rows"] == manifest["rows"] == summary["new_rows"]
+    assert manifest["products"] == 60
+    assert len(manifest["segments"]) == 1
+    assert_reads_match(snapshot, db)
+
+
+def test_later_syncs_append_only_the_new_sales(tmp_path, sales_db, db):
+    snapshot = SalesSnapshot(str(tmp_path / "snapshot"))
+    first = snapshot.sync(db)
+
+    assert snapshot.sync(db)["new_rows"] == 0
+    add_sales(sales_db, "a", ["p000001", "p000002", "p-new"], 1)
+    summary = snapshot.sync(db, page_rows=2)
+
+    assert not summary["full"]
+    assert summary["new_rows"] == 3
+    manifest = snapshot.manifest()
+    assert manifest["rows"] == first["rows"] + 3
+    # Products already exported are not counted again
+    assert manifest["products"] == 61
+    assert [segment["rows"] for segment in manifest["segments"]] == [first["rows"], 3]
+    assert manifest["max_created_ms"] == manifest["segments"][1]["max_created_ms"]
+    assert_reads_match(snapshot, db)
+
+
+def test_segments_are_compacted_into_one(tmp_path, sales_db, db):
+    path = str(tmp_path / "snapshot")
+    snapshot = SalesSnapshot(path, max_segments=2)
+    snapshot.sync(db)
+    add_sales(sales_db, "a", ["p000001"], 1)
+    snapshot.sync(db)
+    assert len(segment_dirs(path)) == 2
+
+    add_sales(sales_db, "b", ["p000001", "p-new"], 2)
+    summary = snapshot.sync(db)
+
+    assert summary["compacted"]
+    manifest = snapshot.manifest()
+    assert [segment["name"] for segment in manifest["segments"]] == segment_dirs(path)
+    assert manifest["segments"][0]["rows"] == manifest["rows"]
+    assert manifest["products"] == manifest["segments"][0]["products"] == 61
+    assert_reads_match(snapshot, db)
+
+
+def test_manifests_without_segment_ranges_are_re_exported(tmp_path, db):
+    path = str(tmp_path / "snapshot")
+    snapshot = SalesSnapshot(path)
+    snapshot.sync(db)
+
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    for segment in manifest["segments"]:
+        del segment["max_created_ms"]
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+    assert SalesSnapshot(path).sync(db)["full"]
+    assert_reads_match(SalesSnapshot(path), db)
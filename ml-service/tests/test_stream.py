@@ -0,0 +1,31 @@
+import json
+
+from config.settings import Config
+
+PRODUCT_IDS = [f"p{i:06d}" for i in range(20)] + ["p000003", "missing"]
+
+
+def test_stream_matches_the_batch_endpoint(client, monkeypatch):
+    monkeypatch.setattr(Config, "BATCH_SIZE", 6)  # Several chunks, finishing in any order
+    request = {"product_ids": PRODUCT_IDS, "days": 7}
+
+    response = client.post("/predict/batch/stream", json=request)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+
+    batch = {entry["product_id"]: entry for entry in client.post("/predict/batch", json=request).json()["predictions"]}
+    # Every distinct product once, in completion order
+    assert sorted(entry["product_id"] for entry in streamed) == sorted(set(PRODUCT_IDS))
+    for entry in streamed:
+        expected = batch[entry["product_id"]]
+        assert entry["model_used"] == expected["model_used"]
+        assert entry["predictions"] == expected["predictions"]
+
+
+def test_stream_requests_are_instrumented(client):
+    before = client.get("/metrics").json()["requests"].get("predict_batch_stream", 0)
+    client.post("/predict/batch/stream", json={"product_ids": ["p000001"], "days": 3})
+
+    body = client.get("/metrics").json()
+    assert body["requests"]["predict_batch_stream"] == before + 1
+    assert body["request_latency_seconds"]["predict_batch_stream"]["count"] >= 1
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from prediction.registry import ModelRegistry
+from preprocessing.features import training_end_day
+from training.scheduler import TrainingScheduler, train_products
+from utils.database import DatabaseClient
+
+
+def wait_for_job(get_job, job_id: str, timeout: float = 60.0) -> dict:
+    """Poll a training job until it has finished"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_job(job_id)
+        if job["finished_at"]:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Training job {job_id} did not finish")
+
+
+def test_train_products_fits_every_product_with_sales(sales_db):
+    db = DatabaseClient(sales_db)
+    results = train_products(sales_db, ["p000001", "missing", "p000002"], training_end_day(), 1, 90,
+                             backends=["linear", "holt_winters"])
+
+    assert [result[0] for result in results] == ["p000001", "p000002"]
+    for product_id, watermark, forecaster, training_result, backend in results:
+        assert watermark == db.get_sales_watermark(product_id)
+        assert forecaster.window_end == training_end_day()
+        if training_result["status"] == "trained":
+            assert set(backend) >= {"backend"}
+    db.pool.close()
+
+
+def test_job_stores_a_current_model_per_product(sales_db, tmp_path):
+    db = DatabaseClient(sales_db)
+    registry = ModelRegistry(model_path=str(tmp_path / "models"), model_version="test")
+    trained = []
+    scheduler = TrainingScheduler(db, registry, batch_size=2, max_workers=1, on_trained=trained.append)
+    product_ids = ["p000001", "p000002", "p000003"]
+
+    try:
+        job = wait_for_job(scheduler.get_job, scheduler.start_job(product_ids)["job_id"])
+    finally:
+        scheduler.shutdown()
+
+    assert job["status"] == "completed"
+    assert (job["total_batches"], job["completed_batches"]) == (2, 2)
+    assert job["trained"] + job["insufficient_data"] == 3
+    assert sorted(trained) == product_ids
+    for product_id in product_ids:
+        assert registry.get(product_id, db.get_sales_watermark(product_id)) is not None
+    db.pool.close()
+
+
+def test_requests_during_a_pass_are_trained_together_in_the_next(sales_db, tmp_path):
+    scheduler = TrainingScheduler(DatabaseClient(sales_db), ModelRegistry(model_path=str(tmp_path / "models")))
+    passes = []
+    release = threading.Event()
+    done = threading.Event()
+
+    def run(job, product_ids):
+        passes.append(sorted(product_ids))
+        if len(passes) == 1:
+            release.wait(10)
+        else:
+            done.set()
+        with scheduler._lock:
+            scheduler._in_flight.difference_update(product_ids)
+
+    scheduler._run = run
+    scheduler.request_training("a")
+    while not passes:
+        time.sleep(0.01)
+
+    # "a" is still training, so asking again does not queue it twice
+    for product_id in ("b", "c", "a", "b"):
+        scheduler.request_training(product_id)
+    release.set()
+
+    assert done.wait(10)
+    assert passes == [["a"], ["b", "c"]]
+    assert sorted(job["total_products"] for job in scheduler.list_jobs()) == [1, 2]
+
+
+def test_train_endpoint_runs_a_job(client):
+    started = client.post("/train", json={"product_ids": ["p000001", "p000002"]}).json()
+
+    assert started["status"] == "training_started"
+    job = wait_for_job(lambda job_id: client.get(f"/train/{job_id}").json(), started["job"]["job_id"])
+    assert job["status"] == "completed"
+    assert job["total_products"] == 2
+    assert any(listed["job_id"] == job["job_id"] for listed in client.get("/train/jobs").json()["jobs"])
+    assert client.get("/train/unknown").status_code == 404
+
+
+def test_a_miss_is_queued_instead_of_fitted_inline(client):
+    import app
+
+    first = client.post("/predict", json={"product_id": "p000001", "days": 7}).json()
+    assert first["model_used"] == "Fallback"
+    assert first["metadata"]["training_status"] == "training_queued"
+
+    # The queued product is trained by the scheduler's drain thread
+    deadline = time.monotonic() + 10
+    while not app.training_scheduler.list_jobs() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    job = app.training_scheduler.list_jobs()[0]
+    assert wait_for_job(app.training_scheduler.get_job, job["job_id"])["scope"] == "requested"
+
+    # The fallback was not cached: the stored model serves the next request
+    served = client.post("/predict", json={"product_id": "p000001", "days": 7}).json()
+    assert served["model_used"] != "Fallback"
+    assert served["metadata"]["training_status"] in ("trained", "pooled", "insufficient_data")
+
+
+def test_inline_training_fits_on_the_request(client, monkeypatch):
+    from config.settings import Config
+
+    monkeypatch.setattr(Config, "INLINE_TRAINING", True)
+    response = client.post("/predict", json={"product_id": "p000001", "days": 7}).json()
+
+    assert response["model_used"] != "Fallback"
+    assert len(response["predictions"]) == 7
+
+
+@pytest.mark.parametrize("inline", [False, True])
+def test_products_without_sales_are_not_queued(client, monkeypatch, inline):
+    import app
+    from config.settings import Config
+
+    monkeypatch.setattr(Config, "INLINE_TRAINING", inline)
+    response = client.post("/predict", json={"product_id": "missing", "days": 7}).json()
+
+    assert response["metadata"]["training_status"] == "no_data"
+    assert app.training_scheduler.list_jobs() == []
+
+
+def test_requests_after_shutdown_start_no_job(sales_db, tmp_path):
+    db = DatabaseClient(sales_db)
+    scheduler = TrainingScheduler(db, ModelRegistry(model_path=str(tmp_path / "models")))
+    scheduler.shutdown()
+
+    scheduler.request_training("p000001")
+    time.sleep(0.1)
+    assert scheduler.list_jobs() == []
+    db.pool.close()
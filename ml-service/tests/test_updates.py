@@ -0,0 +1,201 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from prediction.forecaster import DemandForecaster
+from prediction.registry import ModelRegistry
+from prediction.updates import SalesTailer
+from preprocessing.features import training_end_day
+from synthetic import demand_matrix, insert_sales, sales_rows
+from utils.database import CREATED_MS_SQL, DatabaseClient, created_ms, parse_watermark
+
+HISTORY_DAYS = 30
+END_DAY = 20000  # Last day of the first training window (days since epoch)
+
+
+def assert_same_fit(updated: DemandForecaster, refit: DemandForecaster, updated_result, refit_result):
+    assert updated_result == pytest.approx(refit_result)
+    assert updated.window_end == refit.window_end
+    assert updated.first_bucket == refit.first_bucket
+    assert updated.pending == pytest.approx(refit.pending)
+    np.testing.assert_allclose(updated.series, refit.series)
+    assert updated.intercept == pytest.approx(refit.intercept)
+    assert updated.slope == pytest.approx(refit.slope)
+    assert updated.r2 == pytest.approx(refit.r2)
+
+
+@pytest.mark.parametrize("bucket_days", [1, 3])
+def test_update_equals_full_refit(rng, bucket_days):
+    # Sales up to three days after the first window, then the window moves forward two days
+    series = demand_matrix(rng, 1, HISTORY_DAYS + 3)[0]
+    _, day, quantity = sales_rows(series[None, :], END_DAY + 3)
+    first = day <= END_DAY + 1
+
+    updated = DemandForecaster(bucket_days, HISTORY_DAYS)
+    updated.train_columnar(day[first], quantity[first], END_DAY)
+    updated_result = updated.update(day[~first], quantity[~first], END_DAY + 2)
+
+    refit = DemandForecaster(bucket_days, HISTORY_DAYS)
+    refit_result = refit.train_columnar(day, quantity, END_DAY + 2)
+
+    assert refit_result['status'] == 'trained'
+    assert_same_fit(updated, refit, updated_result, refit_result)
+
+
+def test_update_one_sale_at_a_time_equals_full_refit(rng):
+    series = demand_matrix(rng, 1, HISTORY_DAYS)[0]
+    _, day, quantity = sales_rows(series[None, :], END_DAY)
+    late = day > END_DAY - 10
+
+    updated = DemandForecaster(1, HISTORY_DAYS)
+    updated.train_columnar(day[~late], quantity[~late], END_DAY)
+    for sold_day, sold in zip(day[late], quantity[late]):
+        updated_result = updated.update(np.array([sold_day]), np.array([sold]), END_DAY)
+
+    refit = DemandForecaster(1, HISTORY_DAYS)
+    refit_result = refit.train_columnar(day, quantity, END_DAY)
+
+    assert_same_fit(updated, refit, updated_result, refit_result)
+
+
+def test_update_past_the_whole_window_equals_full_refit(rng):
+    series = demand_matrix(rng, 1, 2 * HISTORY_DAYS + 5)[0]
+    _, day, quantity = sales_rows(series[None, :], END_DAY + HISTORY_DAYS + 5)
+    first = day <= END_DAY
+
+    updated = DemandForecaster(1, HISTORY_DAYS)
+    updated.train_columnar(day[first], quantity[first], END_DAY)
+    updated_result = updated.update(day[~first], quantity[~first], END_DAY + HISTORY_DAYS + 5)
+
+    refit = DemandForecaster(1, HISTORY_DAYS)
+    refit_result = refit.train_columnar(day, quantity, END_DAY + HISTORY_DAYS + 5)
+
+    assert_same_fit(updated, refit, updated_result, refit_result)
+
+
+def test_created_ms_rounds_like_sqlite():
+    conn = sqlite3.connect(":memory:")
+    values = [
+        datetime(2024, 3, 1, 12, 0, 0),
+        datetime(2024, 3, 1, 12, 0, 0, 849000),
+        # Half a millisecond: SQLite rounds the float seconds, which lands below .5 here
+        datetime(1984, 7, 18, 17, 30, 32, 322500),
+        datetime(2031, 12, 31, 23, 59, 59, 999600),
+        datetime(2024, 3, 1, 14, 0, 0, 250000, tzinfo=timezone(timedelta(hours=2))),
+    ]
+    for value in values:
+        expected = conn.execute(f"SELECT {CREATED_MS_SQL.replace('createdAt', '?')}", (value.isoformat(),)).fetchone()[0]
+        assert created_ms(value) == expected
+
+
+def later(days: float) -> str:
+    """A createdAt after every synthetic sale"""
+    return (datetime.utcnow() + timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def test_paging_does_not_skip_sales_sharing_a_created_at(sales_db):
+    db = DatabaseClient(sales_db)
+    cursor = db.get_sales_cursor()
+    created_at = later(1)
+    insert_sales(sales_db, [(f"s-new-{i}", "p000001", 1.0, created_at, created_at) for i in range(5)])
+
+    seen = []
+    page_cursor = cursor
+    while True:
+        rows = db.get_sales_since(page_cursor, limit=2)
+        if not len(rows['product_id']):
+            break
+        seen.append(len(rows['product_id']))
+        page_cursor = rows['cursor']
+
+    assert seen == [2, 2, 1]
+    assert page_cursor == (created_at, "s-new-4")
+    assert db.get_sales_cursor() == page_cursor
+
+    # Counts up to a key split between sales sharing a createdAt
+    before = db.get_sales_counts(["p000001"], cursor)["p000001"]
+    assert db.get_sales_counts(["p000001", "p000002"], (created_at, "s-new-2"))["p000001"] == before + 3
+    db.pool.close()
+
+
+@pytest.fixture
+def stored(tmp_path, rng):
+    """A registry holding one trained model whose watermark is 10 sales up to t=1000 ms"""
+    registry = ModelRegistry(model_path=str(tmp_path / "models"), model_version="test")
+    forecaster = DemandForecaster(1, 90)
+    training = forecaster.train_series(np.round(rng.uniform(5, 40, 90)), training_end_day())
+    registry.save("p1", forecaster, "10:1000", training)
+    return registry
+
+
+def test_pushed_sales_at_the_watermark_millisecond_are_kept(stored):
+    day = np.full(3, training_end_day() + 1.5)  # Today
+    assert stored.apply_sales("p1", day, np.ones(3), np.array([999, 1000, 1000]))
+    assert stored.get("p1", None, allow_stale=True)['watermark'] == "12:1000"
+
+    assert not stored.apply_sales("p1", day[:1], np.ones(1), np.array([998]))
+
+
+def test_counted_sales_fold_only_those_past_the_watermark(stored):
+    day = np.full(3, training_end_day() + 1.5)  # Today
+    expected = stored.get("p1", None, allow_stale=True)['forecaster'].pending
+
+    # The database holds 11 sales up to the last of these: only the last one is new
+    assert stored.apply_sales("p1", day, np.array([1.0, 2.0, 5.0]), np.array([1000, 1000, 1000]), total=11)
+    entry = stored.get("p1", None, allow_stale=True)
+    assert entry['watermark'] == "11:1000"
+    assert entry['forecaster'].pending == pytest.approx(expected + 5.0)
+
+    # Already folded, or more new sales than passed: nothing is applied
+    assert not stored.apply_sales("p1", day, np.ones(3), np.array([1000, 1000, 1000]), total=11)
+    assert not stored.apply_sales("p1", day[:1], np.ones(1), np.array([1200]), total=13)
+    assert stored.get("p1", None, allow_stale=True)['watermark'] == "11:1000"
+
+
+def test_tailer_keeps_models_current_across_equal_created_at(sales_db, tmp_path, rng):
+    db = DatabaseClient(sales_db)
+    registry = ModelRegistry(model_path=str(tmp_path / "models"), model_version="test")
+    forecaster = DemandForecaster(1, 90)
+    training = forecaster.train_series(np.round(rng.uniform(5, 40, 90)), END_DAY)
+    registry.save("p000001", forecaster, db.get_sales_watermark("p000001"), training)
+
+    tailer = SalesTailer(db, registry, batch_size=2)
+    assert tailer.poll_once() == 0
+
+    created_at = later(1)
+    sold_at = later(0)
+    insert_sales(sales_db, [(f"s-new-{i}", "p000001", 2.0, sold_at, created_at) for i in range(3)]
+                 + [("s-new-3", "p000002", 1.0, sold_at, created_at)])
+
+    assert tailer.poll_once() == 4
+    watermark = db.get_sales_watermark("p000001")
+    assert registry.get("p000001", watermark) is not None
+    assert parse_watermark(watermark)[1] == created_ms(datetime.fromisoformat(created_at[:-1]))
+    db.pool.close()
+
+
+def test_pushed_events_keep_the_model_current(client, sales_db):
+    import app
+
+    db = DatabaseClient(sales_db)
+    product_id = "p000002"
+    forecaster = DemandForecaster(app.model_registry.bucket_days, app.model_registry.history_days)
+    training = forecaster.train_series(np.ones(app.model_registry.history_days), END_DAY)
+    app.model_registry.save(product_id, forecaster, db.get_sales_watermark(product_id), training)
+
+    # A new sale recorded in the same millisecond as the product's latest one
+    conn = sqlite3.connect(sales_db)
+    created_at = conn.execute("SELECT MAX(createdAt) FROM sales WHERE productId = ?", (product_id,)).fetchone()[0]
+    conn.close()
+    insert_sales(sales_db, [("s-pushed", product_id, 3.0, created_at, created_at)])
+
+    response = client.post("/sales/events", json={"events": [
+        {"product_id": product_id, "quantity": 3.0, "sold_at": created_at, "created_at": created_at},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json()["product_ids"] == [product_id]
+    assert app.model_registry.get(product_id, db.get_sales_watermark(product_id)) is not None
+    db.pool.close()
@@ -0,0 +1,63 @@
+import pytest
+
+from prediction.vendor import summarize_vendor
+
+DAYS = 7
+NOW_DAY = 20000.0
+
+
+def forecast(daily: float, status: str = "trained") -> dict:
+    """A batch forecast result predicting ``daily`` units every day of the horizon"""
+    if status == "no_data":
+        return {"status": status, "training": {"status": status}}
+    predictions = [{"date": f"2024-10-{day + 1:02d}", "predicted_quantity": daily} for day in range(DAYS)]
+    return {"status": status, "training": {"status": status}, "predictions": predictions}
+
+
+def test_risks_are_ranked_stockout_expiry_overstock():
+    products = [
+        {"id": "overstocked", "quantity": 100.0},
+        {"id": "expiring", "quantity": 20.0, "expiryDay": NOW_DAY + 3.5, "expiryDate": "2024-10-04"},
+        {"id": "short", "quantity": 5.0},
+        {"id": "new", "quantity": 8.0},
+        {"id": "fine", "quantity": 10.0},
+    ]
+    forecasts = [forecast(1.0), forecast(1.0), forecast(2.0), forecast(0.0, "no_data"), forecast(1.0, "pooled")]
+    summary = summarize_vendor(products, forecasts, DAYS, NOW_DAY)
+
+    assert [(item["product_id"], item["risk"], item["units"]) for item in summary["at_risk"]] == [
+        ("short", "stockout", 9.0),
+        # Three whole forecast days sell before it expires
+        ("expiring", "expiry", 17.0),
+        ("overstocked", "overstock", 93.0),
+    ]
+    assert summary["risk_counts"] == {"stockout": 1, "expiry": 1, "overstock": 1}
+    assert (summary["forecasted_products"], summary["insufficient_data_products"]) == (4, 1)
+    assert summary["total_predicted_demand"] == pytest.approx(7 + 7 + 14 + 7)
+    assert summary["total_stock"] == 143.0
+    assert [day["predicted_quantity"] for day in summary["daily_demand"]] == [5.0] * DAYS
+    new = summary["products"][3]
+    assert (new["predicted_demand"], new["days_of_cover"]) == (None, None)
+
+
+def test_vendor_endpoint_sums_the_batch_forecasts(client, monkeypatch):
+    from config.settings import Config
+
+    monkeypatch.setattr(Config, "INLINE_TRAINING", True)
+    body = client.get("/predict/vendor/v001", params={"days": 5}).json()
+
+    product_ids = [product["product_id"] for product in body["products"]]
+    assert sorted(product_ids) == ["p000001", "p000051"]
+    assert body["forecasted_products"] >= 1
+    batch = client.post("/predict/batch", json={"product_ids": product_ids, "days": 5}).json()["predictions"]
+    for product, expected in zip(body["products"], batch):
+        if product["predicted_demand"] is not None:
+            total = sum(day["predicted_quantity"] for day in expected["predictions"])
+            assert product["predicted_demand"] == pytest.approx(total, abs=0.01)
+    assert len(body["daily_demand"]) == 5
+    assert client.get("/metrics").json()["requests"]["predict_vendor"] >= 1
+
+
+def test_vendor_endpoint_rejects_unknown_vendors_and_horizons(client):
+    assert client.get("/predict/vendor/unknown").status_code == 404
+    assert client.get("/predict/vendor/v001", params={"days": 0}).status_code == 422
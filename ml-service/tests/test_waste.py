@@ -0,0 +1,207 @@
+import math
+import os
+import sqlite3
+from datetime import datetime
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from prediction.projection_store import ProjectionStore
+from prediction.waste import (
+    STATUS_AT_RISK, STATUS_BEYOND_HORIZON, STATUS_EXPIRED, STATUS_NO_EXPIRY, WasteRiskEngine, projection_outcomes,
+    served_demand,
+)
+from preprocessing.features import to_epoch_days
+
+TODAY = 20000
+HORIZON = 30
+
+
+def flat(rate: float, n_products: int = 1) -> np.ndarray:
+    return np.full((n_products, HORIZON + 1), rate)
+
+
+@pytest.fixture
+def engine():
+    return WasteRiskEngine(horizon_days=HORIZON)
+
+
+def test_expected_unsold_without_noise_is_stock_minus_demand(engine):
+    # 10 units a day, from 06:00 today until 18:00 three days later: 35 units sold
+    result = engine.expected_unsold(flat(10.0, 2), np.zeros(2), np.array([50.0, 20.0]), np.full(2, TODAY + 3.75),
+                                    TODAY + 0.25)
+
+    np.testing.assert_allclose(result['demand_until_expiry'], [35.0, 35.0])
+    np.testing.assert_allclose(result['days_to_expiry'], [3.5, 3.5])
+    np.testing.assert_allclose(result['expected_unsold'], [15.0, 0.0])
+    assert result['status'].tolist() == [STATUS_AT_RISK, STATUS_AT_RISK]
+
+
+def test_demand_follows_the_forecast_day_by_day(engine):
+    # Today and tomorrow: 12 + 14 units
+    rates = 12.0 + 2.0 * np.arange(HORIZON + 1)[None, :]
+    result = engine.expected_unsold(rates, np.zeros(1), np.array([30.0]), np.array([TODAY + 2.0]), float(TODAY))
+
+    np.testing.assert_allclose(result['demand_until_expiry'], [26.0])
+    np.testing.assert_allclose(result['expected_unsold'], [4.0])
+
+
+def test_expected_unsold_matches_the_normal_closed_form(engine):
+    # E[max(S - D, 0)] for D ~ N(μ, σ²) is (S - μ)·Φ(z) + σ·φ(z), z = (S - μ) / σ
+    rate, daily_sigma, days = 10.0, 4.0, 4.0
+    stock = np.array([40.0, 30.0, 55.0])
+    result = engine.expected_unsold(flat(rate, 3), np.full(3, daily_sigma), stock, np.full(3, TODAY + days),
+                                    float(TODAY))
+
+    mu, sigma = rate * days, daily_sigma * math.sqrt(days)
+    normal = NormalDist()
+    expected = [
+        (s - mu) * normal.cdf((s - mu) / sigma) + sigma * normal.pdf((s - mu) / sigma) for s in stock
+    ]
+    np.testing.assert_allclose(result['expected_unsold'], expected, rtol=1e-9)
+    # Stock equal to expected demand still leaves σ/√(2π) unsold
+    assert result['expected_unsold'][0] == pytest.approx(sigma / math.sqrt(2 * math.pi))
+
+
+def test_status_of_expired_distant_and_undated_stock(engine):
+    expiry = np.array([TODAY - 1.0, TODAY + 45.0, np.nan])
+    result = engine.expected_unsold(flat(5.0, 3), np.ones(3), np.full(3, 12.0), expiry, TODAY + 0.5)
+
+    assert result['status'].tolist() == [STATUS_EXPIRED, STATUS_BEYOND_HORIZON, STATUS_NO_EXPIRY]
+    np.testing.assert_allclose(result['expected_unsold'], [12.0, 0.0, 0.0])
+    assert np.isnan(result['demand_until_expiry']).all()
+
+
+def test_expiry_bias_shrinks_toward_category_and_one(engine):
+    category = np.array(["dairy", "dairy", "bakery"])
+    projected = np.array([10.0, 0.0, 0.0])
+    observed = np.array([30.0, 0.0, 0.0])
+    bias = engine.expiry_bias(category, projected, observed)
+
+    # Category: (30 + 20) / (10 + 20); product: (30 + 20 · category) / (10 + 20)
+    category_bias = 50.0 / 30.0
+    np.testing.assert_allclose(bias, [(30.0 + 20.0 * category_bias) / 30.0, category_bias, 1.0])
+
+
+def test_served_demand_reads_rates_and_spread_off_the_forecasts():
+    z = NormalDist().inv_cdf(0.9)
+    predictions = [
+        {'predicted_quantity': 10.0 + day, 'confidence_level': 0.8, 'lower_bound': None,
+         'upper_bound': 10.0 + day + 3.0 * z}
+        for day in range(3)
+    ]
+    forecasts = [
+        {'status': 'trained', 'predictions': predictions},
+        {'status': 'pooled', 'predictions': predictions},
+        {'status': 'insufficient_data', 'predictions': predictions},
+        {'status': 'no_data'},
+    ]
+    rates, sigma = served_demand(forecasts, 3)
+
+    # Today is taken at tomorrow's rate
+    np.testing.assert_allclose(rates[:2], [[10.0, 10.0, 11.0, 12.0]] * 2)
+    np.testing.assert_allclose(sigma, [3.0, 3.0, 0.0, 0.0])
+    assert not rates[2:].any()
+
+
+def test_outcomes_sum_the_waste_logged_for_each_projection():
+    projections = {
+        'product_id': np.array(["p1", "p1", "p2"], dtype=object),
+        'expiry_day': np.array([100.0, 120.0, 100.0]),
+        'projected_day': np.array([90.0, 110.0, 95.0]),
+        'projected': np.array([5.0, 2.0, 1.0]),
+    }
+    events = {
+        'product_id': np.array(["p1", "p1", "p1", "p2", "p3"], dtype=object),
+        'day': np.array([89.0, 101.0, 126.5, 107.0, 100.0]),
+        'quantity': np.array([1.0, 4.0, 3.0, 2.0, 9.0]),
+    }
+    outcomes = projection_outcomes(projections, events, grace_days=7)
+
+    # Before the first projection, within the grace week, after it, and another product's waste
+    np.testing.assert_allclose(outcomes['observed'], [4.0, 3.0, 2.0])
+    np.testing.assert_allclose(outcomes['projected'], [5.0, 2.0, 1.0])
+
+
+def test_projection_store_keeps_the_first_projection(tmp_path):
+    store = ProjectionStore(str(tmp_path / "projections.sqlite"))
+
+    assert store.record(["p1", "p2"], np.array([100.0, 105.0]), 95.0, np.array([3.0, 4.0])) == 2
+    assert store.record(["p1"], np.array([100.0]), 97.0, np.array([8.0])) == 0
+
+    expired = store.expired(99.0, 101.0)
+    assert expired['product_id'].tolist() == ["p1"]
+    assert expired['projected'].tolist() == [3.0]
+    assert expired['projected_day'].tolist() == [95.0]
+
+    assert store.prune(101.0) == 1
+    assert store.expired(0.0, 200.0)['product_id'].tolist() == ["p2"]
+
+
+def projection_rows(sales_db: str) -> int:
+    conn = sqlite3.connect(sales_db)
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'waste_projections'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_risk_ranking_is_read_only(client, sales_db, service_config):
+    response = client.get("/waste/risk", params={"limit": 5})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["products_evaluated"] == 60
+    assert 0 < len(body["ranked"]) <= 5
+    waste = [product["expected_waste"] for product in body["ranked"]]
+    assert waste == sorted(waste, reverse=True)
+
+    # Nothing is written to the backend database or recorded in the ML store
+    assert projection_rows(sales_db) == 0
+    store = ProjectionStore(os.path.join(service_config.MODEL_PATH, "waste_projections.sqlite"))
+    assert len(store.expired(0, 1e9)['product_id']) == 0
+
+
+def test_risk_ranking_integrates_the_served_forecasts(client):
+    ranked = client.get("/waste/risk", params={"limit": 1000}).json()["ranked"]
+    now_day = to_epoch_days(datetime.utcnow())
+    served = {
+        entry["product_id"]: entry
+        for entry in client.post(
+            "/predict/batch", json={"product_ids": [product["product_id"] for product in ranked], "days": HORIZON},
+        ).json()["predictions"]
+    }
+
+    checked = 0
+    for product in ranked:
+        if product["status"] != STATUS_AT_RISK or product["forecast"] not in ("trained", "pooled"):
+            continue
+        quantity = [point["predicted_quantity"] for point in served[product["product_id"]]["predictions"]]
+        rates = np.array([quantity[0]] + quantity)  # Today at tomorrow's rate
+        cumulative = np.concatenate([[0.0], np.cumsum(rates)])
+
+        def demand_until(t: float) -> float:
+            whole = int(np.floor(t))
+            return cumulative[whole] + (t - whole) * rates[whole]
+
+        start = now_day - np.floor(now_day)
+        end = start + product["days_to_expiry"]
+        # days_to_expiry is rounded to 0.01 days
+        assert product["demand_until_expiry"] == pytest.approx(
+            demand_until(end) - demand_until(start), abs=0.01 * rates.max() + 0.01,
+        )
+        checked += 1
+    assert checked > 0
+
+
+def test_recording_projections(client, sales_db, service_config):
+    first = client.post("/waste/projections").json()
+    again = client.post("/waste/projections").json()
+
+    assert first["assessed"] > 0
+    assert first["recorded"] == first["assessed"]
+    assert again["recorded"] == 0
+    assert projection_rows(sales_db) == 0
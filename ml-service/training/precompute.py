@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Tuple
+import logging
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from config.settings import Config
+from preprocessing.features import training_end_day
+from utils.database import DatabaseClient
+
+logger = logging.getLogger(__name__)
+
+MODEL_USED = "LinearRegression"  # Model of products served the linear trend
+
+# Products served a forecast of their own or of their category; the rest are not stored
+FORECASTED_STATUSES = ("trained", "pooled")
+
+# Forecasts products as the prediction endpoints serve them: (product_ids, days, end_day)
+# to (forecasts, current_stock), as app.forecast_products
+ForecastProducts = Callable[[List[str], int, int], Tuple[List[Dict], List[float]]]
+
+# Superset of the predictions columns in database/schema.sql and the backend's model;
+# DatabaseClient.write_predictions keeps the ones the table actually has
+PREDICTION_COLUMNS = [
+    "id", "product_id", "vendor_id", "forecast_date", "predicted_quantity",
+    "confidence_level", "lower_bound", "upper_bound", "model_used", "model_version",
+    "features_used", "recommendations", "created_at", "updated_at",
+]
+
+
+def _timestamp() -> str:
+    """Current UTC time in the format Sequelize stores in SQLite"""
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] + ' +00:00'
+
+
+def forecast_blocks(db_client: DatabaseClient, forecast_products: ForecastProducts, product_ids: List[str],
+                    days: int, batch_size: int, summary: Dict) -> List[Dict]:
+    """Forecast products chunk by chunk into compact per-chunk arrays
+
+    Products without a forecast of their own or of their category are counted in
+    ``summary`` by status and not stored.
+    """
+    end_day = training_end_day()
+    blocks = []
+
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start:start + batch_size]
+        forecasts, _ = forecast_products(chunk, days, end_day)
+        info = db_client.get_products_info_bulk(chunk)
+
+        served = []
+        for forecast in forecasts:
+            if forecast['status'] in FORECASTED_STATUSES:
+                served.append(forecast)
+            else:
+                summary["skipped"][forecast['status']] = summary["skipped"].get(forecast['status'], 0) + 1
+        summary["forecasted"] += len(served)
+        if not served:
+            continue
+
+        def column(key: str) -> np.ndarray:
+            return np.array([[p[key] for p in forecast['predictions']] for forecast in served], dtype=np.float64)
+
+        blocks.append({
+            'product_id': [forecast['product_id'] for forecast in served],
+            'vendor_id': [info.get(forecast['product_id'], {}).get('vendorId') for forecast in served],
+            'model_used': [forecast['training'].get('model', MODEL_USED) for forecast in served],
+            'date': [p['date'] for p in served[0]['predictions']],  # Shared by every product of a chunk
+            'predicted_quantity': column('predicted_quantity'),
+            'confidence_level': column('confidence_level'),
+            'lower_bound': column('lower_bound'),
+            'upper_bound': column('upper_bound'),
+        })
+
+    return blocks
+
+
+def prediction_rows(blocks: List[Dict]) -> Iterator[Dict]:
+    """One predictions row per product and day of the forecast blocks"""
+    created_at = _timestamp()
+    features_used = json.dumps({
+        "history_days": Config.HISTORY_DAYS,
+        "bucket_days": Config.RESAMPLE_BUCKET_DAYS,
+    })
+
+    for block in blocks:
+        for i, product_id in enumerate(block['product_id']):
+            for d, forecast_date in enumerate(block['date']):
+                yield {
+                    "id": str(uuid.uuid4()),
+                    "product_id": product_id,
+                    "vendor_id": block['vendor_id'][i],
+                    "forecast_date": forecast_date,
+                    "predicted_quantity": float(block['predicted_quantity'][i, d]),
+                    "confidence_level": float(block['confidence_level'][i, d]),
+                    "lower_bound": float(block['lower_bound'][i, d]),
+                    "upper_bound": float(block['upper_bound'][i, d]),
+                    "model_used": block['model_used'][i],
+                    "model_version": Config.MODEL_VERSION,
+                    "features_used": features_used,
+                    "recommendations": "[]",
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+
+
+def precompute_forecasts(db_client: DatabaseClient, forecast_products: ForecastProducts, days: int = 7,
+                         product_ids: List[str] = None, batch_size: int = None) -> Dict:
+    """Forecast every active product (or ``product_ids``) and store the results
+
+    Products are forecast exactly as the prediction endpoints serve them (category
+    pooling and the backend chosen at training time), and each row records the model
+    that produced it. Every forecast is computed before the write transaction opens;
+    the transaction then replaces the products' earlier runs of this model version with
+    the new rows, so a run either lands completely or not at all.
+    """
+    started = datetime.now()
+    if product_ids is None:
+        product_ids = db_client.get_active_product_ids()
+    product_ids = list(dict.fromkeys(product_ids))
+
+    summary = {
+        "total_products": len(product_ids),
+        "forecasted": 0,
+        "skipped": {},
+        "rows_written": 0,
+        "days": days,
+        "model_version": Config.MODEL_VERSION,
+    }
+
+    blocks = forecast_blocks(db_client, forecast_products, product_ids, days, batch_size or Config.BATCH_SIZE, summary)
+    summary["rows_written"] = db_client.write_predictions(
+        prediction_rows(blocks), PREDICTION_COLUMNS, replace_product_ids=product_ids,
+        model_version=Config.MODEL_VERSION,
+    )
+    summary["duration_seconds"] = round((datetime.now() - started).total_seconds(), 3)
+
+    logger.info(
+        f"Precomputed {summary['rows_written']} predictions for "
+        f"{summary['forecasted']}/{summary['total_products']} products; skipped {summary['skipped']}"
+    )
+    return summary
+
+
+async def run_periodic(db_client: DatabaseClient, forecast_products: ForecastProducts, interval_hours: float,
+                       days: int = 7) -> None:
+    """Precompute forecasts for every active product each ``interval_hours``, off the event loop"""
+    while True:
+        try:
+            await run_in_threadpool(precompute_forecasts, db_client, forecast_products, days)
+        except Exception as e:
+            logger.error(f"Scheduled forecast precompute failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute demand forecasts into the predictions table")
+    parser.add_argument("--days", type=int, default=7, help="Forecast horizon in days (1-30)")
+    parser.add_argument("--product-id", action="append", dest="product_ids",
+                        help="Only forecast this product (repeatable); defaults to every active product")
+    parser.add_argument("--db-path", default=None, help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.days <= 30:
+        parser.error("--days must be between 1 and 30")
+
+    logging.basicConfig(level=logging.INFO)
+    if args.db_path:
+        Config.SQLITE_PATH = args.db_path
+
+    # The service's own forecasting path: stored models, category pooling and backends
+    import app
+    app.load_ml_modules()
+    app.init_services()
+    try:
+        summary = precompute_forecasts(app.db_client, app.forecast_products, args.days, args.product_ids)
+    finally:
+        app.stop_services()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import asyncio
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from config.settings import Config
+from prediction.backends import BackendSelector
+from prediction.batch import BatchForecaster
+from prediction.forecaster import DemandForecaster
+from prediction.registry import ModelRegistry, no_backend
+from preprocessing.features import pending_demand, training_end_day, window_start_day
+from utils.database import DatabaseClient
+from utils.snapshot import SalesSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def train_products(db_path: str, product_ids: List[str], end_day: int, bucket_days: int,
+                   history_days: int, snapshot_path: str = None,
+                   backends: List[str] = None) -> List[Tuple[str, Optional[str], DemandForecaster, Dict, Dict]]:
+    """Train one batch of products; runs inside a worker process
+
+    Fetches the batch's bucketed sales and watermarks with one query each (or from the
+    sales snapshot at ``snapshot_path``) and returns ``(product_id, watermark, forecaster,
+    training_result, backend)`` for every product with sales. With more than one of
+    ``backends`` (baseline first), the fitted products' backend is chosen by backtest
+    here, so serving only evaluates the stored choice.
+    """
+    source = SalesSnapshot(snapshot_path) if snapshot_path else DatabaseClient(db_path, pool_size=1)
+    since_day = window_start_day(history_days, end_day, bucket_days)
+
+    daily_sales = source.get_daily_sales_bulk(product_ids, since_day, bucket_days)
+    watermarks = source.get_sales_watermarks_bulk(product_ids)
+    series, _ = BatchForecaster(bucket_days, history_days).build_series(daily_sales, len(product_ids), end_day)
+    pending = pending_demand(daily_sales['product_index'], daily_sales['bucket'], daily_sales['quantity'],
+                             len(product_ids), end_day, bucket_days)
+    if not snapshot_path:
+        source.pool.close()
+
+    results = []
+    for i, product_id in enumerate(product_ids):
+        watermark = watermarks.get(product_id)
+        if watermark is None:
+            continue
+
+        forecaster = DemandForecaster(bucket_days, history_days)
+        training_result = forecaster.train_series(series[i], end_day, pending[i])
+        results.append((product_id, watermark, forecaster, training_result, no_backend()))
+
+    fitted = [k for k, result in enumerate(results) if result[3].get("status") == "trained"]
+    if backends and len(backends) > 1 and fitted:
+        selector = BackendSelector(backends, bucket_days, history_days)
+        choice = selector.choose(np.stack([results[k][2].series for k in fitted]))
+        for row, k in enumerate(fitted):
+            results[k] = results[k][:4] + ({key: value[row:row + 1] for key, value in choice.items()},)
+
+    return results
+
+
+class TrainingScheduler:
+    """Background retraining of stored models on a process pool
+
+    A job enumerates the products to train, splits them into ``BATCH_SIZE`` chunks and
+    trains the chunks on ``MAX_WORKERS`` processes. Fitted models are written to the
+    registry as chunks finish, so serving only ever reads precomputed models.
+
+    Finished jobs are kept for status queries up to ``max_finished_jobs``.
+
+    ``backends`` are the forecasting backends products are chosen between as they are
+    trained (the baseline first); the choice is stored with the model.
+
+    With a sales ``snapshot``, jobs of more than one chunk first append the new sales
+    to it and the workers read the snapshot instead of the database.
+    """
+
+    def __init__(self, db_client: DatabaseClient, registry: ModelRegistry,
+                 batch_size: int = None, max_workers: int = None,
+                 on_trained: Callable[[str], None] = None, snapshot: SalesSnapshot = None,
+                 max_finished_jobs: int = 100, backends: List[str] = None):
+        self.db_client = db_client
+        self.registry = registry
+        self.snapshot = snapshot
+        self.backends = backends
+        self.batch_size = batch_size or Config.BATCH_SIZE
+        self.max_workers = max_workers or Config.MAX_WORKERS
+        self.on_trained = on_trained
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs: Dict[str, Dict] = {}
+        self._in_flight: set = set()  # Products queued or training in an active job
+        self._requested: set = set()  # Single products waiting for the next drain pass
+        self._draining = False
+        self._closed = False
+        self._last_full_run: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned, not forked: a fork taken while another thread holds a SQLite
+            # transaction leaves the workers seeing its locks on the database forever
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def start_job(self, product_ids: List[str] = None) -> Dict:
+        """Queue a retraining job for the given products (default: every active product)"""
+        scope = "products"
+        if product_ids is None:
+            scope = "all"
+            product_ids = self.db_client.get_active_product_ids()
+
+        with self._lock:
+            # Skip products another active job is already training
+            product_ids = [p for p in dict.fromkeys(product_ids) if p not in self._in_flight]
+            self._in_flight.update(product_ids)
+            job = self._new_job(scope, product_ids)
+
+        thread = threading.Thread(target=self._run, args=(job, product_ids), daemon=True)
+        thread.start()
+
+        logger.info(f"Training job {job['job_id']} queued for {len(product_ids)} products")
+        return dict(job)
+
+    def request_training(self, product_id: str) -> None:
+        """Queue a single product (e.g. a stale model) unless it is already queued
+
+        Requests are collected in one pending set that a single worker drains, each
+        pass training everything requested since the previous one as one job.
+        """
+        with self._lock:
+            if self._closed or product_id in self._in_flight:
+                return
+            self._in_flight.add(product_id)
+            self._requested.add(product_id)
+            if self._draining:
+                return
+            self._draining = True
+
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                product_ids = list(self._requested)
+                self._requested.clear()
+                # Requests still pending at shutdown are dropped, not started on a closed pool
+                if not product_ids or self._closed:
+                    self._draining = False
+                    return
+                job = self._new_job("requested", product_ids)
+            self._run(job, product_ids)
+
+    def _new_job(self, scope: str, product_ids: List[str]) -> Dict:
+        """Record a queued job, forgetting the oldest finished ones beyond ``max_finished_jobs``; call with the lock held"""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "scope": scope,
+            "status": "queued",
+            "total_products": len(product_ids),
+            "completed_products": 0,
+            "trained": 0,
+            "insufficient_data": 0,
+            "total_batches": -(-len(product_ids) // self.batch_size),
+            "completed_batches": 0,
+            "failed_batches": 0,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+
+        finished = sorted((j for j in self._jobs.values() if j["finished_at"]), key=lambda j: j["finished_at"])
+        for old in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[old["job_id"]]
+
+        self._jobs[job["job_id"]] = job
+        return job
+
+    def _run(self, job: Dict, product_ids: List[str]) -> None:
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+        end_day = training_end_day()
+
+        try:
+            batches = [
+                product_ids[i:i + self.batch_size]
+                for i in range(0, len(product_ids), self.batch_size)
+            ]
+
+            snapshot_path = None
+            if self.snapshot is not None and len(batches) > 1:
+                try:
+                    self.snapshot.sync(self.db_client)
+                    snapshot_path = self.snapshot.path
+                except Exception as e:
+                    logger.error(f"Sales snapshot sync failed, training job {job['job_id']} reads the database: {e}")
+
+            futures = {
+                self._pool().submit(
+                    train_products, self.db_client.db_path, batch, end_day,
+                    Config.RESAMPLE_BUCKET_DAYS, Config.HISTORY_DAYS, snapshot_path, self.backends,
+                ): batch
+                for batch in batches
+            }
+
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    for product_id, watermark, forecaster, training_result, backend in future.result():
+                        self.registry.save(product_id, forecaster, watermark, training_result, backend)
+                        if self.on_trained:
+                            self.on_trained(product_id)
+                        if training_result.get("status") == "trained":
+                            job["trained"] += 1
+                        else:
+                            job["insufficient_data"] += 1
+                except Exception as e:
+                    logger.error(f"Training batch failed in job {job['job_id']}: {e}")
+                    job["failed_batches"] += 1
+                finally:
+                    job["completed_batches"] += 1
+                    job["completed_products"] += len(batch)
+                    with self._lock:
+                        self._in_flight.difference_update(batch)
+
+            job["status"] = "completed" if job["failed_batches"] == 0 else "completed_with_errors"
+
+        except Exception as e:
+            logger.error(f"Training job {job['job_id']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            with self._lock:
+                self._in_flight.difference_update(product_ids)
+
+        job["finished_at"] = datetime.now().isoformat()
+        if job["scope"] == "all" and job["status"].startswith("completed"):
+            self._last_full_run = datetime.fromisoformat(job["finished_at"])
+        logger.info(f"Training job {job['job_id']} {job['status']}: {job['trained']} models trained")
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Status and progress of a job"""
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Every job, newest first"""
+        return sorted((dict(job) for job in self._jobs.values()), key=lambda j: j["created_at"], reverse=True)
+
+    def last_full_run(self) -> Optional[datetime]:
+        """When the most recent job over every active product finished"""
+        return self._last_full_run
+
+    async def run_periodic(self, interval_days: int, check_seconds: float = 3600) -> None:
+        """Retrain every active product each ``interval_days``, checking once per ``check_seconds``"""
+        while True:
+            try:
+                last_run = self.last_full_run()
+                if last_run is None or datetime.now() - last_run >= timedelta(days=interval_days):
+                    await run_in_threadpool(self.start_job)
+            except Exception as e:
+                logger.error(f"Scheduled retraining failed to start: {e}")
+            await asyncio.sleep(check_seconds)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
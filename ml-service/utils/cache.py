@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Bounded TTL + LRU cache for prediction responses
+
+    Keys are ``(product_id, days, watermark)`` tuples. Entries expire after ``ttl_seconds``,
+    the least recently used entry is evicted once ``max_entries`` is reached, and a new
+    watermark for a product drops every entry cached under its previous watermark.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 1024, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._watermarks: Dict[Hashable, Hashable] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            item = self._entries.get(key)
+
+            if item is None:
+                self._check_watermark(key)
+                self.misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        """Store value under key, evicting the least recently used entries if full"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._check_watermark(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, product_id: str) -> int:
+        """Drop every cached entry for a product"""
+        with self._lock:
+            self._watermarks.pop(product_id, None)
+            return self._drop_product(product_id)
+
+    def _check_watermark(self, key: Tuple[Hashable, ...]) -> None:
+        # Entries cached under an older watermark can never be hit again
+        product_id, watermark = key[0], key[-1]
+        previous = self._watermarks.get(product_id, watermark)
+        self._watermarks[product_id] = watermark
+        if previous != watermark:
+            self._drop_product(product_id)
+
+    def _drop_product(self, product_id: Hashable) -> int:
+        keys = [key for key in self._entries if key[0] == product_id]
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls with the same key into one execution
+
+    The first caller for a key starts the computation as a task; callers arriving while
+    it runs await the same task and get its result or exception. Nothing is kept after it
+    finishes, so this only removes duplicate concurrent work: repeats later on are the
+    PredictionCache's job. A caller that is cancelled stops waiting without cancelling
+    the computation the others share.
+    """
+
+    def __init__(self, on_join: Callable[[Hashable], None] = None):
+        self.on_join = on_join
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of ``compute()``, shared with every concurrent caller using the same key"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.started += 1
+        else:
+            self.joined += 1
+            if self.on_join:
+                self.on_join(key)
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller was cancelled meanwhile
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        """Computations started, calls that joined one, and computations running now"""
+        return {
+            "in_flight": len(self._calls),
+            "started": self.started,
+            "joined": self.joined,
+        }
@@ -1,78 +1,476 @@
 import sqlite3
-from typing import List, Dict, Optional
+import json
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import os
+import time
 import logging
+import numpy as np
+
+from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+# soldAt as fractional days since 1970-01-01 UTC
+SOLD_DAY_SQL = "julianday(soldAt) - 2440587.5"
+DAILY_SALES_DTYPE = np.dtype([('bucket', np.int64), ('quantity', np.float64), ('sales', np.int64)])
+# createdAt as whole milliseconds since the epoch, comparable with values parsed in Python
+CREATED_MS_SQL = "CAST(ROUND((julianday(createdAt) - 2440587.5) * 86400000) AS INTEGER)"
+
+# 1970-01-01 as milliseconds of the Julian day, SQLite's internal time representation
+UNIX_EPOCH_JULIAN_MS = 210866760000000
+
+
+def created_ms(value: datetime) -> int:
+    """Milliseconds since the epoch of a createdAt, rounded exactly as CREATED_MS_SQL rounds it
+
+    SQLite holds a time as whole milliseconds of the Julian day, the seconds within the
+    minute rounded from a float, and julianday() divides that by 86400000 as a float, so
+    the float steps are replayed here rather than rounding the exact value. Naive
+    datetimes are taken as UTC.
+    """
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    minute = value.replace(second=0, microsecond=0) - datetime(1970, 1, 1)
+    seconds = value.second + value.microsecond / 1e6
+    julian_ms = UNIX_EPOCH_JULIAN_MS + minute // timedelta(milliseconds=1) + int(seconds * 1000 + 0.5)
+    epoch_ms = (julian_ms / 86400000 - 2440587.5) * 86400000
+    # ROUND() rounds halves away from zero
+    return int(np.sign(epoch_ms) * np.floor(abs(epoch_ms) + 0.5))
+
+
+def format_watermark(count: int, last_created_ms: int) -> str:
+    """Watermark string identifying a product's sales: row count and latest createdAt"""
+    return f"{count}:{last_created_ms}"
+
+
+def parse_watermark(watermark: str) -> Tuple[int, int]:
+    """Split a watermark back into (row count, latest createdAt in ms)"""
+    count, last_created_ms = watermark.split(':')
+    return int(count), int(last_created_ms)
+
+
+def quote_identifier(name: str) -> str:
+    """SQLite identifier quoted for use in a statement, with embedded quotes doubled"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+# SQLite version of the predictions table in database/schema.sql
+PREDICTIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS predictions (
+        id TEXT PRIMARY KEY,
+        product_id TEXT NOT NULL,
+        forecast_date TEXT NOT NULL,
+        predicted_quantity REAL NOT NULL CHECK (predicted_quantity >= 0),
+        confidence_level REAL CHECK (confidence_level >= 0 AND confidence_level <= 1),
+        lower_bound REAL,
+        upper_bound REAL,
+        model_used TEXT NOT NULL,
+        model_version TEXT,
+        features_used TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+PREDICTIONS_INDEX_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_product_date
+    ON predictions(product_id, forecast_date, created_at)
+"""
+
+# Indexes the ML read path relies on; the backend's schema doesn't define them, so they
+# are created at startup when no index with the same leading columns exists
+READ_PATH_INDEXES = [
+    # Sales history and daily buckets: seek productId, range on soldAt, quantity from the index
+    ("idx_ml_sales_product_sold", "sales", ("productId", "soldAt", "quantity")),
+    # Sales watermarks: COUNT(*) and MAX(createdAt) per product
+    ("idx_ml_sales_product_created", "sales", ("productId", "createdAt")),
+    # Tailing new sales in (createdAt, id) order
+    ("idx_ml_sales_created_id", "sales", ("createdAt", "id")),
+    # Vendor forecasts and inventory
+    ("idx_ml_products_vendor_active", "products", ("vendorId", "isActive")),
+]
+
+DAILY_SALES_SQL = f"""
+    SELECT
+        CAST(({SOLD_DAY_SQL}) / ? AS INTEGER) AS bucket,
+        SUM(quantity),
+        COUNT(*)
+    FROM sales
+    WHERE productId = ? AND soldAt >= ?
+    GROUP BY bucket
+    ORDER BY bucket ASC
+"""
+SALES_WATERMARK_SQL = f"""
+    SELECT COUNT(*), MAX({CREATED_MS_SQL})
+    FROM sales
+    WHERE productId = ?
+"""
+VENDOR_PRODUCTS_SQL = """
+    SELECT
+        id,
+        name,
+        category,
+        quantity,
+        unit,
+        expiryDate,
+        julianday(expiryDate) - 2440587.5 AS expiryDay
+    FROM products
+    WHERE vendorId = ? AND isActive = 1
+    ORDER BY name ASC
+"""
+
+# Per-request queries whose plans are logged at startup
+EXPLAINED_QUERIES = {
+    "daily_sales": DAILY_SALES_SQL,
+    "sales_watermark": SALES_WATERMARK_SQL,
+    "vendor_products": VENDOR_PRODUCTS_SQL,
+}
+
+
+def _day_to_iso(day: int) -> str:
+    """ISO date string for a day count since the Unix epoch, comparable with soldAt"""
+    return (datetime(1970, 1, 1) + timedelta(days=day)).date().isoformat()
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable read-only SQLite connections
+
+    Connections are opened lazily up to ``size``, shared across threads and tuned with
+    read-side pragmas. Each connection keeps its own prepared-statement cache, so the
+    fixed query strings used by DatabaseClient are compiled once per connection.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, cached_statements: int = 128, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -16000")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block"""
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._idle.get(timeout=self.timeout)
+
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
 class DatabaseClient:
-    """Client to fetch sales data from backend SQLite database"""
+    """Client to fetch sales data from backend SQLite database
+
+    Reads go through a pool of read-only connections. The few writes (precomputed
+    forecasts, read-path indexes) use a short-lived writable connection of their own.
+    """
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, pool_size: int = None):
         if db_path is None:
+            db_path = Config.SQLITE_PATH
+        if not db_path:
             # Default to backend database
             backend_path = os.path.join(os.path.dirname(__file__), '..', '..', 'backend')
             db_path = os.path.join(backend_path, 'dev_database.sqlite')
         
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, size=pool_size or Config.DB_POOL_SIZE)
+        self._write_lock = threading.Lock()
         logger.info(f"Database path: {self.db_path}")
     
-    def get_sales_history(self, product_id: str, days: int = 90) -> List[Dict]:
-        """Fetch sales history for a product"""
+    @contextmanager
+    def write_connection(self):
+        """Writable connection whose block runs as a single transaction"""
+        with self._write_lock:
+            conn = sqlite3.connect(self.db_path, timeout=self.pool.timeout)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    def enable_wal(self) -> Optional[str]:
+        """Switch the database to WAL mode unless it already uses it; returns the journal mode
+
+        The mode is persistent in the database file, so this runs once per deployment
+        (from the leader worker), not from every pool.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Get sales from last N days
-            since_date = (datetime.now() - timedelta(days=days)).isoformat()
-            
-            query = """
-                SELECT 
-                    id,
+            with self.pool.connection() as conn:
+                mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode.lower() != 'wal':
+                with self.write_connection() as conn:
+                    mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            logger.info(f"SQLite journal mode: {mode}")
+            return mode
+
+        except Exception as e:
+            logger.warning(f"Could not enable WAL mode: {e}")
+            return None
+
+    def ensure_indexes(self) -> List[str]:
+        """Create the READ_PATH_INDEXES missing from the database; returns the names created"""
+        created = []
+        try:
+            with self.write_connection() as conn:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+                for name, table, columns in READ_PATH_INDEXES:
+                    if table not in tables:
+                        continue
+
+                    # Any index starting with the same columns serves the same queries
+                    wanted = tuple(column.lower() for column in columns)
+                    covered = False
+                    for (index,) in conn.execute("SELECT name FROM pragma_index_list(?)", (table,)).fetchall():
+                        indexed = tuple(row[0].lower() for row in conn.execute(
+                            "SELECT name FROM pragma_index_info(?)", (index,)
+                        ) if row[0] is not None)
+                        if indexed[:len(wanted)] == wanted:
+                            covered = True
+                            break
+                    if covered:
+                        continue
+
+                    start = time.perf_counter()
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} ON {quote_identifier(table)}"
+                        f"({', '.join(quote_identifier(column) for column in columns)})"
+                    )
+                    logger.info(f"Created index {name} on {table}({', '.join(columns)}) "
+                                f"in {time.perf_counter() - start:.2f}s")
+                    created.append(name)
+
+                # Planner statistics for the new indexes only; a bare ANALYZE scans every table
+                for name in created:
+                    conn.execute(f"ANALYZE {quote_identifier(name)}")
+
+        except Exception as e:
+            logger.error(f"Failed to create read-path indexes: {e}")
+
+        return created
+
+    def explain_read_path(self) -> Dict[str, List[str]]:
+        """Log and return the query plan of each of the EXPLAINED_QUERIES"""
+        plans = {}
+        try:
+            # A fresh connection: pooled ones may not have seen indexes created since they opened
+            conn = sqlite3.connect(self.db_path, timeout=self.pool.timeout)
+            try:
+                for name, query in EXPLAINED_QUERIES.items():
+                    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", (None,) * query.count('?')).fetchall()
+                    plans[name] = [row[3] for row in rows]
+            finally:
+                conn.close()
+
+        except Exception as e:
+            logger.error(f"Failed to explain read-path queries: {e}")
+
+        for name, plan in plans.items():
+            message = f"Query plan for {name}: {'; '.join(plan)}"
+            # A full scan of a table means an index is missing
+            if any(step.startswith("SCAN") and "INDEX" not in step for step in plan):
+                logger.warning(message)
+            else:
+                logger.info(message)
+        return plans
+
+    def get_sales_watermark(self, product_id: str) -> Optional[str]:
+        """Fetch a cheap fingerprint of a product's sales, changing whenever a sale is added"""
+        try:
+            with self.pool.connection() as conn:
+                count, last_created_ms = conn.execute(SALES_WATERMARK_SQL, (product_id,)).fetchone()
+
+            if not count:
+                return None
+            return format_watermark(count, last_created_ms or 0)
+
+        except Exception as e:
+            logger.error(f"Failed to fetch sales watermark: {e}")
+            return None
+
+    def get_sales_cursor(self) -> Optional[Tuple[str, str]]:
+        """Latest (createdAt, id) key in the sales table, the starting point for tailing new sales"""
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    "SELECT createdAt, id FROM sales ORDER BY createdAt DESC, id DESC LIMIT 1"
+                ).fetchone()
+            return tuple(row) if row is not None else None
+
+        except Exception as e:
+            logger.error(f"Failed to fetch sales cursor: {e}")
+            return None
+
+    def get_sales_since(self, cursor: Optional[Tuple[str, str]], limit: int = 1000) -> Dict:
+        """Fetch sales whose (createdAt, id) key is after ``cursor``, in key order, as columns
+
+        Returns ``product_id``, ``sold_day``, ``quantity`` and ``created_ms`` arrays plus the
+        ``cursor`` to pass on the next call, the key of the last row. Keyed on (createdAt,
+        id) so sales sharing a createdAt are not skipped at a page boundary.
+        """
+        empty = {
+            'product_id': np.array([], dtype=object),
+            'sold_day': np.array([], dtype=np.float64),
+            'quantity': np.array([], dtype=np.float64),
+            'created_ms': np.array([], dtype=np.int64),
+            'cursor': cursor,
+        }
+
+        try:
+            query = f"""
+                SELECT
                     productId,
+                    {SOLD_DAY_SQL},
                     quantity,
-                    unitPrice,
-                    total,
-                    soldAt,
-                    createdAt
+                    {CREATED_MS_SQL},
+                    createdAt,
+                    id
                 FROM sales
-                WHERE productId = ? AND soldAt >= ?
-                ORDER BY soldAt ASC
+                WHERE (createdAt, id) > (?, ?)
+                ORDER BY createdAt ASC, id ASC
+                LIMIT ?
             """
-            
-            cursor.execute(query, (product_id, since_date))
-            rows = cursor.fetchall()
-            
-            sales = []
-            for row in rows:
-                sales.append({
-                    'id': row['id'],
-                    'productId': row['productId'],
-                    'quantity': row['quantity'],
-                    'unitPrice': row['unitPrice'],
-                    'total': row['total'],
-                    'soldAt': row['soldAt'],
-                    'createdAt': row['createdAt']
-                })
-            
-            conn.close()
-            logger.info(f"Fetched {len(sales)} sales records for product {product_id}")
-            
-            return sales
-        
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (*(cursor or ('', '')), limit)).fetchall()
+
+            if not rows:
+                return empty
+
+            product_col, day_col, quantity_col, created_col, created_at_col, id_col = zip(*rows)
+
+            return {
+                'product_id': np.array(product_col, dtype=object),
+                'sold_day': np.asarray(day_col, dtype=np.float64),
+                'quantity': np.asarray(quantity_col, dtype=np.float64),
+                'created_ms': np.asarray(created_col, dtype=np.int64),
+                'cursor': (created_at_col[-1], id_col[-1]),
+            }
+
         except Exception as e:
-            logger.error(f"Failed to fetch sales history: {e}")
-            return []
-    
+            logger.error(f"Failed to fetch new sales: {e}")
+            return empty
+
+    def get_sales_counts(self, product_ids: List[str], until: Tuple[str, str]) -> Dict[str, int]:
+        """Count each product's sales with a (createdAt, id) key up to and including ``until``, keyed by id"""
+        if not product_ids:
+            return {}
+
+        try:
+            # The index on (productId, createdAt) answers the range; id is only read for
+            # rows sharing the boundary createdAt
+            query = """
+                SELECT productId, COUNT(*)
+                FROM sales
+                WHERE productId IN (SELECT value FROM json_each(?))
+                    AND createdAt <= ?
+                    AND (createdAt < ? OR id <= ?)
+                GROUP BY productId
+            """
+            created_at, sale_id = until
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (json.dumps(list(product_ids)), created_at, created_at, sale_id)).fetchall()
+
+            return {product_id: count for product_id, count in rows}
+
+        except Exception as e:
+            logger.error(f"Failed to fetch sales counts: {e}")
+            return {}
+
+    def iter_sales(self, after: Tuple[str, str] = ('', ''), page_rows: int = 100000) -> Iterator[Dict]:
+        """Stream the sales whose (createdAt, id) key is after ``after``, in pages of columns
+
+        Each page has ``product_id``, ``day`` (whole days since the epoch), ``quantity`` and
+        ``created_ms`` arrays, and ``cursor``, the largest (createdAt, id) key streamed so
+        far. All pages come from one read in table order, so together they are a
+        consistent snapshot of the table.
+        """
+        where, params = "", ()
+        if any(after):
+            # Keyed on (createdAt, id) so rows sharing the cursor's createdAt aren't skipped
+            where, params = "WHERE (createdAt, id) > (?, ?)", tuple(after)
+
+        query = f"""
+            SELECT
+                productId,
+                CAST({SOLD_DAY_SQL} AS INTEGER),
+                quantity,
+                {CREATED_MS_SQL},
+                createdAt,
+                id
+            FROM sales
+            {where}
+        """
+
+        cursor_key = tuple(after)
+        with self.pool.connection() as conn:
+            cursor = conn.execute(query, params)
+            cursor.row_factory = None
+            while True:
+                rows = cursor.fetchmany(page_rows)
+                if not rows:
+                    break
+
+                product_col, day_col, quantity_col, created_col, created_at_col, id_col = zip(*rows)
+                cursor_key = max(cursor_key, max(zip(created_at_col, id_col)))
+                yield {
+                    'product_id': np.array(product_col, dtype=object),
+                    'day': np.asarray(day_col, dtype=np.int32),
+                    'quantity': np.asarray(quantity_col, dtype=np.float64),
+                    'created_ms': np.asarray(created_col, dtype=np.int64),
+                    'cursor': cursor_key,
+                }
+
     def get_product_info(self, product_id: str) -> Optional[Dict]:
         """Fetch product information"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
             query = """
                 SELECT 
                     id,
@@ -86,65 +484,463 @@ class DatabaseClient:
                 WHERE id = ?
             """
             
-            cursor.execute(query, (product_id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                conn.close()
-                return None
-            
-            product = {
-                'id': row['id'],
-                'vendorId': row['vendorId'],
-                'name': row['name'],
-                'category': row['category'],
-                'quantity': row['quantity'],
-                'unit': row['unit'],
-                'expiryDate': row['expiryDate']
-            }
+            with self.pool.connection() as conn:
+                row = conn.execute(query, (product_id,)).fetchone()
             
-            conn.close()
-            return product
+            return dict(row) if row else None
         
         except Exception as e:
             logger.error(f"Failed to fetch product info: {e}")
             return None
     
     def get_vendor_products(self, vendor_id: str) -> List[Dict]:
-        """Fetch all products for a vendor"""
+        """Fetch all active products for a vendor; ``expiryDay`` is expiryDate in days since the epoch"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            with self.pool.connection() as conn:
+                rows = conn.execute(VENDOR_PRODUCTS_SQL, (vendor_id,)).fetchall()
             
+            return [dict(row) for row in rows]
+        
+        except Exception as e:
+            logger.error(f"Failed to fetch vendor products: {e}")
+            return []
+
+    def get_daily_sales(self, product_id: str, since_day: int, bucket_days: int = 1) -> Dict[str, np.ndarray]:
+        """Fetch a product's sales aggregated into buckets of ``bucket_days`` days
+
+        ``since_day`` is the first day (days since the Unix epoch) to include. Returns the
+        ``bucket`` index (day // bucket_days), total ``quantity`` and number of ``sales``
+        for every non-empty bucket, ordered by bucket.
+        """
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.execute(DAILY_SALES_SQL, (bucket_days, product_id, _day_to_iso(since_day)))
+                cursor.row_factory = None
+                data = np.fromiter(cursor, dtype=DAILY_SALES_DTYPE)
+
+            logger.info(f"Fetched {len(data)} sales buckets for product {product_id}")
+
+            return {
+                'bucket': np.ascontiguousarray(data['bucket']),
+                'quantity': np.ascontiguousarray(data['quantity']),
+                'sales': np.ascontiguousarray(data['sales']),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch daily sales: {e}")
+            return {
+                'bucket': np.array([], dtype=np.int64),
+                'quantity': np.array([], dtype=np.float64),
+                'sales': np.array([], dtype=np.int64),
+            }
+
+    def get_daily_sales_bulk(self, product_ids: List[str], since_day: int, bucket_days: int = 1) -> Dict[str, np.ndarray]:
+        """Fetch bucketed sales for many products in a single query, as columnar arrays
+
+        Same columns as get_daily_sales plus ``product_index``, the position of each
+        row's product in ``product_ids``. Rows are ordered by product then bucket.
+        """
+        empty = {
+            'product_index': np.array([], dtype=np.int64),
+            'bucket': np.array([], dtype=np.int64),
+            'quantity': np.array([], dtype=np.float64),
+            'sales': np.array([], dtype=np.int64),
+        }
+        if not product_ids:
+            return empty
+
+        try:
+            query = f"""
+                SELECT
+                    productId,
+                    CAST(({SOLD_DAY_SQL}) / ? AS INTEGER) AS bucket,
+                    SUM(quantity),
+                    COUNT(*)
+                FROM sales
+                WHERE productId IN (SELECT value FROM json_each(?)) AND soldAt >= ?
+                GROUP BY productId, bucket
+                ORDER BY productId ASC, bucket ASC
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    query, (bucket_days, json.dumps(list(product_ids)), _day_to_iso(since_day))
+                ).fetchall()
+
+            if not rows:
+                return empty
+
+            index_of = {product_id: i for i, product_id in enumerate(product_ids)}
+            product_col, bucket_col, quantity_col, sales_col = zip(*rows)
+
+            history = {
+                'product_index': np.fromiter((index_of[p] for p in product_col), dtype=np.int64, count=len(rows)),
+                'bucket': np.asarray(bucket_col, dtype=np.int64),
+                'quantity': np.asarray(quantity_col, dtype=np.float64),
+                'sales': np.asarray(sales_col, dtype=np.int64),
+            }
+            logger.info(f"Fetched {len(rows)} sales buckets for {len(product_ids)} products")
+
+            return history
+
+        except Exception as e:
+            logger.error(f"Failed to fetch bulk daily sales: {e}")
+            return empty
+
+    def get_category_daily_sales(self, since_day: int, bucket_days: int = 1) -> Dict:
+        """Fetch bucketed sales of every active product summed per category, as columnar arrays
+
+        Columns are ``category``, ``bucket`` and ``quantity``; ``products`` maps each
+        category to the number of its active products that sold since ``since_day``.
+        """
+        empty = {
+            'category': np.array([], dtype=object),
+            'bucket': np.array([], dtype=np.int64),
+            'quantity': np.array([], dtype=np.float64),
+            'products': {},
+        }
+
+        try:
+            sales_query = f"""
+                SELECT
+                    p.category,
+                    CAST(({SOLD_DAY_SQL}) / ? AS INTEGER) AS bucket,
+                    SUM(s.quantity)
+                FROM sales s
+                JOIN products p ON p.id = s.productId
+                WHERE p.isActive = 1 AND p.category IS NOT NULL AND s.soldAt >= ?
+                GROUP BY p.category, bucket
+                ORDER BY p.category ASC, bucket ASC
+            """
+            products_query = """
+                SELECT
+                    p.category,
+                    COUNT(DISTINCT s.productId)
+                FROM sales s
+                JOIN products p ON p.id = s.productId
+                WHERE p.isActive = 1 AND p.category IS NOT NULL AND s.soldAt >= ?
+                GROUP BY p.category
+            """
+
+            since = _day_to_iso(since_day)
+            with self.pool.connection() as conn:
+                rows = conn.execute(sales_query, (bucket_days, since)).fetchall()
+                counts = conn.execute(products_query, (since,)).fetchall()
+
+            if not rows:
+                return empty
+
+            category_col, bucket_col, quantity_col = zip(*rows)
+            return {
+                'category': np.asarray(category_col, dtype=object),
+                'bucket': np.asarray(bucket_col, dtype=np.int64),
+                'quantity': np.asarray(quantity_col, dtype=np.float64),
+                'products': {category: count for category, count in counts},
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch category daily sales: {e}")
+            return empty
+
+    def get_products_info_bulk(self, product_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch product information for many products in a single query, keyed by id"""
+        if not product_ids:
+            return {}
+
+        try:
             query = """
-                SELECT 
+                SELECT
                     id,
+                    vendorId,
                     name,
                     category,
                     quantity,
-                    unit
+                    unit,
+                    expiryDate
                 FROM products
-                WHERE vendorId = ? AND isActive = 1
-                ORDER BY name ASC
+                WHERE id IN (SELECT value FROM json_each(?))
             """
-            
-            cursor.execute(query, (vendor_id,))
-            rows = cursor.fetchall()
-            
-            products = []
-            for row in rows:
-                products.append({
-                    'id': row['id'],
-                    'name': row['name'],
-                    'category': row['category'],
-                    'quantity': row['quantity'],
-                    'unit': row['unit']
-                })
-            
-            conn.close()
-            return products
-        
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (json.dumps(list(product_ids)),)).fetchall()
+
+            return {row['id']: dict(row) for row in rows}
+
         except Exception as e:
-            logger.error(f"Failed to fetch vendor products: {e}")
+            logger.error(f"Failed to fetch bulk product info: {e}")
+            return {}
+
+    def get_active_product_ids(self) -> List[str]:
+        """Fetch the ids of every active product"""
+        try:
+            query = """
+                SELECT id
+                FROM products
+                WHERE isActive = 1
+                ORDER BY id ASC
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query).fetchall()
+
+            return [row[0] for row in rows]
+
+        except Exception as e:
+            logger.error(f"Failed to fetch active products: {e}")
+            return []
+
+    def get_sales_watermarks_bulk(self, product_ids: List[str]) -> Dict[str, str]:
+        """Fetch the sales watermark of many products in a single query, keyed by id"""
+        if not product_ids:
+            return {}
+
+        try:
+            query = f"""
+                SELECT productId, COUNT(*), MAX({CREATED_MS_SQL})
+                FROM sales
+                WHERE productId IN (SELECT value FROM json_each(?))
+                GROUP BY productId
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (json.dumps(list(product_ids)),)).fetchall()
+
+            return {
+                product_id: format_watermark(count, last_created_ms or 0)
+                for product_id, count, last_created_ms in rows
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch bulk sales watermarks: {e}")
+            return {}
+
+    def get_inventory(self, vendor_id: str = None) -> Dict[str, np.ndarray]:
+        """Fetch stock, cost and expiry of every active product (optionally one vendor's) as columns
+
+        ``expiry_day`` is expiryDate in fractional days since the epoch, NaN when unset.
+        """
+        empty = {
+            'product_id': np.array([], dtype=object),
+            'vendor_id': np.array([], dtype=object),
+            'name': np.array([], dtype=object),
+            'category': np.array([], dtype=object),
+            'quantity': np.array([], dtype=np.float64),
+            'cost_price': np.array([], dtype=np.float64),
+            'expiry_day': np.array([], dtype=np.float64),
+        }
+
+        try:
+            query = """
+                SELECT
+                    id,
+                    vendorId,
+                    name,
+                    category,
+                    quantity,
+                    costPrice,
+                    julianday(expiryDate) - 2440587.5
+                FROM products
+                WHERE isActive = 1 AND (? IS NULL OR vendorId = ?)
+                ORDER BY id ASC
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (vendor_id, vendor_id)).fetchall()
+
+            if not rows:
+                return empty
+
+            id_col, vendor_col, name_col, category_col, quantity_col, cost_col, expiry_col = zip(*rows)
+
+            return {
+                'product_id': np.array(id_col, dtype=object),
+                'vendor_id': np.array(vendor_col, dtype=object),
+                'name': np.array(name_col, dtype=object),
+                'category': np.array(category_col, dtype=object),
+                'quantity': np.array(quantity_col, dtype=np.float64),  # None becomes NaN
+                'cost_price': np.array(cost_col, dtype=np.float64),
+                'expiry_day': np.array(expiry_col, dtype=np.float64),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch inventory: {e}")
+            return empty
+
+    def get_waste_totals(self, since_day: int) -> Dict[str, np.ndarray]:
+        """Fetch wasted quantity per product and reason since ``since_day``, as columns"""
+        empty = {
+            'product_id': np.array([], dtype=object),
+            'reason': np.array([], dtype=object),
+            'quantity': np.array([], dtype=np.float64),
+            'events': np.array([], dtype=np.int64),
+        }
+
+        try:
+            query = """
+                SELECT productId, reason, SUM(quantity), COUNT(*)
+                FROM waste_logs
+                WHERE wasteDate >= ?
+                GROUP BY productId, reason
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (_day_to_iso(since_day),)).fetchall()
+
+            if not rows:
+                return empty
+
+            product_col, reason_col, quantity_col, events_col = zip(*rows)
+
+            return {
+                'product_id': np.array(product_col, dtype=object),
+                'reason': np.array(reason_col, dtype=object),
+                'quantity': np.asarray(quantity_col, dtype=np.float64),
+                'events': np.asarray(events_col, dtype=np.int64),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch waste logs: {e}")
+            return empty
+
+    def get_waste_events(self, since_day: float, reasons: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+        """Fetch waste logged with one of ``reasons`` since ``since_day``, one row per log, as columns"""
+        empty = {
+            'product_id': np.array([], dtype=object),
+            'day': np.array([], dtype=np.float64),
+            'quantity': np.array([], dtype=np.float64),
+        }
+
+        try:
+            query = f"""
+                SELECT productId, julianday(wasteDate) - 2440587.5, quantity
+                FROM waste_logs
+                WHERE wasteDate >= ? AND reason IN ({", ".join("?" for _ in reasons)})
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (_day_to_iso(int(np.floor(since_day))), *reasons)).fetchall()
+
+            if not rows:
+                return empty
+
+            product_col, day_col, quantity_col = zip(*rows)
+
+            return {
+                'product_id': np.array(product_col, dtype=object),
+                'day': np.asarray(day_col, dtype=np.float64),
+                'quantity': np.asarray(quantity_col, dtype=np.float64),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch waste events: {e}")
+            return empty
+
+    def get_sales_totals(self, since_day: int) -> Dict[str, np.ndarray]:
+        """Fetch the quantity sold per product since ``since_day``, as columns"""
+        empty = {
+            'product_id': np.array([], dtype=object),
+            'quantity': np.array([], dtype=np.float64),
+        }
+
+        try:
+            query = """
+                SELECT productId, SUM(quantity)
+                FROM sales
+                WHERE soldAt >= ?
+                GROUP BY productId
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (_day_to_iso(since_day),)).fetchall()
+
+            if not rows:
+                return empty
+
+            product_col, quantity_col = zip(*rows)
+
+            return {
+                'product_id': np.array(product_col, dtype=object),
+                'quantity': np.asarray(quantity_col, dtype=np.float64),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to fetch sales totals: {e}")
+            return empty
+
+    def write_predictions(self, rows, columns: List[str], replace_product_ids: List[str] = None,
+                          model_version: str = None) -> int:
+        """Bulk insert forecast rows into the predictions table in one transaction
+
+        ``rows`` is an iterable of dicts keyed by ``columns``; only columns present in the
+        table are written, so both database/schema.sql and the backend's variant work.
+        Earlier rows of ``replace_product_ids`` (of ``model_version``, if the table records
+        it) are deleted in the same transaction, so each product keeps only its latest
+        run. The write lock is held while ``rows`` is consumed: it should only format
+        forecasts already computed. Returns the number of rows inserted.
+        """
+        try:
+            with self.write_connection() as conn:
+                conn.execute(PREDICTIONS_TABLE_SQL)
+                conn.execute(PREDICTIONS_INDEX_SQL)
+
+                existing = {row[1] for row in conn.execute("PRAGMA table_info(predictions)")}
+                insert_columns = [column for column in columns if column in existing]
+                placeholders = ", ".join("?" for _ in insert_columns)
+
+                if replace_product_ids:
+                    if model_version is not None and 'model_version' in existing:
+                        conn.executemany(
+                            "DELETE FROM predictions WHERE product_id = ? AND model_version = ?",
+                            ((product_id, model_version) for product_id in replace_product_ids),
+                        )
+                    else:
+                        conn.executemany(
+                            "DELETE FROM predictions WHERE product_id = ?",
+                            ((product_id,) for product_id in replace_product_ids),
+                        )
+                    logger.info(f"Replaced earlier predictions of {len(replace_product_ids)} products")
+
+                query = f"""
+                    INSERT INTO predictions ({", ".join(insert_columns)})
+                    VALUES ({placeholders})
+                """
+
+                before = conn.total_changes
+                conn.executemany(query, ([row[c] for c in insert_columns] for row in rows))
+                inserted = conn.total_changes - before
+
+            logger.info(f"Wrote {inserted} precomputed predictions")
+            return inserted
+
+        except Exception as e:
+            logger.error(f"Failed to write predictions: {e}")
+            raise
+
+    def get_precomputed_predictions(self, product_id: str, from_date: str) -> List[Dict]:
+        """Fetch the latest precomputed forecast for a product, from ``from_date`` onwards"""
+        try:
+            query = """
+                SELECT
+                    forecast_date,
+                    predicted_quantity,
+                    confidence_level,
+                    lower_bound,
+                    upper_bound,
+                    model_used,
+                    model_version,
+                    created_at
+                FROM predictions
+                WHERE product_id = ?
+                    AND forecast_date >= ?
+                    AND created_at = (SELECT MAX(created_at) FROM predictions WHERE product_id = ?)
+                ORDER BY forecast_date ASC
+            """
+
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, (product_id, from_date, product_id)).fetchall()
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Failed to fetch precomputed predictions: {e}")
             return []
@@ -0,0 +1,54 @@
+import os
+from typing import Optional, TextIO
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where every process runs its own background work
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Elects the one worker process that runs the service's background work
+
+    Workers sharing a model directory race for an exclusive ``flock`` on a lock file
+    there; the winner holds it for as long as it lives, and the kernel releases it when
+    the process exits, so another worker can take over.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._file is not None or fcntl is None
+
+    def try_acquire(self) -> bool:
+        """Take the lock without blocking; True if this process is (now) the leader"""
+        if self.is_leader:
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        logger.info(f"Worker {os.getpid()} is the leader ({self.path})")
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,300 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency buckets, Prometheus' defaults plus a finer low end
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ACCURACY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+ERROR_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+# Hot-path stages timed by the prediction endpoints
+STAGES = ("db_fetch", "feature_prep", "train", "predict", "recommendations")
+
+
+class Counter:
+    """Monotonic counter
+
+    Increments take a lock (``+=`` on an attribute is not atomic across threads);
+    reading the value is a plain attribute read and changes nothing.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self) -> None:
+        with self._lock:
+            self._value += 1
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class LabeledCounter:
+    """Family of counters keyed by a label value, created on first use"""
+
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+
+    def inc(self, label: str) -> None:
+        counter = self._counters.get(label)
+        if counter is None:
+            counter = self._counters.setdefault(label, Counter())
+        counter.inc()
+
+    def values(self) -> Dict[str, int]:
+        return {label: counter.value for label, counter in list(self._counters.items())}
+
+
+class Histogram:
+    """Fixed-bucket histogram
+
+    Observing is a binary search plus one bucket increment and the running sum, under
+    one short lock, so counts and sum are exact and a snapshot sees them together.
+    """
+
+    def __init__(self, bounds: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds: Tuple[float, ...] = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)  # Last one is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        """Per-bucket counts, total count and sum at this moment"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        return {"counts": counts, "count": sum(counts), "sum": total}
+
+    def quantile(self, q: float, snapshot: Dict = None) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        snapshot = snapshot or self.snapshot()
+        total = snapshot["count"]
+        if total == 0:
+            return None
+
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(snapshot["counts"]):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def summary(self) -> Dict:
+        snapshot = self.snapshot()
+        count = snapshot["count"]
+        return {
+            "count": count,
+            "mean": round(snapshot["sum"] / count, 6) if count else None,
+            "p50": _round(self.quantile(0.5, snapshot)),
+            "p95": _round(self.quantile(0.95, snapshot)),
+            "p99": _round(self.quantile(0.99, snapshot)),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+class ServiceMetrics:
+    """Request counts, stage latencies and model error statistics of the ML service"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = LabeledCounter()  # By endpoint
+        self.errors = LabeledCounter()  # By endpoint
+        self.outcomes = LabeledCounter()  # How /predict answered: cache_hit, stored_model, ...
+        self.request_latency: Dict[str, Histogram] = {}
+        self.stage_latency = {stage: Histogram() for stage in STAGES}
+
+        self.models_trained = Counter()
+        self.models_insufficient_data = Counter()
+        self.model_accuracy = Histogram(ACCURACY_BUCKETS)
+        self.model_mae = Histogram(ERROR_BUCKETS)
+        self.model_rmse = Histogram(ERROR_BUCKETS)
+        self.backtest: Optional[Dict] = None  # Summary of the latest rolling-origin backtest
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as one of ``STAGES``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_latency[name].observe(time.perf_counter() - start)
+
+    @contextmanager
+    def request(self, endpoint: str):
+        """Count a request and time it; exceptions are counted as errors and re-raised"""
+        self.requests.inc(endpoint)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors.inc(endpoint)
+            raise
+        finally:
+            histogram = self.request_latency.get(endpoint)
+            if histogram is None:
+                histogram = self.request_latency.setdefault(endpoint, Histogram())
+            histogram.observe(time.perf_counter() - start)
+
+    def instrument(self, endpoint: str):
+        """Decorator applying ``request`` to an async endpoint"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.request(endpoint):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_training(self, training_result: Dict) -> None:
+        """Track the in-sample fit quality of a newly trained model"""
+        if training_result.get("status") != "trained":
+            self.models_insufficient_data.inc()
+            return
+
+        self.models_trained.inc()
+        self.model_accuracy.observe(training_result.get("accuracy", 0.0))
+        if "mae" in training_result:
+            self.model_mae.observe(training_result["mae"])
+        if "rmse" in training_result:
+            self.model_rmse.observe(training_result["rmse"])
+
+    def record_backtest(self, summary: Dict) -> None:
+        """Keep the latest backtest summary as the service's out-of-sample accuracy"""
+        self.backtest = dict(summary, recorded_at=time.time())
+
+    def to_dict(self, cache: Dict = None, coalescing: Dict = None) -> Dict:
+        """Every metric as JSON-friendly values"""
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "requests": self.requests.values(),
+            "errors": self.errors.values(),
+            "predict_outcomes": self.outcomes.values(),
+            "request_latency_seconds": {
+                endpoint: histogram.summary() for endpoint, histogram in list(self.request_latency.items())
+            },
+            "stage_latency_seconds": {
+                stage: histogram.summary() for stage, histogram in self.stage_latency.items()
+            },
+            "models": {
+                "trained": self.models_trained.value,
+                "insufficient_data": self.models_insufficient_data.value,
+                "accuracy_r2": self.model_accuracy.summary(),
+                "mae": self.model_mae.summary(),
+                "rmse": self.model_rmse.summary(),
+            },
+            "backtest": self.backtest,
+            "cache": cache,
+            "coalescing": coalescing,
+        }
+
+    def to_prometheus(self, cache: Dict = None, coalescing: Dict = None) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        _counter_family(lines, "ml_requests_total", "Requests by endpoint", "endpoint", self.requests.values())
+        _counter_family(lines, "ml_request_errors_total", "Failed requests by endpoint", "endpoint", self.errors.values())
+        _counter_family(lines, "ml_predict_outcomes_total", "How /predict requests were answered", "outcome",
+                        self.outcomes.values())
+
+        _histogram_family(lines, "ml_request_duration_seconds", "Request latency by endpoint", "endpoint",
+                          list(self.request_latency.items()))
+        _histogram_family(lines, "ml_stage_duration_seconds", "Hot-path stage latency", "stage",
+                          list(self.stage_latency.items()))
+
+        _counter_family(lines, "ml_models_trained_total", "Models trained by outcome", "status", {
+            "trained": self.models_trained.value,
+            "insufficient_data": self.models_insufficient_data.value,
+        })
+        _histogram_family(lines, "ml_model_accuracy_r2", "In-sample R² of trained models", None,
+                          [(None, self.model_accuracy)])
+        _histogram_family(lines, "ml_model_mae", "In-sample MAE of trained models (units/day)", None,
+                          [(None, self.model_mae)])
+        _histogram_family(lines, "ml_model_rmse", "In-sample RMSE of trained models (units/day)", None,
+                          [(None, self.model_rmse)])
+
+        backtest = self.backtest
+        if backtest:
+            for key in ("mae", "rmse", "mape", "wape"):
+                if backtest.get(key) is None:
+                    continue
+                lines.append(f"# HELP ml_backtest_{key} Out-of-sample {key.upper()} of the latest backtest")
+                lines.append(f"# TYPE ml_backtest_{key} gauge")
+                lines.append(f"ml_backtest_{key} {backtest[key]}")
+
+        if cache:
+            for key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+                _counter_family(lines, f"ml_cache_{key}_total", f"Prediction cache {key}", None, {None: cache[key]})
+            lines.append("# HELP ml_cache_entries Prediction cache entries")
+            lines.append("# TYPE ml_cache_entries gauge")
+            lines.append(f"ml_cache_entries {cache['size']}")
+            lines.append("# HELP ml_cache_hit_rate Prediction cache hit rate")
+            lines.append("# TYPE ml_cache_hit_rate gauge")
+            lines.append(f"ml_cache_hit_rate {cache['hit_rate']}")
+
+        if coalescing:
+            _counter_family(lines, "ml_predict_computations_total", "Distinct /predict computations started", None,
+                            {None: coalescing['started']})
+            _counter_family(lines, "ml_predict_joined_total", "/predict calls that joined a computation in flight",
+                            None, {None: coalescing['joined']})
+            lines.append("# HELP ml_predict_in_flight /predict computations running now")
+            lines.append("# TYPE ml_predict_in_flight gauge")
+            lines.append(f"ml_predict_in_flight {coalescing['in_flight']}")
+
+        lines.append("# HELP ml_uptime_seconds Seconds since the service started")
+        lines.append("# TYPE ml_uptime_seconds gauge")
+        lines.append(f"ml_uptime_seconds {time.time() - self.started_at:.1f}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(name: Optional[str], value: Optional[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"'] if name else []
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _counter_family(lines: List[str], metric: str, help_text: str, label: Optional[str], values: Dict) -> None:
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} counter")
+    for value, count in values.items():
+        lines.append(f"{metric}{_labels(label, value)} {count}")
+
+
+def _histogram_family(lines: List[str], metric: str, help_text: str, label: Optional[str],
+                      histograms: List[Tuple[Optional[str], Histogram]]) -> None:
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for value, histogram in histograms:
+        snapshot = histogram.snapshot()
+        cumulative = 0
+        for bound, count in zip(histogram.bounds + (float("inf"),), snapshot["counts"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_label = 'le="' + le + '"'
+            lines.append(f"{metric}_bucket{_labels(label, value, bucket_label)} {cumulative}")
+        lines.append(f"{metric}_sum{_labels(label, value)} {snapshot['sum']}")
+        lines.append(f"{metric}_count{_labels(label, value)} {snapshot['count']}")
+
+
+# Shared by the app, the model registry and the training scheduler
+metrics = ServiceMetrics()
@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where only one process may sync the snapshot
+    fcntl = None
+
+from utils.database import DatabaseClient, format_watermark
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+# Columns of the sales partition, stored as one .npy file each
+COLUMNS = ("day", "quantity", "created_ms")
+
+
+def group_by_product(product: np.ndarray, n_products: int, columns: Dict[str, List[np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Offsets and COLUMNS of rows regrouped by product code (0..n_products-1), in arrival order within a product"""
+    order = np.argsort(product, kind='stable')
+    offsets = np.zeros(n_products + 1, dtype=np.int64)
+    np.cumsum(np.bincount(product, minlength=n_products), out=offsets[1:])
+
+    empty = {'day': np.zeros(0, dtype=np.int32), 'quantity': np.zeros(0), 'created_ms': np.zeros(0, dtype=np.int64)}
+    grouped = {'offsets': offsets}
+    for name in COLUMNS:
+        grouped[name] = np.concatenate(columns[name])[order] if columns[name] else empty[name]
+    return grouped
+
+
+class SalesSnapshot:
+    """Columnar copy of the sales table, partitioned by product, for offline training
+
+    A snapshot directory holds ``manifest.json`` and the segments it lists, each a
+    directory of .npy files: ``products`` (ids), ``offsets`` (product i's rows are
+    offsets[i]:offsets[i+1]) and the ``day``, ``quantity`` and ``created_ms`` columns.
+    Everything is opened memory-mapped, so reading a batch of products touches only
+    their partitions in each segment.
+
+    ``sync`` streams the sales table in pages: the first run copies every row into one
+    segment, later runs write only the rows whose (createdAt, id) key is after the
+    manifest's cursor, as a new segment appended to the manifest. A sync therefore
+    costs O(new rows), except every ``max_segments``-th, which compacts all segments
+    into one (O(all rows), read from the segments, not the database). Each manifest entry
+    carries its segment's row and product counts and createdAt range, so the totals are
+    updated without reading rows. The manifest is replaced atomically. Sales updated or deleted in the database after they were
+    copied need a ``full`` re-export.
+
+    Reads mirror DatabaseClient (``get_daily_sales_bulk``, ``get_sales_watermarks_bulk``),
+    so training and backtests take either as their source.
+    """
+
+    def __init__(self, path: str, max_segments: int = 8):
+        self.path = path
+        self.max_segments = max_segments
+        self._data: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    @contextmanager
+    def _syncing(self):
+        """Hold the snapshot's cross-process sync lock, so only one sync writes segments at a time"""
+        with self._sync_lock:
+            os.makedirs(self.path, exist_ok=True)
+            lock_file = None
+            if fcntl is not None:
+                lock_file = open(os.path.join(self.path, "sync.lock"), 'a')
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        # Snapshots written before segments, or before their entries carried ranges, are re-exported in full
+        if 'segments' not in manifest or any('max_created_ms' not in segment for segment in manifest['segments']):
+            return None
+        return manifest
+
+    def _current(self) -> Optional[Dict]:
+        """The mapped segments of the current manifest, remapped if another sync replaced it"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return None
+
+        with self._lock:
+            if self._data is None or self._data['manifest']['segments'] != manifest['segments']:
+                segments = []
+                for segment in manifest['segments']:
+                    data = self._load_segment(segment)
+                    data['index'] = {product_id: i for i, product_id in enumerate(data['products'].tolist())}
+                    segments.append(data)
+                self._data = {'manifest': manifest, 'segments': segments}
+            return self._data
+
+    def manifest(self) -> Optional[Dict]:
+        """Rows, products, segments, cursor and export time of the current snapshot"""
+        return self._read_manifest()
+
+    def sync(self, db_client: DatabaseClient, full: bool = False, page_rows: int = 100000) -> Dict:
+        """Append the sales created since the last sync as a new segment (or re-export every sale, with ``full``)"""
+        with self._syncing():
+            return self._sync(db_client, full, page_rows)
+
+    def _sync(self, db_client: DatabaseClient, full: bool, page_rows: int) -> Dict:
+        started = time.perf_counter()
+        current = None if full else self._current()
+        cursor = tuple(current['manifest']['cursor']) if current else ('', '')
+
+        # Stream new rows page by page; product ids are coded as they arrive
+        codes: Dict[str, int] = {}
+        products: List[str] = []
+        product_pages = []
+        pages = {name: [] for name in COLUMNS}
+        new_rows = 0
+        for page in db_client.iter_sales(cursor, page_rows):
+            page_products, inverse = np.unique(page['product_id'].astype(str), return_inverse=True)
+            for product_id in page_products.tolist():
+                if product_id not in codes:
+                    codes[product_id] = len(products)
+                    products.append(product_id)
+            page_codes = np.array([codes[p] for p in page_products.tolist()], dtype=np.int32)
+            product_pages.append(page_codes[inverse.ravel()])
+            for name in COLUMNS:
+                pages[name].append(page[name])
+            new_rows += len(page['product_id'])
+            cursor = page['cursor']
+
+        summary = {"new_rows": new_rows, "full": current is None}
+        if current and not new_rows:
+            summary.update(rows=current['manifest']['rows'], products=current['manifest']['products'],
+                           segments=len(current['manifest']['segments']))
+            return summary
+
+        product = np.concatenate(product_pages) if product_pages else np.zeros(0, dtype=np.int32)
+        segment = {'products': np.array(products, dtype=str), **group_by_product(product, len(products), pages)}
+        segments = [self._write_segment(segment)]
+        n_products = len(products)
+        if current:
+            # Products already in an earlier segment are counted once, from the mapped indexes
+            n_products = current['manifest']['products'] + sum(
+                1 for product_id in products if not any(product_id in data['index'] for data in current['segments'])
+            )
+            segments = current['manifest']['segments'] + segments
+            if len(segments) > self.max_segments:
+                segments = [self._compact(segments)]
+                summary["compacted"] = True
+
+        manifest = self._write_manifest(segments, cursor, n_products)
+
+        summary.update(rows=manifest['rows'], products=manifest['products'], segments=len(segments),
+                       duration_seconds=round(time.perf_counter() - started, 3))
+        logger.info(f"Sales snapshot synced: {new_rows} new rows, {manifest['rows']} rows "
+                    f"for {manifest['products']} products in {len(segments)} segments "
+                    f"in {summary['duration_seconds']}s")
+        return summary
+
+    def _write_segment(self, columns: Dict[str, np.ndarray]) -> Dict:
+        """Write a segment directory; returns its manifest entry, with row and product counts and createdAt range"""
+        name = f"seg-{int(time.time() * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        directory = os.path.join(self.path, name)
+        os.makedirs(directory)
+        for column, values in columns.items():
+            np.save(os.path.join(directory, f"{column}.npy"), values)
+        created_ms = columns['created_ms']
+        return {
+            "name": name,
+            "rows": int(columns['offsets'][-1]),
+            "products": int(len(columns['products'])),
+            "min_created_ms": int(created_ms.min()) if len(created_ms) else None,
+            "max_created_ms": int(created_ms.max()) if len(created_ms) else None,
+        }
+
+    def _load_segment(self, segment: Dict) -> Dict[str, np.ndarray]:
+        directory = os.path.join(self.path, segment['name'])
+        return {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in ('products', 'offsets') + COLUMNS
+        }
+
+    def _compact(self, segments: List[Dict]) -> Dict:
+        """Merge segments into one, regrouping their rows by product"""
+        codes: Dict[str, int] = {}
+        product_pages = []
+        pages = {name: [] for name in COLUMNS}
+        for segment in segments:
+            data = self._load_segment(segment)
+            # Segment-local product codes to codes over every segment
+            local = np.array([codes.setdefault(p, len(codes)) for p in data['products'].tolist()], dtype=np.int32)
+            product_pages.append(np.repeat(local, np.diff(data['offsets'])))
+            for name in COLUMNS:
+                pages[name].append(np.asarray(data[name]))
+
+        product = np.concatenate(product_pages) if product_pages else np.zeros(0, dtype=np.int32)
+        merged = {'products': np.array(list(codes), dtype=str), **group_by_product(product, len(codes), pages)}
+        logger.info(f"Compacting {len(segments)} sales snapshot segments into one")
+        return self._write_segment(merged)
+
+    def _write_manifest(self, segments: List[Dict], cursor, products: int) -> Dict:
+        """Point the manifest at ``segments`` and remove the segments it no longer lists
+
+        Totals come from the segment entries; ``products`` is the number of distinct
+        products over all segments.
+        """
+        latest = [segment['max_created_ms'] for segment in segments if segment['max_created_ms'] is not None]
+        manifest = {
+            "segments": segments,
+            "cursor": list(cursor),
+            "rows": sum(segment['rows'] for segment in segments),
+            "products": products,
+            "max_created_ms": max(latest) if latest else None,
+            "exported_at": datetime.now().isoformat(),
+        }
+        tmp_path = os.path.join(self.path, f"{MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+        # Readers that still map a removed segment keep its (unlinked) files
+        listed = {segment['name'] for segment in segments}
+        for entry in os.listdir(self.path):
+            if entry.startswith(("seg-", "gen-")) and entry not in listed:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+        return manifest
+
+    def _rows(self, data: Dict, product_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Row positions of the requested products' partitions in one segment and each row's index in ``product_ids``"""
+        positions = np.array([data['index'].get(p, -1) for p in product_ids], dtype=np.int64)
+        known = np.flatnonzero(positions >= 0)
+        starts = data['offsets'][positions[known]]
+        counts = data['offsets'][positions[known] + 1] - starts
+
+        product_index = np.repeat(known, counts)
+        # starts[k] + 0..counts[k]-1 for every requested product, without a Python loop
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return {'product_index': product_index, 'row': np.repeat(starts, counts) + within}
+
+    def _gather(self, data: Dict, product_ids: List[str], columns: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+        """The requested products' rows from every segment: ``product_index`` and the given columns"""
+        gathered = {'product_index': [], **{name: [] for name in columns}}
+        for segment in data['segments']:
+            rows = self._rows(segment, product_ids)
+            gathered['product_index'].append(rows['product_index'])
+            for name in columns:
+                gathered[name].append(segment[name][rows['row']])
+        return {
+            name: np.concatenate(values) if values else np.zeros(0, dtype=np.int64)
+            for name, values in gathered.items()
+        }
+
+    def get_daily_sales_bulk(self, product_ids: List[str], since_day: int, bucket_days: int = 1) -> Dict[str, np.ndarray]:
+        """Bucketed sales of many products, like DatabaseClient.get_daily_sales_bulk"""
+        data = self._current()
+        if data is None or not product_ids:
+            return {
+                'product_index': np.array([], dtype=np.int64),
+                'bucket': np.array([], dtype=np.int64),
+                'quantity': np.array([], dtype=np.float64),
+                'sales': np.array([], dtype=np.int64),
+            }
+
+        rows = self._gather(data, product_ids, ('day', 'quantity'))
+        recent = rows['day'] >= since_day
+        product_index = rows['product_index'][recent]
+        bucket = rows['day'][recent].astype(np.int64) // bucket_days
+
+        # One group per (product, bucket), ordered by product then bucket
+        first_bucket = bucket.min() if len(bucket) else 0
+        span = (bucket.max() - first_bucket + 1) if len(bucket) else 1
+        keys, inverse, sales = np.unique(product_index * span + (bucket - first_bucket),
+                                         return_inverse=True, return_counts=True)
+        quantity = np.bincount(inverse, weights=rows['quantity'][recent], minlength=len(keys))
+
+        return {
+            'product_index': keys // span,
+            'bucket': keys % span + first_bucket,
+            'quantity': quantity,
+            'sales': sales,
+        }
+
+    def get_sales_watermarks_bulk(self, product_ids: List[str]) -> Dict[str, str]:
+        """Watermarks of the products' sales as of the snapshot, like DatabaseClient.get_sales_watermarks_bulk"""
+        data = self._current()
+        if data is None or not product_ids:
+            return {}
+
+        rows = self._gather(data, product_ids, ('created_ms',))
+        count = np.bincount(rows['product_index'], minlength=len(product_ids))
+        last_created_ms = np.zeros(len(product_ids), dtype=np.int64)
+        np.maximum.at(last_created_ms, rows['product_index'], rows['created_ms'])
+
+        return {
+            product_id: format_watermark(n, last)
+            for product_id, n, last in zip(product_ids, count.tolist(), last_created_ms.tolist()) if n
+        }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export the sales table into a columnar snapshot")
+    parser.add_argument("--snapshot-path", required=True, help="Snapshot directory")
+    parser.add_argument("--db-path", default=None, help="SQLite database path")
+    parser.add_argument("--full", action="store_true", help="Re-export every sale instead of appending new ones")
+    parser.add_argument("--page-rows", type=int, default=100000, help="Rows fetched per query")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    summary = SalesSnapshot(args.snapshot_path).sync(DatabaseClient(args.db_path), args.full, args.page_rows)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()